@@ -0,0 +1,203 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Rejected(Exception):
+    """Demande refusée sans attendre : file pleine, limite de partie ou de session, attente trop longue."""
+
+    MESSAGES = {
+        "full": "Trop de demandes en attente, réessayez dans quelques secondes.",
+        "game": "Une demande est déjà en cours pour cette partie.",
+        "session": "Vous avez déjà une demande en cours.",
+        "timeout": "Le serveur est surchargé, réessayez dans quelques secondes.",
+    }
+
+    def __init__(self, reason, retry_after, queued=0):
+        super().__init__(self.MESSAGES[reason])
+        self.reason = reason
+        self.retry_after = retry_after
+        self.queued = queued
+
+
+class AdmissionQueue:
+    """File d'attente bornée devant une opération coûteuse (appel au modèle, bac à sable).
+
+    Au plus `max_active` demandes s'exécutent ; les suivantes attendent dans
+    l'ordre d'arrivée, au plus `max_queue` à la fois et `max_wait` secondes
+    chacune. Au-delà, `Rejected` est levée tout de suite, avec une estimation du
+    délai avant de réessayer. Une même partie (`per_game`) ou session
+    (`per_session`) ne peut avoir plus de demandes en cours ou en attente, pour
+    qu'aucune n'accapare la file.
+    """
+
+    def __init__(self, name, max_active=4, max_queue=16, max_wait=30.0, per_game=2, per_session=1):
+        self.name = name
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.per_game = per_game
+        self.per_session = per_session
+        self._cond = threading.Condition()
+        self._waiting = deque()
+        self._active = 0
+        self._by_game = {}
+        self._by_session = {}
+        self._service = 1.0  # durée moyenne d'une demande (moyenne mobile)
+        self.admitted = 0
+        self.rejected = dict.fromkeys(Rejected.MESSAGES, 0)
+        self.max_waited = 0.0
+
+    def _retry_after(self):
+        return max(1, math.ceil(self._service * (len(self._waiting) + 1) / self.max_active))
+
+    def _reject(self, reason):
+        self.rejected[reason] += 1
+        raise Rejected(reason, self._retry_after(), len(self._waiting))
+
+    def _count(self, counts, key, delta):
+        if key is None:
+            return
+        counts[key] = counts.get(key, 0) + delta
+        if not counts[key]:
+            del counts[key]
+
+    def acquire(self, game_id=None, session_id=None, wait=True):
+        """Réserve une place (en attendant son tour si `wait`) ; renvoie le ticket à passer à `release`."""
+        with self._cond:
+            if game_id is not None and self._by_game.get(game_id, 0) >= self.per_game:
+                self._reject("game")
+            if session_id is not None and self._by_session.get(session_id, 0) >= self.per_session:
+                self._reject("session")
+            queued = self._active >= self.max_active or self._waiting
+            if queued and (not wait or len(self._waiting) >= self.max_queue):
+                self._reject("full")
+            self._count(self._by_game, game_id, 1)
+            self._count(self._by_session, session_id, 1)
+            ticket = (game_id, session_id, time.monotonic())
+            if queued:
+                self._waiting.append(ticket)
+                deadline = ticket[2] + self.max_wait
+                while self._waiting[0] is not ticket or self._active >= self.max_active:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._waiting.remove(ticket)
+                        self._count(self._by_game, game_id, -1)
+                        self._count(self._by_session, session_id, -1)
+                        self._cond.notify_all()
+                        self._reject("timeout")
+                    self._cond.wait(remaining)
+                self._waiting.popleft()
+                self.max_waited = max(self.max_waited, time.monotonic() - ticket[2])
+            self._active += 1
+            self.admitted += 1
+            self._cond.notify_all()
+            return (game_id, session_id, time.monotonic())
+
+    def release(self, ticket):
+        game_id, session_id, started = ticket
+        with self._cond:
+            self._active -= 1
+            self._count(self._by_game, game_id, -1)
+            self._count(self._by_session, session_id, -1)
+            self._service += (time.monotonic() - started - self._service) * 0.2
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, game_id=None, session_id=None):
+        ticket = self.acquire(game_id, session_id)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        with self._cond:
+            return {"active": self._active, "queued": len(self._waiting), "admitted": self.admitted,
+                    "rejected": dict(self.rejected), "max_waited": round(self.max_waited, 3),
+                    "service_seconds": round(self._service, 3)}
+
+
+class CircuitBreaker:
+    """Coupe les appels à un service après `threshold` échecs consécutifs.
+
+    Ouvert, le disjoncteur refuse tout pendant `cooldown` secondes ; il laisse
+    ensuite passer un seul appel d'essai (demi-ouvert) : un succès le referme,
+    un échec le rouvre pour un nouveau `cooldown`.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self.trips = 0
+        self.short_circuited = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at < self.cooldown:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def retry_after(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(1, math.ceil(self.cooldown - (time.monotonic() - self._opened_at)))
+
+    def is_open(self):
+        """Vrai si les appels sont refusés d'office (sans consommer l'appel d'essai)."""
+        with self._lock:
+            state = self._state()
+            if state == self.OPEN or (state == self.HALF_OPEN and self._probing):
+                self.short_circuited += 1
+                return True
+            return False
+
+    def allow(self):
+        """À appeler juste avant l'appel : faux si refusé ; en demi-ouvert, un seul appel passe."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self._failures = 0
+                self._opened_at = None
+            else:
+                self._failures += 1
+                if self._opened_at is not None or self._failures >= self.threshold:
+                    if self._opened_at is None or self._probing:
+                        self.trips += 1
+                    self._opened_at = time.monotonic()
+            self._probing = False
+
+    def abandon(self):
+        # Appel d'essai annulé avant d'aboutir : le prochain pourra essayer à sa place
+        with self._lock:
+            self._probing = False
+
+    def stats(self):
+        with self._lock:
+            return {"state": self._state(), "failures": self._failures, "trips": self.trips,
+                    "short_circuited": self.short_circuited}
@@ -0,0 +1,270 @@
+"""Statistiques des parties archivées (voir game_archive), calculées par tranches avec NumPy.
+
+    python analytics.py archive [autre_archive …] [--chunk 65536] [--min-attempts 5] [--json]
+
+Les tables sont lues `--chunk` parties à la fois (avec leurs coups) : la
+mémoire utilisée dépend de la tranche, pas de la taille de l'archive. Chaque
+tranche est traitée par des opérations sur colonnes (bincount, unique,
+histogrammes), sans boucle Python par partie ni par coup.
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from game_archive import WINNER_DRAW, WINNER_NONE, mask_bits
+
+# Temps de réflexion : histogramme à pas logarithmique de 10 ms à ~3 h (quantiles à 5 % près)
+THINK_MIN = 0.01
+THINK_EDGES = np.concatenate([[0.0], np.geomspace(THINK_MIN, 10_000, 284)])
+THINK_STEP = np.log(THINK_EDGES[2] / THINK_EDGES[1])
+
+
+def archive_teams(directory):
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+        return tuple(json.load(f)["teams"])
+
+
+def open_archive(directory):
+    """(parties, coups, équipes) d'une archive, tables en mémoire projetée (exploration)."""
+    games = np.load(os.path.join(directory, "games.npy"), mmap_mode="r")
+    moves = np.load(os.path.join(directory, "moves.npy"), mmap_mode="r")
+    return games, moves, archive_teams(directory)
+
+
+class _Table:
+    # Lecture de lignes d'un .npy par position, sans projection : les pages lues ne restent pas
+    # attachées au processus (une projection garderait en mémoire toute l'archive parcourue)
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        version = np.lib.format.read_magic(self.file)
+        read = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, _, self.dtype = read(self.file)
+        self.rows = shape[0]
+        self.offset = self.file.tell()
+
+    def read(self, start, stop):
+        self.file.seek(self.offset + start * self.dtype.itemsize)
+        return np.fromfile(self.file, dtype=self.dtype, count=stop - start)
+
+    def close(self):
+        self.file.close()
+
+
+def chunks(directory, rows=65_536):
+    """Tranches (première ligne, parties, leurs coups) ; les coups d'une partie sont contigus."""
+    games, moves = _Table(os.path.join(directory, "games.npy")), _Table(os.path.join(directory, "moves.npy"))
+    try:
+        for start in range(0, games.rows, rows):
+            part = games.read(start, min(start + rows, games.rows))
+            first = int(part["move_start"][0])
+            end = int(part["move_start"][-1]) + int(part["moves"][-1])
+            yield start, part, moves.read(first, end)
+    finally:
+        games.close()
+        moves.close()
+
+
+def _quantiles(counts, qs):
+    # Borne haute du premier intervalle qui atteint chaque quantile
+    total = counts.sum()
+    if not total:
+        return [None] * len(qs)
+    reached = np.searchsorted(np.cumsum(counts), np.asarray(qs) * total)
+    return [float(THINK_EDGES[min(i + 1, len(THINK_EDGES) - 1)]) for i in reached]
+
+
+class GameStats:
+    """Agrégats des parties et des coups, accumulés tranche par tranche (`add`)."""
+
+    def __init__(self, teams):
+        self.teams = tuple(teams)
+        t = len(self.teams)
+        self.games = 0
+        self.outcomes = np.zeros(t + 2, dtype=np.int64)  # nul, interrompue, puis chaque équipe
+        self.duration = 0.0
+        self.attempts = np.zeros((2, t), dtype=np.int64)  # [bot][équipe]
+        self.solved = np.zeros((2, t), dtype=np.int64)
+        self.think = np.zeros((2, 2, len(THINK_EDGES)), dtype=np.int64)  # [bot][réussi][intervalle]
+        self.think_sum = np.zeros((2, 2))
+        self.yellow = {}  # taille de grille -> [parties, cases jaunes par position]
+        self.first_solver = np.zeros(3, dtype=np.int64)  # gagnée, nulle, perdue
+        self.first_mover = np.zeros(3, dtype=np.int64)
+        self._challenge_keys = np.empty(0, dtype=np.uint64)  # triées
+        self._challenge_attempts = np.empty(0, dtype=np.int64)
+        self._challenge_solved = np.empty(0, dtype=np.int64)
+
+    def add(self, offset, games, moves):
+        """Ajoute une tranche : `games` commence à la ligne `offset`, `moves` sont tous ses coups."""
+        t = len(self.teams)
+        winner = games["winner"].astype(np.int64)
+        self.games += len(games)
+        self.outcomes += np.bincount(winner - WINNER_DRAW, minlength=t + 2)
+        self.duration += float(games["duration"].sum(dtype=np.float64))
+        self._add_yellow(games["grid_size"], games["yellow"])
+
+        team = moves["team"].astype(np.int64)
+        ok = moves["ok"]
+        bot = moves["bot"].astype(np.int64)
+        self.attempts += np.bincount(bot * t + team, minlength=2 * t).reshape(2, t)
+        self.solved += np.bincount(bot * t + team, weights=ok, minlength=2 * t).astype(np.int64).reshape(2, t)
+
+        think = moves["think"].astype(np.float64)
+        group = bot * 2 + ok
+        # Intervalle calculé par logarithme (pas constant) plutôt que cherché parmi les bornes
+        bins = np.where(think < THINK_MIN, 0, np.log(np.maximum(think, THINK_MIN) / THINK_MIN) // THINK_STEP + 1)
+        bins = np.minimum(bins, len(THINK_EDGES) - 1).astype(np.int64)
+        self.think += np.bincount(group * len(THINK_EDGES) + bins, minlength=4 * len(THINK_EDGES)).reshape(self.think.shape)
+        self.think_sum += np.bincount(group, weights=think, minlength=4).reshape(2, 2)
+
+        local = moves["game"].astype(np.int64) - offset
+        # Première case réussie de chaque partie : son équipe a-t-elle gagné ? Les coups sont
+        # dans l'ordre des parties, le premier d'une partie est celui où `local` change
+        solved_at = np.flatnonzero(ok)
+        first = solved_at[np.flatnonzero(np.diff(local[solved_at], prepend=-1))]
+        self.first_solver += self._outcome(team[first], winner[local[first]])
+        first = np.flatnonzero(np.diff(local, prepend=-1))
+        self.first_mover += self._outcome(team[first], winner[local[first]])
+
+        self._add_challenges(moves["challenge"], ok)
+
+    def _add_yellow(self, grid_size, yellow):
+        for n in np.unique(grid_size).tolist():
+            masks = yellow[grid_size == n]
+            bits = mask_bits(masks, n * n)
+            entry = self.yellow.setdefault(n, [0, np.zeros(n * n, dtype=np.int64)])
+            entry[0] += len(masks)
+            entry[1] += bits.sum(axis=0, dtype=np.int64)
+
+    @staticmethod
+    def _outcome(team, winner):
+        # Parties terminées seulement : (gagnées, nulles, perdues) par l'équipe `team`
+        done = winner != WINNER_NONE
+        team, winner = team[done], winner[done]
+        won = int((winner == team).sum())
+        drawn = int((winner == WINNER_DRAW).sum())
+        return np.array([won, drawn, len(winner) - won - drawn])
+
+    def _add_challenges(self, challenge, ok):
+        # Comptes de la tranche (tris seuls), puis fusion avec les défis déjà vus (quelques milliers)
+        keys, attempts = np.unique(challenge[challenge != 0], return_counts=True)
+        won, count = np.unique(challenge[ok & (challenge != 0)], return_counts=True)
+        solved = np.zeros(len(keys), dtype=np.int64)
+        solved[np.searchsorted(keys, won)] = count
+        keys = np.concatenate([self._challenge_keys, keys])
+        attempts = np.concatenate([self._challenge_attempts, attempts])
+        solved = np.concatenate([self._challenge_solved, solved])
+        self._challenge_keys, inverse = np.unique(keys, return_inverse=True)
+        self._challenge_attempts = np.bincount(inverse, weights=attempts).astype(np.int64)
+        self._challenge_solved = np.bincount(inverse, weights=solved).astype(np.int64)
+
+    def report(self, min_attempts=5, hardest=10):
+        def rate(num, den):
+            return round(float(num) / den, 4) if den else None
+
+        def outcome(counts):
+            won, drawn, lost = counts.tolist()
+            return {"games": won + drawn + lost, "won": won, "drawn": drawn, "lost": lost,
+                    "win_rate": rate(won, won + drawn + lost)}
+
+        def think(bot):
+            counts = self.think[bot].sum(axis=0)
+            p50, p90, p99 = _quantiles(counts, (0.5, 0.9, 0.99))
+            return {"moves": int(counts.sum()), "mean": rate(self.think_sum[bot].sum(), counts.sum()),
+                    "p50": p50, "p90": p90, "p99": p99,
+                    "mean_solved": rate(self.think_sum[bot, 1], self.think[bot, 1].sum()),
+                    "mean_failed": rate(self.think_sum[bot, 0], self.think[bot, 0].sum())}
+
+        often = np.flatnonzero(self._challenge_attempts >= min_attempts)
+        rates = self._challenge_solved[often] / np.maximum(self._challenge_attempts[often], 1)
+        worst = often[np.argsort(rates, kind="stable")[:hardest]]
+        outcomes = self.outcomes.tolist()
+        return {
+            "games": self.games,
+            "outcomes": dict(zip(("draw", "none") + self.teams, outcomes)),
+            "mean_duration": rate(self.duration, self.games),
+            "solve_rate": {
+                "all": rate(self.solved.sum(), self.attempts.sum()),
+                "humans": rate(self.solved[0].sum(), self.attempts[0].sum()),
+                "bots": rate(self.solved[1].sum(), self.attempts[1].sum()),
+                "by_team": {team: rate(self.solved[:, i].sum(), self.attempts[:, i].sum())
+                            for i, team in enumerate(self.teams)},
+            },
+            "think_seconds": {"humans": think(0), "bots": think(1)},
+            "yellow": {
+                str(n): {"games": games, "per_game": rate(counts.sum(), games),
+                         "by_cell": (counts / max(games, 1)).round(4).reshape(n, n).tolist()}
+                for n, (games, counts) in sorted(self.yellow.items())
+            },
+            "first_solver": outcome(self.first_solver),
+            "first_mover": outcome(self.first_mover),
+            "challenges": {
+                "count": len(self._challenge_keys),
+                "hardest": [{"challenge": f"{int(self._challenge_keys[i]):016x}",
+                             "attempts": int(self._challenge_attempts[i]),
+                             "solve_rate": rate(self._challenge_solved[i], self._challenge_attempts[i])}
+                            for i in worst.tolist()],
+            },
+        }
+
+
+def analyse(directories, rows=65_536):
+    """Agrégats de une ou plusieurs archives (une par processus écrivain), tranche par tranche."""
+    stats = None
+    for directory in directories:
+        teams = archive_teams(directory)
+        if stats is None:
+            stats = GameStats(teams)
+        elif teams != stats.teams:
+            raise ValueError(f"{directory} : équipes {teams} au lieu de {stats.teams}")
+        for offset, part, part_moves in chunks(directory, rows):
+            stats.add(offset, part, part_moves)
+    return stats
+
+
+def print_report(report):
+    print(f"{report['games']} parties, durée moyenne {report['mean_duration']} s")
+    print("issues :", ", ".join(f"{k} {v}" for k, v in report["outcomes"].items()))
+    solve = report["solve_rate"]
+    print(f"défis réussis : {solve['all']} (joueurs {solve['humans']}, bots {solve['bots']}) ;",
+          ", ".join(f"{k} {v}" for k, v in solve["by_team"].items()))
+    for who, think in report["think_seconds"].items():
+        if think["moves"]:
+            print(f"réflexion {who} : {think['moves']} coups, moyenne {think['mean']} s, p50 {think['p50']:.2f} s, "
+                  f"p90 {think['p90']:.2f} s, p99 {think['p99']:.2f} s (réussis {think['mean_solved']} s, "
+                  f"ratés {think['mean_failed']} s)")
+    for n, yellow in report["yellow"].items():
+        print(f"cases jaunes, grille {n}×{n} : {yellow['per_game']} par partie ({yellow['games']} parties)")
+        for row in yellow["by_cell"]:
+            print("   " + " ".join(f"{v:5.1%}" for v in row))
+    for key, label in (("first_solver", "premier défi réussi"), ("first_mover", "premier coup")):
+        o = report[key]
+        print(f"{label} : gagne {o['won']}, nul {o['drawn']}, perd {o['lost']} (taux de victoire {o['win_rate']})")
+    hardest = report["challenges"]["hardest"]
+    print(f"{report['challenges']['count']} défis distincts" + (", les plus ratés :" if hardest else ""))
+    for c in hardest:
+        print(f"   {c['challenge']}  {c['attempts']:>6} essais  {c['solve_rate']:.1%} réussis")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Statistiques des parties archivées.")
+    parser.add_argument("directories", nargs="+", help="répertoires d'archive (GAME_ARCHIVE_DIR)")
+    parser.add_argument("--chunk", type=int, default=65_536, help="parties lues par tranche")
+    parser.add_argument("--min-attempts", type=int, default=5, help="essais minimum pour classer un défi")
+    parser.add_argument("--json", action="store_true", help="rapport en JSON")
+    args = parser.parse_args()
+    stats = analyse(args.directories, args.chunk)
+    if stats is None:
+        sys.exit("aucune archive")
+    report = stats.report(args.min_attempts)
+    if args.json:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,609 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, Response, jsonify, make_response, render_template, request, redirect, url_for, flash, session
+from flask_socketio import SocketIO, join_room, emit
 import os
+import sys
+import hashlib
 import uuid
+import random
 import json
+import re
+import threading
+import time
 import traceback
-import ollama  # client Ollama
+from challenge_pool import ChallengePool
+from llm_gateway import LLMGateway, LLMUnavailable
+from model_router import ModelRouter
+from admission import AdmissionQueue, CircuitBreaker, Rejected
+from challenge_stream import StreamRegistry
+from challenge_schema import CHALLENGE_SCHEMA, ChallengeGenerator
+from sandbox import SandboxRunner, usable_tests, function_name, describe_failure
+from challenge_store import ChallengeStore, challenge_hash
+from similarity import SimilarityIndex
+from verify_cache import VerificationCache
+from page_cache import RenderCache
+from change_feed import ChangeFeed
+from spectators import SpectatorHub
+from bot_engine import choose_move
+from win_engine import WinTracker
+from game_store import GameStore
+from journal import GameJournal
+from game_archive import GameArchive, WINNER_DRAW, WINNER_NONE
+from state_backend import ConflictError, make_backend
+from metrics import CONTENT_TYPE, MetricsRegistry
+from lifecycle import Lifecycle
+from tournament import Tournament
 
-ollama_client = ollama.Client()
+# Phases de démarrage (préchargement du modèle, premier défi) : voir start_lifecycle
+lifecycle = Lifecycle()
+
+metrics = MetricsRegistry(prefix="morpion_")
+HTTP_LATENCY = metrics.histogram("http_request_duration_seconds", "Durée des requêtes par route", ("endpoint", "method"))
+HTTP_REQUESTS = metrics.counter("http_requests_total", "Requêtes par route et statut", ("endpoint", "method", "status"))
+HTTP_IN_FLIGHT = metrics.gauge("http_requests_in_flight", "Requêtes en cours par route", ("endpoint",))
+LLM_CALLS = metrics.counter("llm_calls_total", "Appels au modèle par usage et issue", ("purpose", "outcome"))
+LLM_WAIT = metrics.histogram("llm_queue_wait_seconds", "Attente d'une place dans la passerelle", ("purpose",))
+LLM_DURATION = metrics.histogram("llm_call_duration_seconds", "Durée des appels au modèle", ("purpose",))
+LLM_LOAD = metrics.histogram("llm_load_duration_seconds", "Chargement du modèle (load_duration d'Ollama)", ("purpose",))
+LLM_EVAL_TOKENS = metrics.counter("llm_eval_tokens_total", "Jetons générés (eval_count)", ("purpose",))
+LLM_PROMPT_TOKENS = metrics.counter("llm_prompt_tokens_total", "Jetons de prompt évalués (prompt_eval_count)", ("purpose",))
+LLM_EVAL_SECONDS = metrics.counter("llm_eval_seconds_total", "Temps de génération (eval_duration)", ("purpose",))
+PARSE_FAILURES = metrics.counter("json_parse_failures_total", "Réponses du modèle sans JSON exploitable", ("purpose",))
+CHALLENGE_DUPLICATES = metrics.counter("challenge_duplicates_total", "Défis générés proches d'un défi stocké : rejetés (régénérés) ou fusionnés", ("outcome",))
+VERDICTS = metrics.counter("verdicts_total", "Verdicts rendus sur les solutions", ("source", "result"))
+
+
+def observe_llm_call(purpose, outcome, waited, duration, response):
+    purpose = purpose or "other"
+    LLM_CALLS.inc(purpose=purpose, outcome=outcome)
+    LLM_WAIT.observe(waited, purpose=purpose)
+    if outcome != "ok":
+        return
+    LLM_DURATION.observe(duration, purpose=purpose)
+    get = getattr(response, "get", None)
+    if not get:
+        return
+    # Durées Ollama en nanosecondes
+    if get("load_duration"): LLM_LOAD.observe(get("load_duration") / 1e9, purpose=purpose)
+    if get("eval_count"): LLM_EVAL_TOKENS.inc(get("eval_count"), purpose=purpose)
+    if get("prompt_eval_count"): LLM_PROMPT_TOKENS.inc(get("prompt_eval_count"), purpose=purpose)
+    if get("eval_duration"): LLM_EVAL_SECONDS.inc(get("eval_duration") / 1e9, purpose=purpose)
+
+
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2:3b")
+# La vérification peut se contenter d'un modèle plus petit, donc plus rapide
+OLLAMA_VERIFY_MODEL = os.environ.get("OLLAMA_VERIFY_MODEL", OLLAMA_MODEL)
+# Durée pendant laquelle Ollama garde le modèle en mémoire après chaque appel
+MODEL_KEEP_ALIVE = os.environ.get("MODEL_KEEP_ALIVE", "30m")
+
+# Ordre de passage dans la file de la passerelle (plus petit d'abord) : un joueur qui attend
+# son verdict passe avant la génération pour qui attend un défi, la pré-génération en dernier
+LLM_PRIORITIES = {"verify": 0, "solve": 1, "generate": 1, "repair": 1, "warmup": 2, "keep_alive": 3, "pregenerate": 4}
+
+# Après LLM_BREAKER_THRESHOLD échecs d'affilée (délais dépassés, erreurs), plus d'appel à Ollama
+# pendant LLM_BREAKER_COOLDOWN secondes : les demandes échouent tout de suite
+llm_breaker = CircuitBreaker(
+    threshold=int(os.environ.get("LLM_BREAKER_THRESHOLD", 5)),
+    cooldown=float(os.environ.get("LLM_BREAKER_COOLDOWN", 30)),
+)
+
+# Serveurs Ollama : OLLAMA_BACKENDS="hôte [modèle] [usage=modèle …]; hôte …", sinon OLLAMA_HOST seul.
+# Chaque appel va au serveur sain le plus rapide ; un appel lent est relancé sur un autre
+llm_router = ModelRouter.parse(
+    os.environ.get("OLLAMA_BACKENDS") or os.environ.get("OLLAMA_HOST") or "",
+    {"*": OLLAMA_MODEL, "verify": OLLAMA_VERIFY_MODEL},
+    max_error_rate=float(os.environ.get("LLM_MAX_ERROR_RATE", 0.5)),
+    hedge_min=float(os.environ.get("LLM_HEDGE_MIN", 1.0)) if os.environ.get("LLM_HEDGE", "1") == "1" else None,
+    hedge_budget=float(os.environ.get("LLM_HEDGE_BUDGET", 0.1)),
+)
+
+# Client Ollama asynchrone partagé (un par serveur), concurrence bornée
+llm_gateway = LLMGateway(
+    max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", 4 * len(llm_router.backends))),
+    max_connections=int(os.environ.get("LLM_MAX_CONNECTIONS", 8)),
+    timeout=float(os.environ.get("LLM_TIMEOUT", 120)),
+    observer=observe_llm_call,
+    defaults={"keep_alive": MODEL_KEEP_ALIVE},
+    priorities=LLM_PRIORITIES,
+    default_priority=2,
+    breaker=llm_breaker,
+    router=llm_router,
+)
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "change_this_secret")
+socketio = SocketIO(app, async_mode=os.environ.get("SOCKETIO_ASYNC_MODE", "threading"))
+
+# Répertoire du journal des parties (vide : pas de journal, parties perdues au redémarrage)
+GAME_JOURNAL_DIR = os.environ.get("GAME_JOURNAL_DIR", "journal")
+# Secondes sans activité après lesquelles une partie est retirée (cache local et backend partagé)
+GAME_IDLE_TTL = int(os.environ.get("GAME_IDLE_TTL", 7200))
+games = GameStore(
+    idle_ttl=GAME_IDLE_TTL,
+    finished_ttl=int(os.environ.get("GAME_FINISHED_TTL", 900)),
+    max_games=int(os.environ.get("GAME_STORE_MAX_GAMES", 10000)),
+    max_bytes=int(os.environ.get("GAME_STORE_MAX_MB", 256)) * 1024 * 1024,
+    sweep_interval=int(os.environ.get("GAME_STORE_SWEEP_INTERVAL", 30)),
+    size_of=lambda g: g.approx_size(),
+    # memory (défaut, un seul processus), sqlite:///games.db, local-redis ou redis://...
+    backend=make_backend(os.environ.get("GAME_BACKEND", "memory"), ttl=GAME_IDLE_TTL),
+    to_state=lambda g: g.to_state(),
+    from_state=lambda state: Game.from_state(state),
+    # Sans backend partagé : parties journalisées sur disque, relues au démarrage
+    journal=GameJournal(
+        GAME_JOURNAL_DIR,
+        to_state=lambda g: g.to_state(),
+        from_state=lambda state: Game.from_state(state),
+        diff=lambda before, g: g.journal_events(before),
+        apply=lambda g, event: g.apply_event(event),
+        fsync_interval=float(os.environ.get("GAME_JOURNAL_FSYNC_MS", 50)) / 1000,
+        snapshot_every=int(os.environ.get("GAME_JOURNAL_SNAPSHOT_EVERY", 200)),
+        compact_bytes=int(os.environ.get("GAME_JOURNAL_COMPACT_MB", 64)) * 1024 * 1024,
+    ) if GAME_JOURNAL_DIR else None,
+    on_remove=lambda game_id: forget_game(game_id),
+)
+
+CHALLENGE_PROMPT=("Génère une question de programmation en Python au format JSON avec ces clés:\n"
+                  "- description: énoncé du problème,\n"
+                  "- function_name: def nom_de_la_fonction\n"
+                  "- précisions: le problème doit se baser sur des listes de nombre, et des concepts algorithmique,\n"
+                  "- tests: liste d'objets {input: liste d'arguments, output: résultat attendu}.\n"
+                  "Fournis uniquement l'objet JSON.")
+
+
+challenge_generator = ChallengeGenerator(
+    CHALLENGE_PROMPT,
+    max_attempts=int(os.environ.get("CHALLENGE_MAX_ATTEMPTS", 3)),
+)
+
+
+def response_text(resp):
+    raw=getattr(resp,'response',None) or resp.get('response') or resp.get('text')
+    if not raw and resp.get('choices'): raw=resp['choices'][0].get('text') or (resp['choices'][0].get('message') or {}).get('content')
+    return raw
+
+
+def schema_call(tag=None,background=False):
+    # Sortie JSON contrainte par le schéma (paramètre format d'Ollama)
+    def call(prompt,schema):
+        purpose='generate' if prompt is CHALLENGE_PROMPT else 'repair'
+        # Réserve : personne n'attend ce défi, ses réparations passent aussi en dernier
+        priority=LLM_PRIORITIES['pregenerate'] if background else None
+        if background and purpose=='generate': purpose='pregenerate'
+        return response_text(llm_gateway.generate(prompt=prompt,format=schema,stream=False,tag=tag,
+                                                  purpose=purpose,priority=priority))
+    return call
+
+
+def generate_challenge_data(tag=None,background=False):
+    return challenge_generator.generate(schema_call(tag,background))
+
+
+def verify_with_llm(challenge,code,tag=None):
+    verify_prompt=("Vérifie en Python si le code résout le défi donné. Répond uniquement JSON avec { \"result\": \"OK\" ou \"KO\", \"errors\": [...] }\n"
+                   f"Défi: {json.dumps(challenge)}\nCode du joueur:\n```python\n{code}\n```\n")
+    resp=llm_gateway.generate(prompt=verify_prompt,stream=False,tag=tag,purpose='verify')
+    raw=(response_text(resp) or '').strip('` \n')
+    # extraire JSON substring
+    jstart=raw.find('{')
+    jend=raw.rfind('}')
+    json_part=raw[jstart:jend+1] if jstart!=-1 and jend!=-1 else raw
+    try:
+        result=json.loads(json_part)
+    except Exception:
+        # Pas de verdict exploitable : à ne pas mémoriser
+        PARSE_FAILURES.inc(purpose='verify')
+        return False,f"Réponse IA invalide: {raw}",False
+    if result.get("result")!="OK":
+        return False,"Wrong Answer (IA)",True
+    return True,"Bonne réponse.",True
+
+
+challenge_store = ChallengeStore(
+    os.environ.get("CHALLENGE_STORE_PATH", "challenges.db"),
+    cache_size=int(os.environ.get("CHALLENGE_STORE_CACHE", 256)),
+)
+# Servir d'abord les défis déjà stockés avant de payer un appel au modèle
+CHALLENGE_STORE_REUSE = os.environ.get("CHALLENGE_STORE_REUSE", "1") == "1"
+
+# Quasi-doublons (énoncé reformulé, mêmes tests…) : similarité à partir de laquelle
+# un défi généré est confondu avec un défi stocké
+challenge_index = SimilarityIndex(threshold=float(os.environ.get("CHALLENGE_SIMILARITY", 0.6)))
+CHALLENGE_DEDUP_ATTEMPTS = int(os.environ.get("CHALLENGE_DEDUP_ATTEMPTS", 3))
+
+
+def store_challenge(data):
+    """Stocke un défi généré ; renvoie (cid, défi, fusionné).
+
+    Un quasi-doublon d'un défi déjà stocké n'est pas stocké une seconde fois :
+    le défi existant est renvoyé à sa place.
+    """
+    signature=challenge_index.signature(data)
+    match=challenge_index.nearest(signature=signature)
+    existing=challenge_store.get(match[0]) if match else None
+    if existing is not None:
+        return match[0],existing,True
+    cid=challenge_store.put(data)
+    challenge_index.add(cid,signature=signature)
+    return cid,data,False
+
+
+def generate_and_store_challenge(tag=None,background=False,avoid=()):
+    # Un quasi-doublon n'apporte rien à la réserve : on régénère. Pour un joueur, il est fusionné
+    # avec le défi stocké, sauf si celui-ci est à éviter (déjà posé dans la partie)
+    for _ in range(CHALLENGE_DEDUP_ATTEMPTS):
+        cid,data,merged=store_challenge(generate_challenge_data(tag,background))
+        if not merged or (not background and cid not in avoid): break
+        CHALLENGE_DUPLICATES.inc(outcome="rejected")
+    if merged: CHALLENGE_DUPLICATES.inc(outcome="merged")
+    return data
+
+
+def load_challenge_index():
+    # Signatures des défis déjà stockés, indexées par lots
+    keys,signatures=[],[]
+    for cid,data in challenge_store.items():
+        keys.append(cid)
+        signatures.append(challenge_index.signature(data))
+        if len(keys)>=4096:
+            challenge_index.add_many(keys,signatures)
+            keys,signatures=[],[]
+    if keys: challenge_index.add_many(keys,signatures)
+
+
+# Générations en flux vers la page de chargement, par (game_id, row, col)
+challenge_streams = StreamRegistry()
+
+
+def start_streamed_challenge(game_id,row,col,tag,gen,on_done=None):
+    key=(game_id,row,col)
+
+    def finish(future):
+        try:
+            # Le texte reçu en flux compte comme premier appel ; réparation éventuelle ensuite
+            data=challenge_generator.generate(schema_call(tag),first_raw=future.result())
+            cid,data,merged=store_challenge(data)
+            g=games.get(game_id)
+            if merged and g and cid in g.avoided_challenge_ids():
+                # Doublon d'une autre case de la partie : nouvelle génération, sans flux cette fois.
+                # L'énoncé déjà affiché change : la soumission le détecte (statement_tag) et fait relire
+                CHALLENGE_DUPLICATES.inc(outcome="rejected")
+                data=generate_and_store_challenge(tag,avoid=g.avoided_challenge_ids())
+            elif merged: CHALLENGE_DUPLICATES.inc(outcome="merged")
+            games.update(game_id,lambda g: g.challenge_at(row,col) or g.set_challenge(row,col,data))
+            gen.finish(data)
+        except Exception as e:
+            traceback.print_exc()
+            gen.finish(error=str(e) or type(e).__name__)
+        finally:
+            challenge_streams.remove(key)
+            if on_done: on_done()
+
+    try:
+        future=llm_gateway.stream(gen.feed,tag=tag,purpose='generate',prompt=CHALLENGE_PROMPT,format=CHALLENGE_SCHEMA)
+    except Exception:
+        if on_done: on_done()
+        raise
+    # Stockage et mise à jour de la partie hors du thread de la boucle asyncio
+    future.add_done_callback(lambda f: threading.Thread(target=finish,args=(f,),daemon=True).start())
+
+
+challenge_pool = ChallengePool(
+    lambda: generate_and_store_challenge(background=True),
+    target=int(os.environ.get("CHALLENGE_POOL_SIZE", 4)),
+    max_size=int(os.environ.get("CHALLENGE_POOL_MAX", 32)),
+)
+
+sandbox_runner = SandboxRunner(
+    workers=int(os.environ.get("SANDBOX_WORKERS", 2)),
+    cpu_seconds=int(os.environ.get("SANDBOX_CPU_SECONDS", 2)),
+    memory_mb=int(os.environ.get("SANDBOX_MEMORY_MB", 256)),
+    test_timeout=float(os.environ.get("SANDBOX_TEST_TIMEOUT", 1.0)),
+)
+
+# Verdicts déjà rendus : une même solution re-soumise ne repasse ni par le bac à sable ni par le modèle
+verification_cache = VerificationCache(max_entries=int(os.environ.get("VERIFY_CACHE_SIZE", 4096)))
+
+
+def verify_solution(challenge,code,cid=None,tag=None):
+    cid=cid or challenge_hash(challenge)
+    verdict=verification_cache.get(cid,code)
+    if verdict is not None:
+        VERDICTS.inc(source='cache',result='ok' if verdict[0] else 'ko')
+        return verdict
+    if usable_tests(challenge):
+        # Vérification déterministe par exécution des tests, sans appel au modèle
+        report=sandbox_runner.run(code,challenge)
+        ok,msg=report["ok"],("Bonne réponse." if report["ok"] else describe_failure(function_name(challenge),report))
+        definitive=not report.get("transient")
+        source='sandbox'
+    else:
+        ok,msg,definitive=verify_with_llm(challenge,code,tag)
+        source='llm'
+    VERDICTS.inc(source=source,result='ok' if ok else ('ko' if definitive else 'invalid'))
+    if definitive: verification_cache.put(cid,code,(ok,msg))
+    return ok,msg
+
+
+# Files bornées devant les routes qui attendent le modèle ou le bac à sable : au-delà, 429 immédiat
+ADMISSION_MAX_WAIT = float(os.environ.get("ADMISSION_MAX_WAIT", 30))
+admission = {
+    "generate": AdmissionQueue(
+        "generate",
+        max_active=int(os.environ.get("ADMISSION_GENERATE_ACTIVE", os.environ.get("LLM_MAX_CONCURRENCY", 4))),
+        max_queue=int(os.environ.get("ADMISSION_GENERATE_QUEUE", 16)),
+        max_wait=ADMISSION_MAX_WAIT,
+        per_game=int(os.environ.get("ADMISSION_PER_GAME", 2)),
+        per_session=int(os.environ.get("ADMISSION_PER_SESSION", 1)),
+    ),
+    "verify": AdmissionQueue(
+        "verify",
+        max_active=int(os.environ.get("ADMISSION_VERIFY_ACTIVE", 8)),
+        max_queue=int(os.environ.get("ADMISSION_VERIFY_QUEUE", 32)),
+        max_wait=ADMISSION_MAX_WAIT,
+        per_game=int(os.environ.get("ADMISSION_PER_GAME", 2)),
+        per_session=int(os.environ.get("ADMISSION_PER_SESSION", 1)),
+    ),
+}
+
+
+def session_key():
+    # Identifiant du navigateur : le nom du joueur peut se répéter d'une partie à l'autre
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+
+def busy_response(e, game_id):
+    """429 (file pleine, limite atteinte) ou 503 (modèle coupé par le disjoncteur), avec Retry-After."""
+    status = 503 if isinstance(e, LLMUnavailable) else 429
+    body = render_template("busy.html", message=str(e), retry_after=e.retry_after, queued=getattr(e, "queued", 0),
+                           game_id=game_id, form=request.form if request.method == "POST" else None)
+    response = make_response(body, status)
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+
+TEAMS = ('red', 'blue')
+# Mode solo : temps de réflexion par coup et taux de réussite des défis des bots
+BOT_TIME_BUDGET = float(os.environ.get("BOT_TIME_BUDGET", 0.3))
+BOT_ACCURACY = float(os.environ.get("BOT_ACCURACY", 0.75))
+CELL_VALUES = ('', 'red', 'blue', 'yellow')
+CELL_CODES = {v: i for i, v in enumerate(CELL_VALUES)}
+
+# Parties terminées archivées en colonnes pour l'analyse (python analytics.py archive) ; vide : pas d'archive.
+# Un répertoire par processus : avec plusieurs workers, GAME_ARCHIVE_DIR doit différer pour chacun
+GAME_ARCHIVE_DIR = os.environ.get("GAME_ARCHIVE_DIR", "archive")
+game_archive = GameArchive(
+    GAME_ARCHIVE_DIR, TEAMS, flush_interval=float(os.environ.get("GAME_ARCHIVE_FLUSH_MS", 1000)) / 1000,
+) if GAME_ARCHIVE_DIR else None
+
+
+class CellView:
+    """Vue en lecture d'une case, avec l'interface dict des anciennes cases (templates, routes)."""
+    __slots__ = ("_game", "_idx")
+
+    KEYS = ("owner", "first_solver", "failed", "yellow", "challenge", "challenge_id")
+
+    def __init__(self, game, idx):
+        self._game = game
+        self._idx = idx
+
+    @property
+    def owner(self):
+        bit = 1 << self._idx
+        return next((t for t, mask in zip(TEAMS, self._game._owner) if mask & bit), None)
+
+    @property
+    def first_solver(self):
+        code = self._game._first_solver[self._idx]
+        return TEAMS[code - 1] if code else None
+
+    @property
+    def failed(self):
+        bit = 1 << self._idx
+        return {t for t, mask in zip(TEAMS, self._game._failed) if mask & bit}
+
+    @property
+    def yellow(self):
+        return bool(self._game._yellow >> self._idx & 1)
+
+    @property
+    def challenge_id(self):
+        return self._game._challenge_ids.get(self._idx)
+
+    @property
+    def challenge(self):
+        cid = self.challenge_id
+        return challenge_store.get(cid) if cid else None
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self.KEYS else default
 
-games = {}
 
 class Game:
-    def __init__(self, num_players):
+    # Représentation compacte : grille en bytearray, états des cases en bitmasks
+    # (bit r * grid_size + c), défis référencés par leur hash dans challenge_store.
+    # `version` augmente à chaque modification visible (joueurs, cases, tour, gagnant) : clé des ETag.
+    __slots__ = ("num_players", "grid_size", "win_count", "wins", "players", "_turn", "_winner", "version",
+                 "_board", "_owner", "_yellow", "_failed", "_first_solver", "_challenge_ids", "started", "_moves")
+
+    def __init__(self, num_players, grid_size=None, win_count=None):
         self.num_players = num_players
-        self.grid_size = 3 if num_players == 2 else 5
-        self.grid = [['' for _ in range(self.grid_size)] for _ in range(self.grid_size)]
-        self.cells = [[{"owner":None,"first_solver":None,"failed":set(),"yellow":False,"challenge":None} for _ in range(self.grid_size)] for _ in range(self.grid_size)]
-        self.win_count = 3 if num_players == 2 else 5
+        self.grid_size = grid_size or (3 if num_players == 2 else 5)
+        n = self.grid_size * self.grid_size
+        self._board = bytearray(n)  # index dans CELL_VALUES
+        self._owner = [0] * len(TEAMS)  # cases possédées, par équipe
+        self._yellow = 0
+        self._failed = [0] * len(TEAMS)  # cases ratées, par équipe
+        self._first_solver = bytearray(n)  # 0 = personne, sinon 1 + index d'équipe
+        self._challenge_ids = {}  # index de case -> hash du défi
+        self.win_count = win_count or self.grid_size
+        self.wins = WinTracker(self.grid_size, self.win_count)
         self.players=[]
-        self.current_turn=0
-        self.winner=None
+        self._turn=0
+        self._winner=None
+        self.version=0
+        self.started=time.time()  # puis arrivée du dernier joueur : début du jeu
+        self._moves=[]  # (instant depuis `started`, case, équipe, réussi, bot) : pour l'archive
+
+    @property
+    def current_turn(self):
+        return self._turn
+
+    @current_turn.setter
+    def current_turn(self,value):
+        if value!=self._turn: self._turn=value; self.version+=1
+
+    @property
+    def winner(self):
+        return self._winner
+
+    @winner.setter
+    def winner(self,value):
+        if value!=self._winner: self._winner=value; self.version+=1
+
+    @property
+    def grid(self):
+        n=self.grid_size
+        return [[CELL_VALUES[self._board[r*n+c]] for c in range(n)] for r in range(n)]
+
+    @property
+    def cells(self):
+        n=self.grid_size
+        return [[CellView(self,r*n+c) for c in range(n)] for r in range(n)]
+
+    def approx_size(self):
+        # Estimation pour le plafond mémoire de GameStore (défis comptés dans challenge_store)
+        size=sys.getsizeof(self)+sys.getsizeof(self._board)+sys.getsizeof(self._first_solver)
+        size+=sum(sys.getsizeof(m) for m in self._owner+self._failed)+sys.getsizeof(self._yellow)
+        size+=sys.getsizeof(self._challenge_ids)+sum(sys.getsizeof(c) for c in self._challenge_ids.values())
+        size+=sys.getsizeof(self.players)+sum(sys.getsizeof(p)+sum(sys.getsizeof(v) for v in p.values()) for p in self.players)
+        size+=sys.getsizeof(self._moves)+sum(sys.getsizeof(m) for m in self._moves)
+        return size+self.wins.approx_size()
+
+    def to_state(self):
+        return {
+            "num_players": self.num_players, "grid_size": self.grid_size, "win_count": self.win_count,
+            "players": [dict(p) for p in self.players], "current_turn": self.current_turn, "winner": self.winner,
+            "board": self._board.hex(), "owner": list(self._owner), "yellow": self._yellow,
+            "failed": list(self._failed), "first_solver": self._first_solver.hex(),
+            "challenge_ids": {str(i): cid for i, cid in self._challenge_ids.items()},
+            "version": self.version, "started": self.started, "moves": [list(m) for m in self._moves],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        g=cls(state["num_players"],state["grid_size"],state["win_count"])
+        n=g.grid_size
+        for idx,code in enumerate(bytes.fromhex(state["board"])):
+            if code: g.set_cell(idx//n,idx%n,CELL_VALUES[code])
+        g._owner=list(state["owner"])
+        g._yellow=state["yellow"]
+        g._failed=list(state["failed"])
+        g._first_solver=bytearray.fromhex(state["first_solver"])
+        g._challenge_ids={int(i): cid for i, cid in state["challenge_ids"].items()}
+        g.players=state["players"]
+        g.current_turn=state["current_turn"]
+        g.winner=state["winner"]
+        g.version=state.get("version",0)
+        g.started=state.get("started",g.started)
+        g._moves=[tuple(m) for m in state.get("moves",())]
+        return g
 
-    def add_player(self,name,team,role=None):
+    def journal_events(self,before):
+        """Événements menant de l'état `before` (to_state) à l'état courant, pour le journal."""
+        events=[{"t":"join","p":dict(p)} for p in self.players[len(before["players"]):]]
+        old_ids=before["challenge_ids"]
+        events+=[{"t":"challenge","i":i,"cid":cid} for i,cid in self._challenge_ids.items() if old_ids.get(str(i))!=cid]
+        # Échecs avant prises : une case ratée peut ensuite être prise par l'autre équipe
+        for key,ok in (("failed",False),("owner",True)):
+            for t,(old,new) in enumerate(zip(before[key],getattr(self,"_"+key))):
+                added=new&~old
+                while added:
+                    low=added&-added
+                    events.append({"t":"verdict","i":low.bit_length()-1,"team":TEAMS[t],"ok":ok})
+                    added^=low
+        if self.started!=before.get("started"): events.append({"t":"start","at":self.started})
+        events+=[{"t":"move","m":list(m)} for m in self._moves[len(before.get("moves",())):]]
+        if self.current_turn!=before["current_turn"]: events.append({"t":"turn","n":self.current_turn})
+        if self.winner!=before["winner"]: events.append({"t":"winner","w":self.winner})
+        return events
+
+    def apply_event(self,event):
+        # Rejoue un événement de journal_events (relecture du journal au démarrage)
+        kind=event["t"]
+        if kind=="join": self.players.append(dict(event["p"]))
+        elif kind=="challenge": self._challenge_ids[event["i"]]=event["cid"]
+        elif kind=="verdict":
+            row,col=divmod(event["i"],self.grid_size)
+            if event["ok"]: self.claim(row,col,event["team"])
+            else: self.mark_failed(row,col,event["team"])
+        elif kind=="start": self.started=event["at"]
+        elif kind=="move": self._moves.append(tuple(event["m"]))
+        elif kind=="turn": self.current_turn=event["n"]
+        elif kind=="winner": self.winner=event["w"]
+
+    def cell(self,row,col):
+        return CellView(self,row*self.grid_size+col)
+
+    def challenge_at(self,row,col):
+        cid=self._challenge_ids.get(row*self.grid_size+col)
+        return challenge_store.get(cid) if cid else None
+
+    def add_player(self,name,team,role=None,bot=False):
+        if team not in TEAMS: return None
         for p in self.players:
             if p["name"]==name or (p.get("team")==team and (role is None or p.get("role")==role)):
                 return None
         player={"name":name,"team":team}
         if role: player["role"]=role
+        if bot: player["bot"]=True
         self.players.append(player)
+        if len(self.players)==self.num_players: self.started=time.time()
+        self.version+=1
         return player
 
+    def fill_with_bots(self):
+        # Mode solo : un bot dans chaque place encore libre
+        roles=("p1","p2") if self.num_players==4 else (None,)
+        for team in TEAMS:
+            for role in roles:
+                if len(self.players)>=self.num_players: return
+                if not any(p["team"]==team and p.get("role")==role for p in self.players):
+                    self.add_player(f"Bot {team}"+(f" {role}" if role else ""),team,role,bot=True)
+
+    def bot_to_play(self):
+        cp=self.current_player()
+        return bool(cp and cp.get("bot") and not self.winner and len(self.players)>=self.num_players)
+
+    def play_bots(self,time_budget=None,accuracy=None):
+        """Fait jouer les bots tant que c'est leur tour ; renvoie le nombre de coups joués.
+
+        Le bot choisit sa case par recherche alpha-bêta et réussit le défi avec
+        une probabilité `accuracy` (sinon la case devient jaune, comme pour un joueur).
+        """
+        time_budget=BOT_TIME_BUDGET if time_budget is None else time_budget
+        accuracy=BOT_ACCURACY if accuracy is None else accuracy
+        played=0
+        while self.bot_to_play():
+            team=self.current_player()["team"]
+            result=choose_move(self.grid_size,self.win_count,self._owner,self._failed,self._yellow,
+                               TEAMS.index(team),time_budget)
+            if result is None: break
+            ok=random.random()<accuracy
+            if ok: self.claim(result.row,result.col,team)
+            else: self.mark_failed(result.row,result.col,team)
+            self.record_move(result.row*self.grid_size+result.col,team,ok,True)
+            self.current_turn+=1
+            self.update_winner()
+            played+=1
+        return played
+
     def current_player(self):
         return None if not self.players else self.players[self.current_turn%len(self.players)]
 
@@ -39,91 +611,110 @@ class Game:
         cp = self.current_player()
         return cp and cp.get("name") == player_name
 
-    def generate_challenge(self,row,col):
-        prompt=("Génère une question de programmation en Python au format JSON avec ces clés:\n"
-                "- description: énoncé du problème,\n"
-                "- function_name: def nom_de_la_fonction\n"
-                "- précisions: le problème doit se baser sur des listes de nombre, et des concepts algorithmique,\n"
-                "- tests: liste d'objets {input: liste d'arguments, output: résultat attendu}.\n"
-                "Fournis uniquement l'objet JSON.")
-        resp=ollama_client.generate(model='llama3.2:3b',prompt=prompt,options={"stream":False})
-        raw=getattr(resp,'response',None) or resp.get('response') or resp.get('text')
-        if not raw and resp.get('choices'): raw=resp['choices'][0].get('text') or (resp['choices'][0].get('message') or {}).get('content')
-        raw=(raw or '').strip('` \n')
-        if raw.startswith('json'): raw=raw[len('json'):].strip()
-        try:
-            data=json.loads(raw)
-        except Exception:
-            traceback.print_exc()
-            # extraire portion JSON brute
-            start=raw.find('{')
-            end=raw.rfind('}')
-            if start!=-1 and end!=-1:
-                try:
-                    data=json.loads(raw[start:end+1])
-                except Exception:
-                    raise ValueError(f"Échec parse JSON, raw: {raw}")
-            else:
-                raise ValueError(f"Pas de JSON détecté, raw: {raw}")
-        self.cells[row][col]["challenge"]=data
+    def used_challenge_ids(self):
+        return set(self._challenge_ids.values())
+
+    def avoided_challenge_ids(self):
+        # Défis de la partie et leurs quasi-doublons : deux cases ne posent pas le même problème
+        used=self.used_challenge_ids()
+        return used.union(*map(challenge_index.neighbors,used))
+
+    def set_challenge(self,row,col,data,cid=None):
+        # La partie ne garde que la référence : le contenu vit dans challenge_store
+        cid=cid or challenge_store.put(data)
+        challenge_index.add(cid,data)
+        self._challenge_ids[row*self.grid_size+col]=cid
+        challenge_store.record_served(cid)
         return data
 
-    def attempt_challenge(self,row,col,player,code):
-        cell=self.cells[row][col]
-        if player["team"] in cell["failed"]: return False,"Vous avez déjà tenté et échoué."
-        challenge=cell.get("challenge")
+    def take_ready_challenge(self,row,col):
+        # Sans attente : défi stocké ni vu dans la partie ni proche d'un défi vu, sinon réserve
+        avoid=self.avoided_challenge_ids()
+        picked=challenge_store.pick(avoid) if CHALLENGE_STORE_REUSE else None
+        if picked:
+            challenge_pool.served()
+            return self.set_challenge(row,col,picked[1],picked[0])
+        # Au plus le contenu actuel de la réserve : chaque retrait relance une génération en fond
+        for _ in range(challenge_pool.size()):
+            data=challenge_pool.take()
+            if data is None: break
+            # Un défi de la réserve trop proche de la partie reste stocké pour d'autres parties
+            if challenge_hash(data) not in avoid: return self.set_challenge(row,col,data)
+        return None
+
+    def check_solution(self,row,col,team,code,tag=None):
+        # Vérification (bac à sable, modèle) faite avant games.update : (id du défi, (ok, msg) ou None)
+        idx=row*self.grid_size+col
+        cid,challenge=self._challenge_ids.get(idx),self.challenge_at(row,col)
+        if not challenge or self._failed[TEAMS.index(team)]&(1<<idx): return cid,None
+        return cid,verify_solution(challenge,code,cid,tag)
+
+    def attempt_challenge(self,row,col,player,code,tag=None,verdict=None):
+        """(réussi, message) ; réussi vaut None si `verdict` (voir check_solution) porte sur un autre défi."""
+        idx=row*self.grid_size+col
+        bit=1<<idx
+        t=TEAMS.index(player["team"])
+        if self._failed[t]&bit: return False,"Vous avez déjà tenté et échoué."
+        challenge=self.challenge_at(row,col)
         if not challenge: return False,"Aucun défi disponible."
-        verify_prompt=("Vérifie en Python si le code résout le défi donné. Répond uniquement JSON avec { \"result\": \"OK\" ou \"KO\", \"errors\": [...] }\n"
-                       f"Défi: {json.dumps(challenge)}\nCode du joueur:\n```python\n{code}\n```\n")
-        resp=ollama_client.generate(model='llama3.2:3b',prompt=verify_prompt,options={"stream":False})
-        raw=getattr(resp,'response',None) or resp.get('response') or resp.get('text')
-        if not raw and resp.get('choices'): raw=resp['choices'][0].get('text')
-        raw=(raw or '').strip('` \n')
-        # extraire JSON substring
-        jstart=raw.find('{')
-        jend=raw.rfind('}')
-        json_part=raw[jstart:jend+1] if jstart!=-1 and jend!=-1 else raw
-        try:
-            result=json.loads(json_part)
-        except Exception:
-            cell["failed"].add(player["team"])
-            cell["yellow"]=True
-            self.grid[row][col]="yellow"
-            return False,f"Réponse IA invalide: {raw}"
-        if result.get("result")!="OK":
-            cell["failed"].add(player["team"])
-            cell["yellow"]=True
-            self.grid[row][col]="yellow"
-            return False,"Wrong Answer (IA)"
-        if cell.get("owner") is None: cell["first_solver"]=player["team"]
-        cell["owner"]=player["team"]
-        self.grid[row][col]=player["team"]
+        verdict=verdict or self.check_solution(row,col,player["team"],code,tag)
+        if verdict[0]!=self._challenge_ids.get(idx) or verdict[1] is None:
+            return None,"Le défi de cette case a changé, réessayez."
+        ok,msg=verdict[1]
+        self.record_move(idx,player["team"],ok,player.get("bot",False))
+        if not ok:
+            self.mark_failed(row,col,player["team"])
+            return False,msg
+        if idx in self._challenge_ids: challenge_store.record_solved(self._challenge_ids[idx])
+        self.claim(row,col,player["team"])
         return True,"Bonne réponse."
 
+    def record_move(self,idx,team,ok,bot=False):
+        self._moves.append((round(time.time()-self.started,3),idx,TEAMS.index(team),bool(ok),bool(bot)))
+
+    def archive_record(self):
+        """Colonnes de la partie et ses coups pour game_archive (partie terminée)."""
+        w,now=self.winner,time.time()
+        game={"finished_at":now,"duration":now-self.started,"grid_size":self.grid_size,
+              "win_count":self.win_count,"players":len(self.players),"bots":sum(1 for p in self.players if p.get("bot")),
+              "winner":TEAMS.index(w) if w in TEAMS else WINNER_DRAW if w=="draw" else WINNER_NONE,
+              "yellow":self._yellow,"owner":list(self._owner)}
+        # Défi réduit aux 64 premiers bits de son hash
+        ids=self._challenge_ids
+        moves=[(at,idx,team,ok,bot,int(ids[idx][:16],16) if idx in ids else 0) for at,idx,team,ok,bot in self._moves]
+        return game,moves
+
+    def claim(self,row,col,team):
+        idx=row*self.grid_size+col
+        bit=1<<idx
+        t=TEAMS.index(team)
+        if not any(mask&bit for mask in self._owner): self._first_solver[idx]=t+1
+        self._owner=[(mask|bit) if i==t else (mask&~bit) for i,mask in enumerate(self._owner)]
+        self.set_cell(row,col,team)
+
+    def mark_failed(self,row,col,team):
+        bit=1<<(row*self.grid_size+col)
+        self._failed[TEAMS.index(team)]|=bit
+        self._yellow|=bit
+        self.set_cell(row,col,"yellow")
+
+    def set_cell(self,row,col,value):
+        # Toute écriture de la grille passe ici pour garder le suivi des alignements à jour
+        self._board[row*self.grid_size+col]=CELL_CODES[value]
+        self.wins.set(row,col,value)
+        self.version+=1
+
     def check_win(self):
-        lines = []
-        lines.extend(self.grid)  # lignes horizontales
-        lines.extend([[self.grid[r][c] for r in range(self.grid_size)] for c in range(self.grid_size)])  # colonnes verticales
-        lines.append([self.grid[i][i] for i in range(self.grid_size)])  # diagonale principale
-        lines.append([self.grid[i][self.grid_size-1-i] for i in range(self.grid_size)])  # diagonale secondaire
-
-        for line in lines:
-            if line[0] and all(cell == line[0] for cell in line):
-                return line[0]
-        return None
+        return self.wins.winner()
 
+    def leader(self):
+        # Équipe qui possède le plus de cases (départage d'un nul ou d'une partie interrompue)
+        counts=[mask.bit_count() for mask in self._owner]
+        return None if counts.count(max(counts))>1 else TEAMS[counts.index(max(counts))]
 
     def check_draw(self):
-    # Si toutes les cellules de la grille sont occupées (non vides) et pas de gagnant
-        for row in self.grid:
-            for cell in row:
-                if cell == '':
-                    return False
-        # Toutes les cases sont remplies
-        if not self.check_win():
-            return True
-        return False
-
+        # Grille pleine (cases jaunes comprises) et pas de gagnant
+        return self.wins.is_full() and not self.wins.winner()
 
     def update_winner(self):
         w = self.check_win()
@@ -135,6 +726,182 @@ class Game:
             self.winner=None
 
 
+# Pages grille/attente rendues une fois par version de partie, servies à tous ses joueurs
+render_cache = RenderCache(max_games=int(os.environ.get("RENDER_CACHE_GAMES", 2048)))
+# Change à chaque modification des gabarits : pas de 304 sur une page rendue par l'ancien code
+TEMPLATES_TAG = hashlib.sha1(b"".join(
+    open(os.path.join(app.root_path, "templates", name), "rb").read() for name in ("grid.html", "waiting.html")
+)).hexdigest()[:8]
+
+
+def forget_game(game_id):
+    # Partie retirée du store : ses pages rendues et son historique ne resserviront plus,
+    # les requêtes en attente de ses changements et les flux spectateurs se terminent
+    render_cache.drop(game_id)
+    change_feed.drop(game_id)
+    spectator_hub.close(game_id)
+
+
+def cached_page(game_id, g, variant, render):
+    """Réponse 304 si le client a déjà cette version, sinon la page (rendue au plus une fois par version).
+
+    Un message flash en attente rend la page propre au joueur : ni cache ni ETag.
+    """
+    version = g.version
+    pending = bool(session.get('_flashes'))
+    etag = hashlib.sha1(f"{TEMPLATES_TAG}:{game_id}:{version}:{variant}".encode()).hexdigest()[:20]
+    if not pending and etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        html = None if pending else render_cache.get(game_id, version, variant)
+        if html is None:
+            html = render()
+            if not pending:
+                render_cache.put(game_id, version, variant, html)
+        response = make_response(html)
+    if not pending:
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def failed_cells(g):
+    # {"r,c": [équipes]} pour les seules cases ratées
+    n=g.grid_size
+    failed={}
+    for team,mask in zip(TEAMS,g._failed):
+        while mask:
+            idx=(mask&-mask).bit_length()-1
+            failed.setdefault(f"{idx//n},{idx%n}",[]).append(team)
+            mask&=mask-1
+    return failed
+
+
+def game_state(g):
+    return {
+        "version": g.version,
+        "grid": [row[:] for row in g.grid],
+        "failed": failed_cells(g),
+        "current_turn": g.current_turn,
+        "current_player": g.current_player(),
+        "winner": g.winner,
+        "players": len(g.players),
+        "num_players": g.num_players,
+    }
+
+
+# Derniers changements de chaque partie, pour /api/game/<id>/state?since=
+change_feed = ChangeFeed(history=int(os.environ.get("CHANGE_FEED_HISTORY", 64)))
+LONGPOLL_TIMEOUT = float(os.environ.get("LONGPOLL_TIMEOUT", 25))
+
+
+def state_delta(before, after):
+    n=len(after["grid"])
+    delta={}
+    cells={f"{r},{c}": {"row": r, "col": c, "value": after["grid"][r][c], "failed": after["failed"].get(f"{r},{c}", [])}
+           for r in range(n) for c in range(n)
+           if after["grid"][r][c]!=before["grid"][r][c]
+           or after["failed"].get(f"{r},{c}")!=before["failed"].get(f"{r},{c}")}
+    if cells: delta["cells"]=cells
+    if after["current_turn"]!=before["current_turn"]:
+        delta["turn"]=after["current_turn"]
+        delta["current_player"]=after["current_player"]
+    if after["winner"]!=before["winner"]: delta["winner"]=after["winner"]
+    if after["players"]!=before["players"]:
+        delta["players"]=after["players"]
+        delta["current_player"]=after["current_player"]
+    return delta
+
+
+def full_state(g):
+    grid,cells=g.grid,g.cells
+    return {
+        "version": g.version, "full": True, "grid_size": g.grid_size, "win_count": g.win_count,
+        "players": len(g.players), "num_players": g.num_players,
+        "turn": g.current_turn, "current_player": g.current_player(), "winner": g.winner,
+        "cells": [{"row": r, "col": c, "value": grid[r][c], "failed": sorted(cells[r][c].failed)}
+                  for r in range(g.grid_size) for c in range(g.grid_size)],
+    }
+
+
+# Spectateurs (/watch/<id>) : un état complet sérialisé une fois par changement, partagé par tous
+spectator_hub = SpectatorHub(max_games=int(os.environ.get("SPECTATOR_MAX_GAMES", 1024)))
+SPECTATOR_KEEPALIVE = float(os.environ.get("SPECTATOR_KEEPALIVE", 15))
+
+
+def spectator_frame(g):
+    return f"event: state\ndata: {json.dumps(full_state(g), ensure_ascii=False)}\n\n"
+
+
+def broadcast_changes(game_id, before, g):
+    # Push vers la room de la partie, uniquement pour ce qui a réellement changé
+    after = game_state(g)
+    change_feed.publish(game_id, before["version"], after["version"], state_delta(before, after))
+    spectator_hub.publish(game_id, g.version, lambda: spectator_frame(g))
+    if after["players"] != before["players"]:
+        socketio.emit("player_joined", after, to=game_id)
+    if after["grid"] != before["grid"]:
+        changed = [{"row": r, "col": c, "value": after["grid"][r][c]}
+                   for r in range(g.grid_size) for c in range(g.grid_size)
+                   if after["grid"][r][c] != before["grid"][r][c]]
+        socketio.emit("update_grid", dict(after, cells=changed), to=game_id)
+    if after["current_turn"] != before["current_turn"]:
+        socketio.emit("turn_changed", after, to=game_id)
+    if after["winner"] != before["winner"]:
+        socketio.emit("winner", after, to=game_id)
+        if g.winner: archive_game(game_id, g)
+
+
+def archive_game(game_id, g):
+    if game_archive:
+        game_archive.record(game_id, *g.archive_record())
+
+
+def ensure_challenge(game_id, row, col, tag=None):
+    """Défi de la case, attribué au besoin (réserve, sinon génération).
+
+    games.update peut rejouer sa mutation après un conflit : la génération
+    (appel au modèle) se fait donc avant, la mutation ne fait que poser le défi.
+    """
+    def assign(g):
+        if g.challenge_at(row, col) is None:
+            g.take_ready_challenge(row, col)
+        return g.challenge_at(row, col)
+    challenge = games.update(game_id, assign)
+    if challenge is None:
+        g = games.get(game_id)
+        data = generate_and_store_challenge(tag, avoid=g.avoided_challenge_ids() if g else ())
+        challenge = games.update(game_id, lambda g: g.challenge_at(row, col) or g.set_challenge(row, col, data))
+    return challenge
+
+
+def play_bots(game_id):
+    # Hors de la requête du joueur : ses coups s'affichent sans attendre la réflexion des bots
+    def play(g):
+        if not g.bot_to_play():
+            return None
+        before = game_state(g)
+        g.play_bots()
+        return before, g
+    try:
+        changed = games.update(game_id, play)
+    except Exception:
+        traceback.print_exc()
+        return
+    if changed:
+        broadcast_changes(game_id, *changed)
+
+
+@socketio.on('join_game')
+def on_join_game(data):
+    game_id = (data or {}).get('game_id')
+    g = games.get(game_id)
+    if not g:
+        return
+    join_room(game_id)
+    emit('game_state', game_state(g))
+
+
 # routes inchangés
 
 @app.route('/', methods=["GET", "POST"])
@@ -148,13 +915,28 @@ def home():
         if np not in [2, 4]:
             flash("Choix 2 ou 4")
             return render_template("home.html")
+        try:
+            size = int(request.form.get('grid_size') or 0) or None
+            k = int(request.form.get('win_count') or 0) or None
+        except ValueError:
+            flash("Taille invalide")
+            return render_template("home.html")
+        if size is not None and not 3 <= size <= 19:
+            flash("Taille de grille entre 3 et 19")
+            return render_template("home.html")
+        if k is not None and not 3 <= k <= (size or (3 if np == 2 else 5)):
+            flash("Alignement entre 3 et la taille de la grille")
+            return render_template("home.html")
         name = request.form['host_name']
         if not name:
             flash("Entrez nom")
             return render_template("home.html")
         gid = str(uuid.uuid4())
-        g = Game(np)
+        g = Game(np, size, k)
         g.add_player(name, 'red', 'p1' if np == 4 else None)
+        if request.form.get('solo'):
+            g.fill_with_bots()
+            challenge_pool.prefill(1)
         session['player_name'] = name
         games[gid] = g
         return redirect(url_for('waiting', game_id=gid))
@@ -175,11 +957,22 @@ def join(game_id):
         return redirect(url_for('home'))
     g = games[game_id]
     if request.method == 'POST':
-        p = g.add_player(request.form['name'], request.form['team'], request.form.get('role'))
+        def add(g):
+            before = game_state(g)
+            return before, g.add_player(request.form['name'], request.form['team'], request.form.get('role')), g
+        try:
+            before, p, g = games.update(game_id, add)
+        except ConflictError:
+            flash("La partie a été modifiée en même temps, réessayez.")
+            return redirect(url_for('join', game_id=game_id))
         if not p:
             flash("Nom/équipe pris")
             return redirect(url_for('join', game_id=game_id))
         session['player_name'] = request.form['name']
+        if len(g.players) >= g.num_players:
+            # La partie passe de l'attente à la grille : un défi prêt par joueur
+            challenge_pool.prefill(g.num_players)
+        broadcast_changes(game_id, before, g)
         return redirect(url_for('waiting', game_id=game_id))
     return render_template("join.html", game=g)
 
@@ -192,30 +985,37 @@ def waiting(game_id):
     join_url = request.url_root + f"join/{game_id}"
     if len(g.players) >= g.num_players:
         return redirect(url_for('grid', game_id=game_id))
-    return render_template('waiting.html', game=g, game_id=game_id, join_url=join_url)
+    return cached_page(game_id, g, ('waiting', request.url_root),
+                       lambda: render_template('waiting.html', game=g, game_id=game_id, join_url=join_url))
 
 @app.route('/grid/<game_id>', endpoint='grid')
 def grid(game_id):
     g = games.get(game_id)
     if not g or len(g.players) < g.num_players:
         return redirect(url_for('waiting', game_id=game_id))
-    # Vérifie s'il y a un gagnant
-    if g.winner == "draw":
-        flash("Match nul ! La grille est remplie sans vainqueur.")
-    elif g.winner:
-        flash(f"Le gagnant est l'équipe {g.winner} !")
     player_name = session.get('player_name')
-    return render_template(
-        "grid.html",
-        grid=g.grid,
-        grid_size=g.grid_size,
-        cells=g.cells,
-        current_player=g.current_player(),
-        winner=g.winner,
-        turn=g.current_turn,
-        game_id=game_id,
-        player_name=player_name
-    )
+    # Le joueur a quitté la page de chargement : inutile de continuer sa génération
+    llm_gateway.cancel(f"{game_id}:{player_name}")
+
+    def render():
+        # Vérifie s'il y a un gagnant
+        if g.winner == "draw":
+            flash("Match nul ! La grille est remplie sans vainqueur.")
+        elif g.winner:
+            flash(f"Le gagnant est l'équipe {g.winner} !")
+        return render_template(
+            "grid.html",
+            grid=g.grid,
+            grid_size=g.grid_size,
+            cells=g.cells,
+            current_player=g.current_player(),
+            winner=g.winner,
+            turn=g.current_turn,
+            game_id=game_id,
+            player_name=player_name
+        )
+    # Seul « est-ce mon tour ? » dépend du joueur dans la page
+    return cached_page(game_id, g, ('grid', bool(g.is_player_turn(player_name))), render)
 
 @app.route('/move/<game_id>/<int:row>/<int:col>')
 def move(game_id, row, col):
@@ -231,35 +1031,65 @@ def move(game_id, row, col):
 
 @app.route('/challenge/<game_id>/<int:row>/<int:col>')
 def challenge(game_id, row, col):
-    g = games[game_id]
+    g = games.get(game_id)
+    if not g:
+        flash("Partie inexistante.")
+        return redirect(url_for('home'))
     player_name = session.get('player_name')
     if not g.is_player_turn(player_name):
         flash("Ce n'est pas à vous de jouer.")
         return redirect(url_for('grid', game_id=game_id))
 
-    cell = g.cells[row][col]
-    if cell['challenge'] is None:
-        # Affiche la page de chargement
+    def assign(g):
+        if g.challenge_at(row, col) is None:
+            g.take_ready_challenge(row, col)
+        return g.challenge_at(row, col)
+    challenge = g.challenge_at(row, col) or games.update(game_id, assign)
+    if challenge is None:
+        pending = challenge_streams.get((game_id, row, col))
+        if pending and pending.displayable:
+            # Énoncé complet, les tests arrivent encore : la soumission les attendra
+            challenge = {"description": pending.parser.fields["description"],
+                         "function_name": pending.parser.fields["function_name"]}
+    if challenge is None:
+        # Réserve vide : affiche la page de chargement
         return render_template("loading.html", game_id=game_id, row=row, col=col)
-    
+    return render_challenge(game_id, row, col, challenge)
+
+
+def statement_tag(challenge):
+    # Empreinte de l'énoncé affiché, renvoyée avec la soumission
+    text = f"{challenge.get('description')}\0{function_name(challenge)}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def render_challenge(game_id, row, col, challenge, code=""):
     return render_template(
         "challenge.html",
-        challenge_text=cell['challenge']['description'],
+        challenge_text=challenge['description'],
+        function_name=function_name(challenge),
+        statement=statement_tag(challenge), code=code,
         row=row, col=col, game_id=game_id
     )
 
 @app.route('/challenge_ready/<game_id>/<int:row>/<int:col>')
 def challenge_ready(game_id, row, col):
-    g = games[game_id]
+    g = games.get(game_id)
+    if not g:
+        flash("Partie inexistante.")
+        return redirect(url_for('home'))
     player_name = session.get('player_name')
     if not g.is_player_turn(player_name):
         flash("Ce n'est pas à vous de jouer.")
         return redirect(url_for('grid', game_id=game_id))
 
-    cell = g.cells[row][col]
-    if cell['challenge'] is None:
+    if g.challenge_at(row, col) is None:
         try:
-            cell['challenge'] = g.generate_challenge(row, col)
+            tag = f"{game_id}:{player_name}"
+            with admission["generate"].slot(game_id, session_key()):
+                ensure_challenge(game_id, row, col, tag)
+        except (Rejected, LLMUnavailable) as e:
+            return busy_response(e, game_id)
         except Exception as e:
             flash("Erreur lors de la génération du défi.")
             return redirect(url_for('grid', game_id=game_id))
@@ -267,9 +1097,59 @@ def challenge_ready(game_id, row, col):
     return redirect(url_for('challenge', game_id=game_id, row=row, col=col))
 
 
+@app.route('/challenge_stream/<game_id>/<int:row>/<int:col>')
+def challenge_stream(game_id, row, col):
+    g = games.get(game_id)
+    player_name = session.get('player_name')
+    if not g or not g.is_player_turn(player_name):
+        return Response("event: error\ndata: {}\n\n", mimetype='text/event-stream')
+    tag = f"{game_id}:{player_name}"
+
+    def assign(g):
+        if g.challenge_at(row, col) is None:
+            g.take_ready_challenge(row, col)
+        return g.challenge_at(row, col)
+
+    if g.challenge_at(row, col) or games.update(game_id, assign):
+        gen = None
+    elif (gen := challenge_streams.get((game_id, row, col))) is None:
+        # Nouvelle génération : elle prend sa place dans la file jusqu'à la fin du flux
+        try:
+            ticket = admission["generate"].acquire(game_id, session_key())
+        except Rejected as e:
+            data = json.dumps({"message": str(e), "retry_after": e.retry_after, "queued": e.queued}, ensure_ascii=False)
+            return Response(f"event: busy\ndata: {data}\n\n", mimetype='text/event-stream')
+        release = lambda: admission["generate"].release(ticket)  # noqa: E731
+        gen, created = challenge_streams.start(
+            (game_id, row, col), lambda gen: start_streamed_challenge(game_id, row, col, tag, gen, release))
+        if not created:
+            release()
+
+    def events():
+        if gen is None:
+            yield "event: ready\ndata: {}\n\n"
+            return
+        try:
+            for event, data in gen.events():
+                if event == "ping":
+                    yield ": ping\n\n"
+                else:
+                    yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        finally:
+            # Joueur parti avant de pouvoir lire l'énoncé : la génération est abandonnée
+            if not gen.displayable and not gen.done:
+                llm_gateway.cancel(tag)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route('/submit_challenge/<game_id>/<int:row>/<int:col>', methods=["POST"])
 def submit_challenge(game_id, row, col):
-    g = games[game_id]
+    g = games.get(game_id)
+    if not g:
+        flash("Partie inexistante.")
+        return redirect(url_for('home'))
     player_name = session.get('player_name')
     if g.winner:
         flash("La partie est terminée.")
@@ -279,17 +1159,407 @@ def submit_challenge(game_id, row, col):
         return redirect(url_for('grid', game_id=game_id))
 
     code = request.form['code']
-    player = g.current_player()
-    success, msg = g.attempt_challenge(row, col, player, code)
-    flash(msg)
+    pending = challenge_streams.get((game_id, row, col))
+    if pending:
+        # Page du défi affichée sur l'énoncé seul : on attend la fin du flux (tests)
+        pending.wait(llm_gateway.timeout)
+        g = games.get(game_id) or g
+    current = g.challenge_at(row, col)
+    if current is not None and request.form.get('statement') not in (None, statement_tag(current)):
+        # Énoncé reçu en flux puis remplacé (quasi-doublon) : le joueur relit le défi, son tour est gardé
+        flash("L'énoncé de ce défi a été remplacé pendant sa génération : relisez-le avant de soumettre.")
+        return render_challenge(game_id, row, col, current, code)
 
-    # Toujours passer au joueur suivant
-    g.current_turn += 1
-    g.update_winner()
+    def play(g):
+        # Revérifié sur l'état le plus récent : un autre worker a pu jouer entre-temps
+        if g.winner:
+            return None, "La partie est terminée."
+        if not g.is_player_turn(player_name):
+            return None, "Ce n'est pas à vous de jouer."
+        before = game_state(g)
+        success, msg = g.attempt_challenge(row, col, g.current_player(), code, tag, verdict)
+        if success is None:
+            return None, msg
+        # Toujours passer au joueur suivant
+        g.current_turn += 1
+        g.update_winner()
+        return (before, g), msg
+
+    tag = f"{game_id}:{player_name}"
+    try:
+        with admission["verify"].slot(game_id, session_key()):
+            # Vérification hors de games.update : un conflit rejoue `play`, pas le bac à sable ni le modèle
+            verdict = g.check_solution(row, col, g.current_player()["team"], code, tag)
+            changed, msg = games.update(game_id, play)
+    except (Rejected, LLMUnavailable) as e:
+        return busy_response(e, game_id)
+    except ConflictError:
+        flash("La partie a été modifiée en même temps, réessayez.")
+        return redirect(url_for('grid', game_id=game_id))
+    except Exception:
+        # Modèle injoignable ou trop lent : le tour n'est pas consommé
+        traceback.print_exc()
+        flash("Vérification impossible pour le moment, réessayez.")
+        return redirect(url_for('grid', game_id=game_id))
+    flash(msg)
+    if changed:
+        broadcast_changes(game_id, *changed)
+        if changed[1].bot_to_play():
+            socketio.start_background_task(play_bots, game_id)
 
     return redirect(url_for('grid', game_id=game_id))
 
 
 
+@app.route('/api/game/<game_id>/state')
+def api_game_state(game_id):
+    """État de la partie en JSON : complet, ou seulement ce qui a changé depuis `since`.
+
+    Si rien n'a changé, la requête reste ouverte jusqu'à un changement ou
+    `timeout` secondes (plafonné à LONGPOLL_TIMEOUT).
+    """
+    g = games.get(game_id)
+    if not g:
+        return jsonify(error="Partie inexistante."), 404
+    since = request.args.get('since', type=int)
+    if since is None or since > g.version:
+        return jsonify(full_state(g))
+    if since == g.version:
+        timeout = max(0.0, min(request.args.get('timeout', LONGPOLL_TIMEOUT, type=float), LONGPOLL_TIMEOUT))
+        # Version de la partie (pas le compteur d'écritures du backend), relue sans charger l'état
+        current = (lambda: games.backend.game_version(game_id)) if games.backend else None
+        change_feed.wait(game_id, since, timeout, current)
+        g = games.get(game_id)
+        if not g:
+            return jsonify(error="Partie inexistante."), 404
+    delta = change_feed.since(game_id, since, g.version)
+    if delta is None:
+        # Historique trop court (ou changements faits par un autre worker) : instantané
+        return jsonify(full_state(g))
+    if "cells" in delta:
+        delta["cells"] = list(delta["cells"].values())
+    return jsonify(version=g.version, since=since, full=False, **delta)
+
+
+@app.route('/watch/<game_id>')
+def watch(game_id):
+    # Lecture seule, sans session : la même page pour tous les spectateurs
+    g = games.get(game_id)
+    if not g:
+        flash("Partie inexistante.")
+        return redirect(url_for('home'))
+    return render_template("watch.html", game_id=game_id, grid_size=g.grid_size)
+
+
+@app.route('/watch/<game_id>/events')
+def watch_events(game_id):
+    if not games.get(game_id):
+        return Response("event: end\ndata: {}\n\n", mimetype='text/event-stream')
+
+    def current():
+        g = games.get(game_id)
+        return (g.version, lambda: spectator_frame(g)) if g else None
+
+    # Plusieurs workers : les changements faits ailleurs sont rattrapés à chaque relance
+    keepalive = min(SPECTATOR_KEEPALIVE, 1.0) if games.backend else SPECTATOR_KEEPALIVE
+
+    def events():
+        for frame in spectator_hub.frames(game_id, current, keepalive):
+            yield frame if frame is not None else ": ping\n\n"
+        yield "event: end\ndata: {}\n\n"
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# Tournois à élimination directe entre bots : coups choisis par alpha-bêta, défis résolus par le modèle
+TOURNAMENT_ROUND_DEADLINE = float(os.environ.get("TOURNAMENT_ROUND_DEADLINE", 600))
+TOURNAMENT_MAX_PARALLEL = int(os.environ.get("TOURNAMENT_MAX_PARALLEL", 32))
+TOURNAMENT_MAX_ENTRANTS = int(os.environ.get("TOURNAMENT_MAX_ENTRANTS", 256))
+tournaments = {}  # id -> Tournament, les plus anciens oubliés au-delà de 32
+SOLVE_PROMPT = "Écris en Python la fonction demandée par ce défi. Réponds uniquement avec le code.\n"
+CODE_BLOCK_RE = re.compile(r"```(?:python)?\s*\n(.*?)```", re.S)
+
+
+def solve_with_llm(challenge,tag=None):
+    prompt=SOLVE_PROMPT+f"Défi: {json.dumps(challenge, ensure_ascii=False)}\n"
+    raw=response_text(llm_gateway.generate(prompt=prompt,stream=False,tag=tag,purpose='solve')) or ''
+    m=CODE_BLOCK_RE.search(raw)
+    return m.group(1) if m else raw
+
+
+def tournament_game(red, blue):
+    g = Game(2)
+    g.add_player(red, 'red', bot=True)
+    g.add_player(blue, 'blue', bot=True)
+    game_id = str(uuid.uuid4())
+    games[game_id] = g
+    return game_id
+
+
+def tournament_turn(game_id):
+    """Un tour de partie de tournoi ; renvoie le gagnant ('red', 'blue', 'draw') ou None."""
+    g = games[game_id]
+    if g.winner:
+        return g.winner
+    player = g.current_player()
+    move = choose_move(g.grid_size, g.win_count, g._owner, g._failed, g._yellow, TEAMS.index(player["team"]),
+                       BOT_TIME_BUDGET)
+    if move is None:
+        # Plus de case vide : partie finie
+        g = games.update(game_id, lambda g: (g.update_winner(), g)[1])
+        if g.winner: archive_game(game_id, g)
+        return g.winner or "draw"
+    row, col = move.row, move.col
+    tag = f"{game_id}:{player['name']}"
+    challenge = g.challenge_at(row, col) or ensure_challenge(game_id, row, col, tag)
+    code = solve_with_llm(challenge, tag)
+    g = games[game_id]
+    verdict = g.check_solution(row, col, player["team"], code, tag)
+
+    def play(g):
+        before = game_state(g)
+        if g.attempt_challenge(row, col, g.current_player(), code, tag, verdict)[0] is None:
+            return before, g  # défi changé entre-temps : le tour est rejoué
+        g.current_turn += 1
+        g.update_winner()
+        return before, g
+
+    before, g = games.update(game_id, play)
+    broadcast_changes(game_id, before, g)
+    return g.winner
+
+
+def start_tournament(entrants, round_deadline=None):
+    t = Tournament(
+        entrants, tournament_game, tournament_turn,
+        leader=lambda game_id: games[game_id].leader() if game_id in games else None,
+        prepare=challenge_pool.prefill,
+        round_deadline=round_deadline or TOURNAMENT_ROUND_DEADLINE,
+        max_parallel=TOURNAMENT_MAX_PARALLEL,
+    )
+    tournament_id = str(uuid.uuid4())
+    tournaments[tournament_id] = t
+    while len(tournaments) > 32:
+        del tournaments[next(iter(tournaments))]
+    t.start()
+    return tournament_id, t
+
+
+@app.route('/api/tournament', methods=['POST'])
+def create_tournament():
+    data = request.get_json(silent=True) or {}
+    entrants = [str(e).strip() for e in data.get('entrants') or [] if str(e).strip()]
+    if not 2 <= len(entrants) <= TOURNAMENT_MAX_ENTRANTS or len(set(entrants)) != len(entrants):
+        return jsonify(error=f"Entre 2 et {TOURNAMENT_MAX_ENTRANTS} participants, aux noms distincts."), 400
+    try:
+        round_deadline = float(data.get('round_deadline') or TOURNAMENT_ROUND_DEADLINE)
+    except (TypeError, ValueError):
+        return jsonify(error="round_deadline invalide."), 400
+    tournament_id, t = start_tournament(entrants, round_deadline)
+    return jsonify(id=tournament_id, **t.stats()), 201
+
+
+@app.route('/api/tournament/<tournament_id>')
+def tournament_status(tournament_id):
+    t = tournaments.get(tournament_id)
+    if not t:
+        return jsonify(error="Tournoi inexistant."), 404
+    return jsonify(dict(t.stats(), rounds=t.results()))
+
+
+GAMES_LIVE = metrics.gauge("games_live", "Parties en mémoire dans ce processus")
+GAMES_BYTES = metrics.gauge("games_bytes", "Taille estimée des parties en mémoire")
+GAMES_REMOVED = metrics.counter("games_removed_total", "Parties retirées du store", ("reason",))
+GAMES_ARCHIVED = metrics.counter("games_archived_total", "Parties terminées écrites dans l'archive analytique")
+GAMES_ARCHIVE_DROPPED = metrics.counter("games_archive_dropped_total", "Parties terminées perdues par l'archive (lot en erreur)")
+CHALLENGE_POOL_READY = metrics.gauge("challenge_pool_ready", "Défis prêts dans la réserve")
+CHALLENGE_INDEX = metrics.gauge("challenge_index_size", "Défis dans l'index des quasi-doublons")
+CHALLENGE_GENERATIONS = metrics.counter("challenge_generations_total", "Générations de défis par issue", ("result",))
+VERIFY_CACHE = metrics.counter("verify_cache_lookups_total", "Consultations du cache de verdicts", ("result",))
+RENDER_CACHE = metrics.counter("render_cache_lookups_total", "Consultations du cache de pages", ("result",))
+STARTUP_PHASE = metrics.gauge("startup_phase_seconds", "Durée de chaque phase de démarrage", ("phase",))
+READY = metrics.gauge("ready", "1 une fois le préchauffage terminé")
+LLM_QUEUE = metrics.gauge("llm_queue", "Appels au modèle en cours ou en attente", ("state",))
+ADMISSIONS = metrics.counter("admissions_total", "Demandes admises ou refusées devant les routes coûteuses", ("operation", "result"))
+ADMISSION_QUEUE = metrics.gauge("admission_queue", "Demandes en cours ou en attente, par opération", ("operation", "state"))
+LLM_BREAKER = metrics.gauge("llm_breaker_state", "État du disjoncteur du modèle (1 pour l'état courant)", ("state",))
+LLM_BREAKER_TRIPS = metrics.counter("llm_breaker_trips_total", "Ouvertures du disjoncteur du modèle")
+LLM_BACKEND_LATENCY = metrics.gauge("llm_backend_latency_seconds", "Durée moyenne récente des appels par serveur et usage", ("backend", "purpose"))
+LLM_BACKEND_ERRORS = metrics.gauge("llm_backend_error_rate", "Taux d'erreur récent par serveur", ("backend",))
+LLM_BACKEND_CALLS = metrics.counter("llm_backend_calls_total", "Appels envoyés à chaque serveur, relances comprises", ("backend",))
+LLM_HEDGES = metrics.counter("llm_hedges_total", "Appels lents relancés sur un second serveur, par issue", ("backend", "result"))
+SPECTATORS = metrics.gauge("spectators", "Spectateurs connectés (flux /watch)")
+SPECTATOR_FRAMES = metrics.counter("spectator_frames_total", "Trames envoyées aux spectateurs ou sautées (client lent)", ("result",))
+
+
+@metrics.on_collect
+def collect_component_stats():
+    store = games.stats()
+    GAMES_LIVE.set(store["live"])
+    GAMES_BYTES.set(store["bytes"])
+    GAMES_REMOVED.set_total(store["expired"], reason="expired")
+    GAMES_REMOVED.set_total(store["evicted"], reason="evicted")
+    if game_archive:
+        archived = game_archive.stats()
+        GAMES_ARCHIVED.set_total(archived["written"])
+        GAMES_ARCHIVE_DROPPED.set_total(archived["dropped"])
+    CHALLENGE_POOL_READY.set(challenge_pool.size())
+    CHALLENGE_INDEX.set(len(challenge_index))
+    gen = challenge_generator.stats()
+    CHALLENGE_GENERATIONS.set_total(sum(a["accepted"] for a in gen["attempts"]), result="accepted")
+    CHALLENGE_GENERATIONS.set_total(gen["rejected"], result="rejected")
+    PARSE_FAILURES.set_total(gen["parse_failures"], purpose="generate")
+    pages = render_cache.stats()
+    RENDER_CACHE.set_total(pages["hits"], result="hit")
+    RENDER_CACHE.set_total(pages["misses"], result="miss")
+    cache = verification_cache.stats()
+    VERIFY_CACHE.set_total(cache["hits"], result="hit")
+    VERIFY_CACHE.set_total(cache["misses"], result="miss")
+    for name, phase in lifecycle.status()["phases"].items():
+        STARTUP_PHASE.set(phase["seconds"], phase=name)
+    READY.set(int(lifecycle.ready.is_set()))
+    LLM_QUEUE.set(llm_gateway.in_flight, state="in_flight")
+    LLM_QUEUE.set(llm_gateway.queued(), state="queued")
+    for backend in llm_router.stats()["backends"]:
+        for purpose, seconds in backend["latency"].items():
+            LLM_BACKEND_LATENCY.set(seconds, backend=backend["name"], purpose=purpose or "other")
+        LLM_BACKEND_ERRORS.set(backend["error_rate"], backend=backend["name"])
+        LLM_BACKEND_CALLS.set_total(backend["calls"], backend=backend["name"])
+        LLM_HEDGES.set_total(backend["hedges"], backend=backend["name"], result="sent")
+        LLM_HEDGES.set_total(backend["hedge_wins"], backend=backend["name"], result="won")
+    for operation, queue in admission.items():
+        stats = queue.stats()
+        ADMISSIONS.set_total(stats["admitted"], operation=operation, result="admitted")
+        for reason, count in stats["rejected"].items():
+            ADMISSIONS.set_total(count, operation=operation, result=reason)
+        ADMISSION_QUEUE.set(stats["active"], operation=operation, state="active")
+        ADMISSION_QUEUE.set(stats["queued"], operation=operation, state="queued")
+    breaker = llm_breaker.stats()
+    for state in (CircuitBreaker.CLOSED, CircuitBreaker.OPEN, CircuitBreaker.HALF_OPEN):
+        LLM_BREAKER.set(int(breaker["state"] == state), state=state)
+    LLM_BREAKER_TRIPS.set_total(breaker["trips"])
+    watchers = spectator_hub.stats()
+    SPECTATORS.set(watchers["subscribers"])
+    SPECTATOR_FRAMES.set_total(watchers["delivered"], result="sent")
+    SPECTATOR_FRAMES.set_total(watchers["dropped"], result="dropped")
+
+
+@app.before_request
+def start_request_timer():
+    endpoint = request.endpoint or "unknown"
+    request.environ["morpion.metrics"] = (endpoint, time.perf_counter())
+    HTTP_IN_FLIGHT.inc(endpoint=endpoint)
+
+
+@app.after_request
+def count_response(response):
+    endpoint, _ = request.environ.get("morpion.metrics", (request.endpoint or "unknown", None))
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+
+@app.teardown_request
+def stop_request_timer(exc=None):
+    started = request.environ.pop("morpion.metrics", None)
+    if started:
+        endpoint, t0 = started
+        HTTP_IN_FLIGHT.dec(endpoint=endpoint)
+        HTTP_LATENCY.observe(time.perf_counter() - t0, endpoint=endpoint, method=request.method)
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+
+def restore_games():
+    # Avant de servir : parties en cours relues du journal (dernier instantané + fin du journal)
+    if not games.journal:
+        return
+    t0=time.perf_counter()
+    restored=games.journal.recover()
+    for game_id,g in restored.items():
+        games.restore(game_id,g)
+    lifecycle.record("journal_replay",time.perf_counter()-t0)
+    print(f"[démarrage] {len(restored)} partie(s) reprise(s) du journal",flush=True)
+
+
+# Usages dont les modèles sont préchargés sur chaque serveur
+LLM_SERVING = ("generate", "verify")
+
+
+_lifecycle_lock = threading.Lock()
+_lifecycle_started = False
+
+
+def start_lifecycle():
+    """Préchauffe le processus en arrière-plan ; /readyz répond 200 une fois terminé.
+
+    Une seule fois par processus : au lancement direct, ou à la première requête
+    reçue (gunicorn et autres serveurs WSGI, un démarrage par worker).
+    WARMUP=0 saute les phases qui demandent Ollama (développement local).
+    """
+    global _lifecycle_started
+    with _lifecycle_lock:
+        # Les requêtes arrivées pendant la relecture du journal attendent ici
+        if _lifecycle_started:
+            return
+        _start_lifecycle()
+        _lifecycle_started = True
+
+
+def _start_lifecycle():
+    def sandbox():
+        # Démarre le forkserver et un worker du bac à sable
+        report=sandbox_runner.run("def f(x):\n    return x\n",{"function_name":"f","tests":[{"input":[1],"output":1}]})
+        if not report["ok"]: raise RuntimeError(describe_failure("f",report))
+
+    def model_load():
+        # Prompt vide : chaque serveur charge ses modèles sans rien générer
+        llm_gateway.generate_everywhere('warmup',LLM_SERVING,prompt="")
+
+    def warmup_generation():
+        llm_gateway.generate_everywhere('warmup',LLM_SERVING,prompt="Réponds OK.",options={"num_predict":4})
+
+    def first_challenge():
+        if CHALLENGE_STORE_REUSE and challenge_store.count():
+            return
+        if not challenge_pool.wait_ready(1,llm_gateway.timeout):
+            raise TimeoutError("aucun défi prêt")
+
+    restore_games()
+    # L'index des quasi-doublons d'abord : sans lui, les défis stockés ne sont pas comparés
+    steps=[("challenge_index",load_challenge_index),("sandbox",sandbox),("model_load",model_load),
+           ("warmup_generation",warmup_generation),("first_challenge",first_challenge)]
+    lifecycle.start(steps if os.environ.get("WARMUP","1")=="1" else steps[:1])
+    # Ping périodique : le modèle reste chargé même sans partie en cours
+    lifecycle.keep_alive(lambda: llm_gateway.generate_everywhere('keep_alive',LLM_SERVING,prompt=""),
+                         float(os.environ.get("KEEP_ALIVE_INTERVAL", 240)))
+
+
+@app.before_request
+def ensure_lifecycle():
+    # Sans passage par __main__ (serveur WSGI), le premier appel reçu lance le démarrage
+    if not _lifecycle_started:
+        start_lifecycle()
+
+
+@app.route('/healthz')
+def healthz():
+    # Vivant : le processus répond, même pendant le préchauffage
+    return jsonify(status="ok", uptime_seconds=lifecycle.status()["uptime_seconds"])
+
+
+@app.route('/readyz')
+def readyz():
+    status = lifecycle.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=True)
+    # Avec le rechargeur du mode debug, seul le processus enfant sert les requêtes : le parent
+    # ne démarre rien (l'enfant le fait ici, sans attendre sa première requête)
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_lifecycle()
+    socketio.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=True, allow_unsafe_werkzeug=True)
@@ -0,0 +1,120 @@
+"""Surcharge des routes qui attendent le modèle : latence avec et sans file bornée.
+
+    python benchmarks/bench_admission.py [--clients 64] [--seconds 10] [--latency 0.2] [--concurrency 4] [--outage]
+
+`clients` joueurs (chacun sa partie et sa session) demandent sans arrêt un
+nouveau défi par /challenge_ready, alors que le faux Ollama ne peut en servir
+que `concurrency` à la fois (ni réserve ni défis stockés : chaque demande va au
+modèle). Deux modes :
+  unbounded : file d'admission sans limite, comme avant ; tout le monde attend
+              dans la file de la passerelle ;
+  bounded   : file bornée (réglages par défaut de l'application) ; les
+              demandes en trop reçoivent un 429 tout de suite et le client
+              attend le Retry-After avant de réessayer.
+Avec --outage, le faux Ollama ne répond plus dans le délai (LLM_TIMEOUT
+court) : le disjoncteur s'ouvre et les demandes échouent en 503 sans attendre.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mock_ollama import start_server  # noqa: E402
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def player(app, index, stop, results, lock, max_sleep):
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess["player_name"] = f"joueur{index}"
+    n = 0
+    while not stop.is_set():
+        # Une partie neuve par demande : seul le modèle peut fournir le défi
+        g = app.Game(2)
+        g.add_player(f"joueur{index}", "red", "p1")
+        g.add_player(f"adversaire{index}", "blue", "p1")
+        game_id = f"surcharge-{index}-{n}"
+        n += 1
+        app.games[game_id] = g
+        started = time.perf_counter()
+        response = client.get(f"/challenge_ready/{game_id}/0/0")
+        elapsed = time.perf_counter() - started
+        key = response.status_code
+        if key == 302:
+            key = "défi" if "/challenge/" in response.headers["Location"] else "erreur"
+        with lock:
+            results[key].append(elapsed)
+        del app.games[game_id]
+        if response.status_code in (429, 503):
+            stop.wait(min(max_sleep, float(response.headers.get("Retry-After", 1))))
+
+
+def measure(app, mode, clients, seconds, max_sleep):
+    from admission import AdmissionQueue
+    if mode == "unbounded":
+        app.admission["generate"] = AdmissionQueue("generate", max_active=10 ** 6, max_queue=10 ** 6,
+                                                   max_wait=10 ** 6, per_game=10 ** 6, per_session=10 ** 6)
+    results, lock, stop = defaultdict(list), threading.Lock(), threading.Event()
+    threads = [threading.Thread(target=player, args=(app, i, stop, results, lock, max_sleep), daemon=True)
+               for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--latency", type=float, default=0.2, help="latence du faux Ollama (s)")
+    parser.add_argument("--concurrency", type=int, default=4, help="appels simultanés au modèle")
+    parser.add_argument("--mode", choices=("bounded", "unbounded"), default="bounded")
+    parser.add_argument("--outage", action="store_true", help="le modèle ne répond plus dans le délai")
+    parser.add_argument("--max-sleep", type=float, default=2.0, help="attente maximale d'un client refusé (s)")
+    args = parser.parse_args()
+
+    latency = 5.0 if args.outage else args.latency
+    _, mock, url = start_server(latency=latency, jitter=0.05, seed=0)
+    os.environ["OLLAMA_HOST"] = url
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.concurrency)
+    os.environ["CHALLENGE_POOL_SIZE"] = "0"
+    os.environ["CHALLENGE_STORE_REUSE"] = "0"
+    os.environ.setdefault("CHALLENGE_STORE_PATH", ":memory:")
+    os.environ["GAME_JOURNAL_DIR"] = ""
+    os.environ["GAME_ARCHIVE_DIR"] = ""
+    if args.outage:
+        os.environ["LLM_TIMEOUT"] = "1"
+    import app
+
+    results, elapsed = measure(app, args.mode, args.clients, args.seconds, args.max_sleep)
+    served = results.get("défi", [])
+    print(f"{args.mode}, {args.clients} clients, {args.concurrency} appels simultanés, "
+          f"latence {latency * 1000:.0f} ms{', panne' if args.outage else ''}")
+    print(f"{'réponse':<10}{'n':>7}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for status in ("défi", "erreur", 429, 503):
+        values = results.get(status)
+        if values:
+            print(f"{status!s:<10}{len(values):>7}{percentile(values, 50) * 1000:>10.0f}"
+                  f"{percentile(values, 99) * 1000:>10.0f}{max(values) * 1000:>10.0f}")
+    print(f"{len(served) / elapsed:.1f} défis/s servis, {mock.requests} appels au modèle, "
+          f"disjoncteur {app.llm_breaker.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Archive analytique : ajout en colonnes, puis statistiques par tranches sur une grosse archive.
+
+    python benchmarks/bench_analytics.py [--games 2000000] [--chunk 65536] [--loop-games 20000] [--keep DIR]
+
+Des parties synthétiques (grilles 3×3 et 5×5, coups, défis réussis ou ratés,
+temps de réflexion, une petite avance à l'équipe qui réussit la première) sont
+ajoutées à une archive par lots de 100 000, puis :
+  record     : débit du chemin de l'application (GameArchive.record, une partie à la fois) ;
+  analytics  : `python analytics.py` sur toute l'archive, dans un processus à part
+               (durée, mémoire maximale : à comparer à la taille des fichiers) ;
+  boucle     : les mêmes statistiques en Python pur, partie par partie, sur
+               `--loop-games` parties (même résultat, pour le temps par partie).
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analytics import GameStats, chunks, open_archive  # noqa: E402
+from game_archive import MOVE_DTYPE, WINNER_DRAW, GameArchive, game_dtype  # noqa: E402
+
+TEAMS = ("red", "blue")
+BATCH = 100_000
+
+
+def synthetic_batch(rng, first_game, count, challenges=20_000):
+    grid = np.where(rng.random(count) < 0.7, 3, 5).astype(np.uint8)
+    cells = grid.astype(np.int64) ** 2
+    played = rng.integers(5, cells + 1)
+    starts = np.concatenate([[0], np.cumsum(played)[:-1]])
+    game = np.repeat(np.arange(count), played)
+    position = np.arange(played.sum()) - np.repeat(starts, played)
+
+    moves = np.zeros(int(played.sum()), dtype=MOVE_DTYPE)
+    moves["game"] = game
+    moves["team"] = position % 2
+    moves["cell"] = rng.integers(0, np.repeat(cells, played))
+    moves["bot"] = np.repeat(rng.random(count) < 0.3, played)
+    challenge = rng.integers(1, challenges + 1, len(moves)).astype(np.uint64)
+    moves["challenge"] = challenge * np.uint64(0x9E3779B97F4A7C15)
+    # Chaque défi a sa difficulté ; les bots réussissent à 75 %
+    difficulty = rng.beta(4, 2, challenges + 1)
+    moves["ok"] = rng.random(len(moves)) < np.where(moves["bot"], 0.75, difficulty[challenge])
+    moves["think"] = np.where(moves["bot"], rng.exponential(0.3, len(moves)), rng.lognormal(3, 0.8, len(moves)))
+    at = np.cumsum(moves["think"], dtype=np.float64)
+    moves["at"] = at - np.repeat(at[starts] - moves["think"][starts], played)
+
+    games = np.zeros(count, dtype=game_dtype(TEAMS))
+    games["game_id"] = [f"{first_game + i:036d}".encode() for i in range(count)]
+    games["grid_size"] = grid
+    games["win_count"] = grid
+    games["players"] = np.where(grid == 3, 2, 4)
+    games["bots"] = np.bitwise_or.reduceat(moves["bot"], starts) * games["players"]
+    games["move_start"] = starts
+    games["moves"] = played
+    games["duration"] = moves["at"][starts + played - 1]
+    games["finished_at"] = 1.7e9 + first_game + np.arange(count)
+    bit = np.uint64(1) << moves["cell"].astype(np.uint64)
+    # Grilles de 5 × 5 au plus : tout tient dans le premier mot des masques
+    games["yellow"][:, 0] = np.bitwise_or.reduceat(np.where(moves["ok"], 0, bit).astype(np.uint64), starts)
+    for t in range(len(TEAMS)):
+        games["owner"][:, t, 0] = np.bitwise_or.reduceat(np.where(moves["ok"] & (moves["team"] == t), bit, 0)
+                                                      .astype(np.uint64), starts)
+    # Vainqueur : l'équipe qui réussit le premier défi gagne un peu plus souvent
+    first_ok = np.minimum.reduceat(np.where(moves["ok"], position, 10 ** 6), starts)
+    first_team = np.where(first_ok < 10 ** 6, first_ok % 2, rng.integers(0, 2, count))
+    draw = rng.random(count) < 0.2
+    games["winner"] = np.where(draw, WINNER_DRAW, np.where(rng.random(count) < 0.58, first_team, 1 - first_team))
+    return games, moves
+
+
+def loop_stats(games, moves, offset):
+    # Référence en Python pur : mêmes comptes que GameStats, une partie et un coup à la fois
+    attempts = solved = first_won = 0
+    yellow = {}
+    by_challenge = {}
+    for g in range(len(games)):
+        row = games[g]
+        first_team = None
+        for i in range(int(row["move_start"]) - offset, int(row["move_start"]) - offset + int(row["moves"])):
+            move = moves[i]
+            attempts += 1
+            solved += bool(move["ok"])
+            entry = by_challenge.setdefault(int(move["challenge"]), [0, 0])
+            entry[0] += 1
+            entry[1] += bool(move["ok"])
+            if move["ok"] and first_team is None:
+                first_team = int(move["team"])
+        if first_team is not None and first_team == int(row["winner"]):
+            first_won += 1
+        n = int(row["grid_size"])
+        counts = yellow.setdefault(n, [0] * (n * n))
+        for c in range(n * n):
+            counts[c] += int(row["yellow"][c // 64]) >> (c % 64) & 1
+    return {"attempts": attempts, "solved": solved, "first_won": first_won, "challenges": len(by_challenge),
+            "yellow": {n: sum(c) for n, c in yellow.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=2_000_000)
+    parser.add_argument("--chunk", type=int, default=65_536)
+    parser.add_argument("--loop-games", type=int, default=20_000)
+    parser.add_argument("--record-games", type=int, default=20_000)
+    parser.add_argument("--keep", help="répertoire de l'archive (gardée) ; sinon temporaire")
+    args = parser.parse_args()
+    directory = args.keep or tempfile.mkdtemp(prefix="archive-")
+    rng = np.random.default_rng(0)
+
+    try:
+        # Ajout en bloc, par lots de BATCH parties
+        archive = GameArchive(directory, TEAMS)
+        done, appended = 0, 0.0
+        while done < args.games:
+            games, moves = synthetic_batch(rng, done, min(BATCH, args.games - done))
+            t0 = time.perf_counter()
+            archive.append(games, moves)
+            appended += time.perf_counter() - t0
+            done += len(games)
+        archive.close()
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in ("games.npy", "moves.npy"))
+        print(f"{done} parties : {size / 1e9:.2f} Go, ajout en bloc {appended:.1f} s ({size / 1e6 / appended:.0f} Mo/s)")
+
+        # Chemin de l'application : une partie terminée à la fois, écrites par lots par le thread
+        other = tempfile.mkdtemp(prefix="archive-record-")
+        recorder = GameArchive(other, TEAMS, flush_interval=0.05)
+        sample, sample_moves, _ = open_archive(directory)
+        one = [(row["game_id"].decode(), {"grid_size": int(row["grid_size"]), "winner": int(row["winner"])},
+                [(float(m["at"]), int(m["cell"]), int(m["team"]), bool(m["ok"]), bool(m["bot"]), int(m["challenge"]))
+                 for m in sample_moves[int(row["move_start"]):int(row["move_start"]) + int(row["moves"])]])
+               for row in sample[:1000]]
+        t0 = time.perf_counter()
+        for i in range(args.record_games):
+            recorder.record(*one[i % len(one)])
+        queued = time.perf_counter() - t0
+        recorder.flush()
+        recorder.close()
+        print(f"record : {queued / args.record_games * 1e6:.1f} µs par partie mise en file, "
+              f"{args.record_games / (time.perf_counter() - t0):.0f} parties/s écrites ({recorder.batches} lots)")
+        shutil.rmtree(other)
+
+        # CLI dans un processus à part : sa mémoire maximale ne compte pas la génération
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, os.path.join(os.path.dirname(__file__), "..", "analytics.py"),
+                              directory, "--chunk", str(args.chunk), "--json"],
+                             check=True, capture_output=True, text=True).stdout
+        elapsed = time.perf_counter() - t0
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+        report = json.loads(out)
+        print(f"analytics : {elapsed:.1f} s ({elapsed / report['games'] * 1e6:.2f} µs par partie), "
+              f"mémoire max {peak:.0f} Mo pour {size / 1e6:.0f} Mo d'archive")
+        print(f"   réussite {report['solve_rate']['all']}, premier à réussir : "
+              f"victoire {report['first_solver']['win_rate']}, {report['challenges']['count']} défis")
+
+        # Même calcul, boucle Python contre colonnes, sur un extrait
+        _, part, part_moves = next(chunks(directory, args.loop_games))
+        t0 = time.perf_counter()
+        stats = GameStats(TEAMS)
+        stats.add(0, part, part_moves)
+        vectorized = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        loop = loop_stats(part, part_moves, 0)
+        looped = time.perf_counter() - t0
+        assert loop["attempts"] == stats.attempts.sum() and loop["solved"] == stats.solved.sum()
+        assert loop["first_won"] == stats.first_solver[0] and loop["challenges"] == len(stats._challenge_keys)
+        assert loop["yellow"] == {n: int(c.sum()) for n, (_, c) in stats.yellow.items()}
+        print(f"{args.loop_games} parties : colonnes {vectorized * 1000:.0f} ms, boucle Python {looped * 1000:.0f} ms "
+              f"(× {looped / vectorized:.0f}), mêmes comptes")
+    finally:
+        if not args.keep:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
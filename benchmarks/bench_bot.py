@@ -0,0 +1,66 @@
+"""Bot alpha-bêta : nœuds par seconde et profondeur atteinte par coup, selon la grille.
+
+    python benchmarks/bench_bot.py [--configs 3:3 5:4 5:5 9:5 15:5] [--budget 0.3] [--positions 20]
+
+Les positions sont tirées au hasard (quelques coups joués, dont des cases
+jaunes) ; la table de transposition partagée est vidée entre configurations
+puis conservée d'une position à l'autre, comme en production.
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bot_engine import SHARED_TABLE, choose_move  # noqa: E402
+
+
+def random_position(size, k, rng, plies):
+    owner, failed, yellow = [0, 0], [0, 0], 0
+    cells = list(range(size * size))
+    rng.shuffle(cells)
+    for ply, idx in enumerate(cells[:plies]):
+        side = ply % 2
+        if rng.random() < 0.15:
+            failed[side] |= 1 << idx
+            yellow |= 1 << idx
+        else:
+            owner[side] |= 1 << idx
+    return owner, failed, yellow, plies % 2
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--configs", nargs="+", default=["3:3", "5:4", "5:5", "9:5", "15:5"],
+                        help="taille:alignement")
+    parser.add_argument("--budget", type=float, default=0.3, help="temps par coup (s)")
+    parser.add_argument("--positions", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(f"{'grille':>8}{'nœuds/s':>12}{'nœuds/coup':>12}{'prof. moy.':>12}{'max ms':>9}{'complets':>10}{'TT hit':>8}")
+    for config in args.configs:
+        size, k = map(int, config.split(":"))
+        rng = random.Random(args.seed)
+        SHARED_TABLE._entries.clear()
+        SHARED_TABLE.hits = SHARED_TABLE.lookups = 0
+        nodes = elapsed = depth = complete = 0
+        worst = 0.0
+        for _ in range(args.positions):
+            owner, failed, yellow, side = random_position(size, k, rng, rng.randrange(1, max(2, size * size // 3)))
+            result = choose_move(size, k, owner, failed, yellow, side, args.budget)
+            if result is None:
+                continue
+            nodes += result.nodes
+            elapsed += result.elapsed
+            depth += result.depth
+            complete += result.complete
+            worst = max(worst, result.elapsed)
+        n = args.positions
+        hit_rate = SHARED_TABLE.stats()["hit_rate"] or 0
+        print(f"{size}x{size}/{k}".rjust(8) + f"{nodes / elapsed:>12.0f}{nodes / n:>12.0f}{depth / n:>12.1f}"
+              f"{worst * 1000:>9.0f}{complete:>10}{hit_rate:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
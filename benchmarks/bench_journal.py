@@ -0,0 +1,121 @@
+"""Journal des parties : surcoût d'écriture par coup et temps de relecture au démarrage.
+
+    python benchmarks/bench_journal.py [--games 10000] [--moves 6] [--fsync-ms 50]
+
+Les coups passent par GameStore.update, avec et sans journal. La relecture est
+mesurée deux fois : journal brut (création + événements de chaque partie),
+puis après compactage (un instantané par partie).
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("CHALLENGE_STORE_PATH", ":memory:")
+os.environ["GAME_JOURNAL_DIR"] = ""
+os.environ["GAME_ARCHIVE_DIR"] = ""
+
+import app  # noqa: E402
+from game_store import GameStore  # noqa: E402
+from journal import GameJournal  # noqa: E402
+
+
+def make_journal(directory, fsync_interval):
+    return GameJournal(
+        directory,
+        to_state=lambda g: g.to_state(),
+        from_state=lambda state: app.Game.from_state(state),
+        diff=lambda before, g: g.journal_events(before),
+        apply=lambda g, event: g.apply_event(event),
+        fsync_interval=fsync_interval,
+        compact_bytes=0,
+    )
+
+
+def make_store(journal=None):
+    return GameStore(max_games=10 ** 6, max_bytes=None, sweep_interval=0,
+                     to_state=lambda g: g.to_state(), from_state=lambda state: app.Game.from_state(state),
+                     journal=journal)
+
+
+def move(rng):
+    # Un tour de jeu : défi attribué, verdict, tour suivant
+    def play(g):
+        n = g.grid_size
+        free = [i for i in range(n * n) if not g._board[i]]
+        if not free or g.winner:
+            return
+        idx = rng.choice(free)
+        team = g.current_player()["team"]
+        g._challenge_ids[idx] = f"{rng.getrandbits(64):016x}"
+        if rng.random() < 0.75:
+            g.claim(idx // n, idx % n, team)
+        else:
+            g.mark_failed(idx // n, idx % n, team)
+        g.current_turn += 1
+        g.update_winner()
+    return play
+
+
+def populate(store, count, moves, seed):
+    rng = random.Random(seed)
+    play = move(rng)
+    for i in range(count):
+        g = app.Game(2 if i % 3 else 4)
+        for p in range(g.num_players):
+            g.add_player(f"joueur{p}", app.TEAMS[p % 2], (None if g.num_players == 2 else f"p{p // 2 + 1}"))
+        store[f"g{i}"] = g
+    start = time.perf_counter()
+    for _ in range(moves):
+        for i in range(count):
+            store.update(f"g{i}", play)
+    return (time.perf_counter() - start) / (count * moves)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--moves", type=int, default=6)
+    parser.add_argument("--fsync-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    directory = tempfile.mkdtemp(prefix="morpion-journal-")
+    try:
+        plain = populate(make_store(), args.games, args.moves, args.seed)
+        journal = make_journal(directory, args.fsync_ms / 1000)
+        store = make_store(journal)
+        journaled = populate(store, args.games, args.moves, args.seed)
+        t0 = time.perf_counter()
+        journal.flush()
+        drain = time.perf_counter() - t0
+        journal.close()
+        stats = journal.stats()
+        size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+        print(f"{args.games} parties, {args.moves} coups chacune, fsync toutes les {args.fsync_ms:g} ms")
+        print(f"coup sans journal     {plain * 1e6:8.1f} µs")
+        print(f"coup avec journal     {journaled * 1e6:8.1f} µs  (+{(journaled - plain) * 1e6:.1f} µs)")
+        print(f"lignes / lots fsync   {stats['written']} / {stats['batches']}  (vidage final {drain * 1000:.0f} ms)")
+        print(f"journal               {size / 1e6:8.1f} Mo")
+
+        t0 = time.perf_counter()
+        recovered = journal.recover()
+        replay = time.perf_counter() - t0
+        same = all(recovered[f"g{i}"].to_state() == store[f"g{i}"].to_state() for i in range(args.games))
+        print(f"relecture du journal  {replay:8.2f} s  ({len(recovered)} parties, identiques : {same})")
+
+        journal.compact()
+        t0 = time.perf_counter()
+        recovered = journal.recover()
+        replay = time.perf_counter() - t0
+        same = all(recovered[f"g{i}"].to_state() == store[f"g{i}"].to_state() for i in range(args.games))
+        print(f"relecture instantané  {replay:8.2f} s  ({len(recovered)} parties, identiques : {same})")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
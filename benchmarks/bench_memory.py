@@ -0,0 +1,97 @@
+"""Mémoire par partie : ancienne représentation (listes de dicts) contre Game compact.
+
+    python benchmarks/bench_memory.py [--games 2000] [--players 4]
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("CHALLENGE_STORE_PATH", ":memory:")
+os.environ["GAME_JOURNAL_DIR"] = ""
+os.environ["GAME_ARCHIVE_DIR"] = ""
+
+import app  # noqa: E402
+
+CHALLENGE = {
+    "description": "Écrire une fonction qui renvoie la somme des nombres pairs d'une liste.",
+    "function_name": "def somme_pairs",
+    "tests": [{"input": [[1, 2, 3, 4]], "output": 6}, {"input": [[]], "output": 0}, {"input": [[5, 7]], "output": 0}],
+}
+RAW = json.dumps(CHALLENGE)
+
+
+def legacy_game(num_players, moves):
+    # Structures de la version d'origine de Game : une liste de str + un dict par case
+    size = 3 if num_players == 2 else 5
+    grid = [['' for _ in range(size)] for _ in range(size)]
+    cells = [[{"owner": None, "first_solver": None, "failed": set(), "yellow": False, "challenge": None}
+              for _ in range(size)] for _ in range(size)]
+    for row, col, team, ok in moves:
+        cell = cells[row][col]
+        cell["challenge"] = json.loads(RAW)  # chaque génération produisait son propre dict
+        if ok:
+            cell["owner"] = cell["first_solver"] = team
+            grid[row][col] = team
+        else:
+            cell["failed"].add(team)
+            cell["yellow"] = True
+            grid[row][col] = "yellow"
+    return {"grid": grid, "cells": cells, "players": [], "current_turn": 0, "winner": None}
+
+
+def compact_game(num_players, moves, cid):
+    g = app.Game(num_players)
+    for row, col, team, ok in moves:
+        # Hash relu depuis le store : une chaîne distincte par case, comme en production
+        g._challenge_ids[row * g.grid_size + col] = cid.encode().decode()
+        if ok:
+            g._owner[app.TEAMS.index(team)] |= 1 << (row * g.grid_size + col)
+            g.set_cell(row, col, team)
+        else:
+            g.mark_failed(row, col, team)
+    return g
+
+
+def random_moves(num_players, rng):
+    size = 3 if num_players == 2 else 5
+    cells = [(r, c) for r in range(size) for c in range(size)]
+    rng.shuffle(cells)
+    played = cells[: len(cells) * 2 // 3]
+    return [(r, c, rng.choice(app.TEAMS), rng.random() < 0.7) for r, c in played]
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    games = [build(i) for i in range(count)]
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del games
+    return used / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--players", type=int, choices=(2, 4), default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    scenarios = [random_moves(args.players, rng) for _ in range(args.games)]
+    cid = app.challenge_store.put(CHALLENGE)
+
+    before = measure(lambda i: legacy_game(args.players, scenarios[i]), args.games)
+    after = measure(lambda i: compact_game(args.players, scenarios[i], cid), args.games)
+    print(f"{args.games} parties à {args.players} joueurs, 2/3 des cases jouées")
+    print(f"avant : {before:10.0f} octets/partie")
+    print(f"après : {after:10.0f} octets/partie  ({before / after:.1f}x moins)")
+
+
+if __name__ == "__main__":
+    main()
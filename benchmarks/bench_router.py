@@ -0,0 +1,105 @@
+"""Plusieurs serveurs Ollama (faux) : latence des appels selon la façon de les répartir.
+
+    python benchmarks/bench_router.py [--clients 8] [--calls 400] [--modes single round_robin router hedge]
+
+Trois faux serveurs locaux : A rapide mais avec une queue de latence (une
+fraction `--slow` des appels prend 2 s), B régulier mais plus lent, C rapide
+mais qui échoue souvent (`--errors`). Les clients enchaînent des générations
+et des vérifications ; les vérifications demandent un modèle plus petit.
+  single      : tout sur A, comme avant ;
+  round_robin : A, B, C à tour de rôle ;
+  router      : serveur sain le plus rapide (moyennes mobiles), sans relance ;
+  hedge       : idem, et un appel lent ou en échec est relancé sur un second
+                serveur (au plus 10 % des appels).
+"""
+import argparse
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from llm_gateway import LLMGateway  # noqa: E402
+from mock_ollama import start_server  # noqa: E402
+from model_router import Backend, ModelRouter  # noqa: E402
+
+MODELS = {"*": "llama3.2:3b", "verify": "llama3.2:1b"}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def measure(mode, urls, clients, calls):
+    hosts = urls[:1] if mode == "single" else urls
+    hedge = mode == "hedge"
+    router = ModelRouter([Backend(url, MODELS) for url in hosts], hedge_min=0.3 if hedge else None,
+                         hedge_budget=0.1 if hedge else 0)
+    if mode == "round_robin":
+        turn = itertools.cycle(router.backends)
+        router.choose = lambda purpose=None, exclude=(), fallback=True: next(turn)
+    gateway = LLMGateway(max_concurrency=4 * len(hosts), timeout=10, router=router)
+    latencies, errors, lock = [], Counter(), threading.Lock()
+    todo = itertools.count()
+
+    def client():
+        while next(todo) < calls:
+            purpose = "verify" if len(latencies) % 3 == 0 else "generate"
+            prompt = "Vérifie ce code" if purpose == "verify" else "Génère une question de programmation"
+            started = time.perf_counter()
+            try:
+                gateway.generate(prompt=prompt, stream=False, purpose=purpose)
+            except Exception as e:
+                with lock:
+                    errors[type(e).__name__] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors, time.perf_counter() - started, router.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--slow", type=float, default=0.05, help="part d'appels très lents sur A")
+    parser.add_argument("--errors", type=float, default=0.3, help="part d'erreurs sur C")
+    parser.add_argument("--modes", nargs="+", default=["single", "round_robin", "router", "hedge"])
+    args = parser.parse_args()
+
+    servers = [
+        start_server(latency=0.1, jitter=0.02, slow=args.slow, slow_latency=2.0, seed=1),
+        start_server(latency=0.25, jitter=0.02, seed=2),
+        start_server(latency=0.1, jitter=0.02, errors=args.errors, seed=3),
+    ]
+    urls = [url for _, _, url in servers]
+    print(f"{args.clients} clients, {args.calls} appels ; A {urls[0]}, B {urls[1]}, C {urls[2]}")
+    print(f"{'mode':<12}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}{'max ms':>8}{'erreurs':>9}{'relances':>10}"
+          f"{'appels/s':>10}  répartition A/B/C")
+    for mode in args.modes:
+        before = [sum(mock.models.values()) for _, mock, _ in servers]
+        latencies, errors, elapsed, stats = measure(mode, urls, args.clients, args.calls)
+        share = "/".join(str(sum(mock.models.values()) - b) for (_, mock, _), b in zip(servers, before))
+        print(f"{mode:<12}" + "".join(f"{percentile(latencies, p) * 1000:>8.0f}" for p in (50, 95, 99))
+              + f"{max(latencies) * 1000:>8.0f}{sum(errors.values()):>9}{stats['hedges']:>10}"
+              + f"{len(latencies) / elapsed:>10.1f}  {share}")
+    models = sum((mock.models for _, mock, _ in servers), Counter())
+    print("appels par modèle :", dict(models))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Index des quasi-doublons : temps de recherche et détection avec beaucoup de défis stockés.
+
+    python benchmarks/bench_similarity.py [--stored 100000] [--queries 2000] [--threshold 0.6]
+
+Des défis synthétiques (énoncés mêlant des mots courants des défis à un
+vocabulaire plus large, tests aléatoires) sont indexés, puis on cherche :
+  reformulés : même défi, énoncé remanié (synonymes, mots ajoutés, nom de
+               fonction changé), mêmes tests : doivent être trouvés ;
+  re-testés  : même énoncé, tests refaits pour moitié : doivent être trouvés ;
+  nouveaux   : défis jamais indexés : ne doivent rien trouver.
+La recherche LSH est comparée au parcours de toutes les signatures.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from similarity import SimilarityIndex  # noqa: E402
+
+SYNONYMS = {"calcule": "évalue", "compte": "dénombre", "renvoie": "retourne", "trouve": "cherche",
+            "liste": "tableau", "nombres": "entiers", "chaîne": "texte", "mot": "terme"}
+COMMON = ["calcule", "compte", "renvoie", "trouve", "liste", "nombres", "chaîne", "mot", "somme", "éléments",
+          "positifs", "pairs", "entier", "caractères", "ordre", "valeur", "maximum", "position", "vide"]
+
+
+def make_vocabulary(rng, size=5000):
+    letters = "abcdefghijklmnopqrstuvwxyzéè"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(size)]
+
+
+def make_challenge(rng, vocabulary):
+    # Mots courants des défis mêlés à un vocabulaire plus large : énoncés distincts mais pas disjoints
+    words = [rng.choice(COMMON) if rng.random() < 0.4 else rng.choice(vocabulary) for _ in range(rng.randint(6, 12))]
+    tests = [{"input": [[rng.randint(-50, 50) for _ in range(rng.randint(0, 6))]], "output": rng.randint(-100, 100)}
+             for _ in range(rng.randint(2, 4))]
+    return {"description": "Écrire une fonction qui " + " ".join(words) + ".",
+            "function_name": f"f{rng.randrange(10 ** 6)}", "tests": tests}
+
+
+def reword(challenge, rng):
+    words = challenge["description"].rstrip(".").split()
+    words = [SYNONYMS.get(w, w) if rng.random() < 0.5 else w for w in words]
+    words.insert(rng.randint(0, len(words)), rng.choice(["bien", "simplement", "ensuite", "toujours"]))
+    return dict(challenge, description=" ".join(words) + ".", function_name="g" + challenge["function_name"])
+
+
+def retest(challenge, rng):
+    tests = list(challenge["tests"])
+    for i in range(len(tests) // 2 + 1):
+        tests[i] = {"input": [[rng.randint(-50, 50) for _ in range(3)]], "output": rng.randint(-100, 100)}
+    return dict(challenge, tests=tests)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stored", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.6)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    index = SimilarityIndex(threshold=args.threshold)
+
+    vocabulary = make_vocabulary(rng)
+    stored = [make_challenge(rng, vocabulary) for _ in range(args.stored)]
+    t0 = time.perf_counter()
+    signatures = np.array([index.signature(challenge) for challenge in stored])
+    computed = time.perf_counter() - t0
+    index.add_many(list(range(len(stored))), signatures)
+    loaded = time.perf_counter() - t0 - computed
+    stats = index.stats()
+    print(f"{len(index)} défis : signatures en {computed:.1f} s ({computed / len(index) * 1e6:.0f} µs/défi), "
+          f"index en {loaded:.2f} s, {stats['bytes'] / 1e6:.1f} Mo")
+    t0 = time.perf_counter()
+    for i in range(2000):
+        index.add(len(stored) + i, signature=signatures[i])
+    print(f"ajouts un à un : {(time.perf_counter() - t0) / 2000 * 1e6:.0f} µs/défi, fusions comprises")
+
+    print(f"{'cas':<12}{'trouvés':>9}{'LSH p50 µs':>12}{'p99 µs':>9}{'parcours µs':>13}")
+    for name, make in [("reformulés", lambda: reword(stored[rng.randrange(len(stored))], rng)),
+                       ("re-testés", lambda: retest(stored[rng.randrange(len(stored))], rng)),
+                       ("nouveaux", lambda: make_challenge(rng, vocabulary))]:
+        found, times, scans = 0, [], []
+        for q in range(args.queries):
+            signature = index.signature(make())
+            t0 = time.perf_counter()
+            found += bool(index.query(signature=signature))
+            times.append(time.perf_counter() - t0)
+            if q < 50:
+                # Référence : comparaison avec toutes les signatures, sans LSH
+                t0 = time.perf_counter()
+                np.flatnonzero(index._score(index._signatures[:len(index)], signature) >= args.threshold)
+                scans.append(time.perf_counter() - t0)
+        times.sort()
+        print(f"{name:<12}{found / args.queries:>9.1%}{times[len(times) // 2] * 1e6:>12.0f}"
+              f"{times[int(len(times) * 0.99)] * 1e6:>9.0f}{sorted(scans)[len(scans) // 2] * 1e6:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
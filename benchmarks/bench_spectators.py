@@ -0,0 +1,146 @@
+"""Spectateurs d'une même partie : CPU consommé selon leur nombre.
+
+    python benchmarks/bench_spectators.py [--viewers 10 100 1000] [--seconds 5] [--rate 10] [--slow 0.1]
+
+Deux modes par nombre de spectateurs, pendant que la partie change `rate` fois
+par seconde :
+  poll : chaque spectateur recharge /grid/<id> une fois par seconde (page rendue
+         pour lui, comme avant /watch) ;
+  hub  : chaque spectateur lit le flux /watch/<id>/events ; un changement est
+         sérialisé une fois et la même trame est envoyée à tous. Une fraction
+         `slow` de spectateurs met 0,5 s à « envoyer » chaque trame : ils
+         sautent des trames au lieu de les accumuler.
+Le CPU est le temps processus (tous threads) divisé par la durée de la mesure ;
+« µs CPU/trame » le rapporte au nombre de trames (ou pages) reçues.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("CHALLENGE_STORE_PATH", ":memory:")
+os.environ["GAME_JOURNAL_DIR"] = ""
+os.environ["GAME_ARCHIVE_DIR"] = ""
+
+import app  # noqa: E402
+
+
+def new_game():
+    g = app.Game(4)
+    for i, (team, role) in enumerate([("red", "p1"), ("blue", "p1"), ("red", "p2"), ("blue", "p2")]):
+        g.add_player(f"joueur{i}", team, role)
+    game_id = f"finale-{random.getrandbits(32):08x}"
+    app.games[game_id] = g
+    return game_id
+
+
+def play(game_id, rng):
+    # Un coup : case prise ou ratée, tour suivant ; la partie recommence une fois pleine
+    def move(g):
+        before = app.game_state(g)
+        n = g.grid_size
+        free = [i for i in range(n * n) if not g._board[i]]
+        if not free or g.winner:
+            g._board[:] = bytes(n * n)
+            g._owner = [0, 0]
+            g._failed = [0, 0]
+            g._yellow = 0
+            g.wins = app.WinTracker(n, g.win_count)
+            g.winner = None
+            g.version += 1
+            return before, g
+        idx = rng.choice(free)
+        team = g.current_player()["team"]
+        if rng.random() < 0.75:
+            g.claim(idx // n, idx % n, team)
+        else:
+            g.mark_failed(idx // n, idx % n, team)
+        g.current_turn += 1
+        g.update_winner()
+        return before, g
+    app.broadcast_changes(game_id, *app.games.update(game_id, move))
+
+
+def poll_viewer(game_id, stop, counts):
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess["player_name"] = f"spectateur{threading.get_ident()}"
+    time.sleep(random.random())  # rechargements étalés sur la seconde
+    while not stop.is_set():
+        client.get(f"/grid/{game_id}")
+        counts["frames"] += 1
+        stop.wait(1.0)
+
+
+def hub_viewer(game_id, stop, counts, slow):
+    response = app.app.test_client().get(f"/watch/{game_id}/events", buffered=False)
+    try:
+        for chunk in response.response:
+            if stop.is_set():
+                break
+            if chunk.startswith(b"event: state"):
+                counts["frames"] += 1
+                if slow:
+                    time.sleep(0.5)
+    finally:
+        response.close()
+
+
+def measure(mode, viewers, seconds, rate, slow_fraction):
+    game_id = new_game()
+    stop = threading.Event()
+    counts = {"frames": 0}
+    threads = []
+    for i in range(viewers):
+        if mode == "poll":
+            t = threading.Thread(target=poll_viewer, args=(game_id, stop, counts), daemon=True)
+        else:
+            t = threading.Thread(target=hub_viewer, args=(game_id, stop, counts, i < viewers * slow_fraction),
+                                 daemon=True)
+        threads.append(t)
+        t.start()
+    time.sleep(1.0)  # connexions établies
+    stats0 = app.spectator_hub.stats()
+    counts["frames"] = 0
+    rng = random.Random(0)
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    changes = 0
+    while time.perf_counter() - wall0 < seconds:
+        play(game_id, rng)
+        changes += 1
+        time.sleep(1 / rate)
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+    stats = app.spectator_hub.stats()
+    stop.set()
+    play(game_id, rng)  # réveille les flux pour qu'ils voient l'arrêt
+    for t in threads:
+        t.join(timeout=5)
+    dropped = stats["dropped"] - stats0["dropped"]
+    published = stats["published"] - stats0["published"]
+    return cpu / wall, counts["frames"] / wall, changes, published, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--viewers", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rate", type=float, default=10, help="changements de la partie par seconde")
+    parser.add_argument("--slow", type=float, default=0.1, help="fraction de spectateurs lents (mode hub)")
+    parser.add_argument("--modes", nargs="+", default=["poll", "hub"])
+    args = parser.parse_args()
+    print(f"{'mode':>5}{'spect.':>8}{'CPU':>8}{'trames/s':>10}{'µs CPU/trame':>14}{'changements':>13}"
+          f"{'sérialisations':>16}{'sautées':>9}")
+    for viewers in args.viewers:
+        for mode in args.modes:
+            cpu, fps, changes, published, dropped = measure(mode, viewers, args.seconds, args.rate, args.slow)
+            serialized = f"{fps * args.seconds:.0f}" if mode == "poll" else str(published)
+            per_frame = cpu / fps * 1e6 if fps else 0
+            print(f"{mode:>5}{viewers:>8}{cpu:>8.0%}{fps:>10.0f}{per_frame:>14.0f}{changes:>13}{serialized:>16}"
+                  f"{dropped if mode == 'hub' else '-':>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Tournoi complet face au faux Ollama : parties par minute et attente dans la file du modèle.
+
+    python benchmarks/bench_tournament.py [--entrants 32] [--latency 0.2] [--concurrency 4] [--fifo]
+
+Les bots choisissent leurs coups par alpha-bêta et font écrire leurs solutions
+par le (faux) modèle ; les solutions sont vérifiées dans le bac à sable.
+L'attente dans la passerelle est donnée par usage : avec la file de priorité,
+les résolutions et vérifications passent avant la pré-génération de la
+réserve ; --fifo rétablit l'ancienne file unique pour comparer.
+"""
+import argparse
+import os
+import sys
+import threading
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mock_ollama import start_server  # noqa: E402
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entrants", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.2, help="latence du faux Ollama (s)")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--wrong", type=float, default=0.25, help="part de solutions fausses")
+    parser.add_argument("--concurrency", type=int, default=4, help="appels simultanés au modèle")
+    parser.add_argument("--parallel", type=int, default=32, help="parties simultanées")
+    parser.add_argument("--round-deadline", type=float, default=600)
+    parser.add_argument("--fifo", action="store_true", help="file unique, sans priorités")
+    args = parser.parse_args()
+
+    _, mock, url = start_server(latency=args.latency, jitter=args.jitter, wrong=args.wrong, seed=0)
+    os.environ["OLLAMA_HOST"] = url
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.concurrency)
+    os.environ["TOURNAMENT_MAX_PARALLEL"] = str(args.parallel)
+    os.environ.setdefault("CHALLENGE_STORE_PATH", ":memory:")
+    os.environ["GAME_JOURNAL_DIR"] = ""
+    os.environ["GAME_ARCHIVE_DIR"] = ""
+    import app
+
+    if args.fifo:
+        app.llm_gateway.priorities = {}
+        app.llm_gateway.default_priority = 0
+    waits = defaultdict(list)
+    lock = threading.Lock()
+    observer = app.llm_gateway.observer
+
+    def record(purpose, outcome, waited, duration, response):
+        with lock:
+            waits[purpose].append(waited)
+        observer(purpose, outcome, waited, duration, response)
+
+    app.llm_gateway.observer = record
+    app.sandbox_runner.run("def f(x):\n    return x\n", {"function_name": "f", "tests": [{"input": [1], "output": 1}]})
+
+    _, t = app.start_tournament([f"bot{i + 1}" for i in range(args.entrants)], args.round_deadline)
+    t.wait()
+    stats = t.stats()
+    print(f"{args.entrants} participants, {stats['rounds']} tours, file {'FIFO' if args.fifo else 'à priorités'}, "
+          f"{args.concurrency} appels simultanés, latence {args.latency * 1000:.0f} ms")
+    print(f"{stats['games_played']} parties, {stats['turns']} tours de jeu en {stats['elapsed']:.1f} s : "
+          f"{stats['games_per_minute']:.1f} parties/min, {stats['turns'] * 60 / stats['elapsed']:.0f} coups/min")
+    print(f"champion {stats['champion']}, {stats['deadline_decisions']} matchs décidés au délai, "
+          f"{stats['errors']} erreurs, {mock.requests} appels au modèle")
+    for r, matches in enumerate(t.results()):
+        played = [m for m in matches if m["reason"] != "bye"]
+        seconds = [m["seconds"] for m in played]
+        print(f"  tour {r + 1}: {len(played)} parties, durée moyenne {sum(seconds) / max(1, len(seconds)):.1f} s, "
+              f"{sum(1 for m in played if m['reason'] == 'win')} gagnées, {sum(1 for m in played if m['reason'] == 'draw')} nulles")
+    print(f"{'usage':<13}{'appels':>8}{'attente p50 ms':>16}{'p95 ms':>9}")
+    for purpose, values in sorted(waits.items()):
+        print(f"{purpose:<13}{len(values):>8}{percentile(values, 50) * 1000:>16.0f}{percentile(values, 95) * 1000:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
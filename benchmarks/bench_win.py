@@ -0,0 +1,58 @@
+"""Micro-bancs de check_win / check_draw / update_winner sur plusieurs tailles de grille.
+
+    python benchmarks/bench_win.py [--sizes 3 5 9 15 19] [--number 20000]
+
+Pour chaque taille, la grille est remplie aux deux tiers au hasard, sans
+gagnant si possible, ce qui force un parcours complet à chaque appel.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("CHALLENGE_STORE_PATH", ":memory:")
+os.environ["GAME_JOURNAL_DIR"] = ""
+os.environ["GAME_ARCHIVE_DIR"] = ""
+
+import app  # noqa: E402
+
+
+def board(size, rng):
+    g = app.Game(2, size, min(size, 5))
+    cells = [(r, c) for r in range(size) for c in range(size)]
+    rng.shuffle(cells)
+    for r, c in cells[: len(cells) * 2 // 3]:
+        g.set_cell(r, c, rng.choice(("red", "blue", "yellow")))
+        if g.check_win():
+            g.set_cell(r, c, "yellow")
+    return g
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 5, 9, 15, 19])
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    print(f"{'taille':>6}{'check_win µs':>15}{'check_draw µs':>15}{'update_winner µs':>18}{'set_cell µs':>13}")
+    for size in args.sizes:
+        g = board(size, rng)
+        timings = []
+        for stmt in (g.check_win, g.check_draw, g.update_winner):
+            timings.append(min(timeit.repeat(stmt, number=args.number, repeat=3)) / args.number * 1e6)
+        g.winner = None
+        cell = (size // 2, size // 2)
+        value = app.CELL_VALUES[g._board[cell[0] * size + cell[1]]]
+
+        def toggle():
+            g.set_cell(*cell, "yellow")
+            g.set_cell(*cell, value)
+        timings.append(min(timeit.repeat(toggle, number=args.number, repeat=3)) / args.number / 2 * 1e6)
+        print(f"{size:>6}" + "".join(f"{t:>{w}.3f}" for t, w in zip(timings, (15, 15, 18, 13))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Charge multi-parties : N parties jouées en parallèle, latences par route.
+
+    python benchmarks/load_test.py [--games 20] [--players 2] [--latency 0.2] [--malformed 0.1]
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --games 50
+
+Sans --url, l'application tourne dans ce processus (serveur werkzeug multi-thread)
+face au faux Ollama de mock_ollama.py. Avec --url, l'application visée doit
+elle-même pointer sur un faux Ollama (OLLAMA_HOST) pour que les solutions des
+défis soient connues. Chaque partie enchaîne home → join → grid → move →
+challenge (→ challenge_ready) → submit_challenge jusqu'à la fin de la partie ;
+le rapport donne p50/p95/p99 par route et le débit global.
+"""
+import argparse
+import html
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from mock_ollama import SOLUTIONS, start_server  # noqa: E402
+
+DESCRIPTION_RE = re.compile(r"<h1>Défi d'Algorithmie</h1>\s*<p>(.*?)</p>", re.S)
+TURN_RE = re.compile(r'data-turn="(\d+)" data-winner="([^"]*)"')
+WRONG_CODE = "def f(*args):\n    return None\n"
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return float("nan")
+    k = (len(values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def request(self, client, route, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            with self.lock:
+                self.errors[route] += 1
+            raise
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies[route].append(elapsed)
+            if resp.status_code >= 400:
+                self.errors[route] += 1
+        return resp
+
+
+def play_game(base_url, rec, num_players, wrong_rate, max_moves, rng):
+    clients = [httpx.Client(base_url=base_url, timeout=300) for _ in range(num_players)]
+    try:
+        host = clients[0]
+        r = rec.request(host, "home", "POST", "/", data={"num_players": str(num_players), "host_name": "p0"})
+        game_id = r.headers["location"].rstrip("/").split("/")[-1]
+        seats = [("red", "p2"), ("blue", "p1"), ("blue", "p2")] if num_players == 4 else [("blue", None)]
+        for i, (team, role) in enumerate(seats, start=1):
+            data = {"name": f"p{i}", "team": team}
+            if role:
+                data["role"] = role
+            rec.request(clients[i], "join", "POST", f"/join/{game_id}", data=data)
+        page = rec.request(host, "grid", "GET", f"/grid/{game_id}").text
+        size = 3 if num_players == 2 else 5
+        free = [(r, c) for r in range(size) for c in range(size)]
+        rng.shuffle(free)
+        moves = 0
+        while free and moves < max_moves:
+            turn, winner = TURN_RE.search(page).groups()
+            if winner:
+                break
+            client = clients[int(turn) % num_players]
+            row, col = free.pop()
+            rec.request(client, "move", "GET", f"/move/{game_id}/{row}/{col}")
+            page = rec.request(client, "challenge", "GET", f"/challenge/{game_id}/{row}/{col}").text
+            if "challenge_stream" in page:
+                # Réserve vide : génération synchrone, comme le repli sans JavaScript
+                rec.request(client, "challenge_ready", "GET", f"/challenge_ready/{game_id}/{row}/{col}")
+                page = rec.request(client, "challenge", "GET", f"/challenge/{game_id}/{row}/{col}").text
+            match = DESCRIPTION_RE.search(page)
+            description = html.unescape(match.group(1)).strip() if match else ""
+            code = SOLUTIONS.get(description, WRONG_CODE)
+            if rng.random() < wrong_rate:
+                code = WRONG_CODE
+            rec.request(client, "submit_challenge", "POST", f"/submit_challenge/{game_id}/{row}/{col}",
+                        data={"code": code})
+            page = rec.request(client, "grid", "GET", f"/grid/{game_id}").text
+            moves += 1
+        return moves
+    finally:
+        for client in clients:
+            client.close()
+
+
+def serve_app(latency, jitter, malformed):
+    """Application et faux Ollama dans ce processus ; renvoie (url, mock)."""
+    _, mock, ollama_url = start_server(latency=latency, jitter=jitter, malformed=malformed, seed=0)
+    os.environ["OLLAMA_HOST"] = ollama_url
+    os.environ.setdefault("CHALLENGE_STORE_PATH", ":memory:")
+    os.environ["GAME_JOURNAL_DIR"] = ""
+    os.environ["GAME_ARCHIVE_DIR"] = ""
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+    from werkzeug.serving import make_server
+
+    import app
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # pas une ligne par requête
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="app-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", mock
+
+
+def report(rec, elapsed, moves):
+    total = sum(len(v) for v in rec.latencies.values())
+    print(f"{'route':<18}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'err':>6}")
+    for route in ("home", "join", "grid", "move", "challenge", "challenge_ready", "submit_challenge"):
+        values = rec.latencies.get(route)
+        if not values:
+            continue
+        print(f"{route:<18}{len(values):>7}"
+              + "".join(f"{percentile(values, p) * 1000:>10.1f}" for p in (50, 95, 99))
+              + f"{max(values) * 1000:>10.1f}{rec.errors.get(route, 0):>6}")
+    print(f"\n{total} requêtes, {moves} coups en {elapsed:.1f} s : "
+          f"{total / elapsed:.1f} req/s, {moves / elapsed:.1f} coups/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="application déjà lancée (sinon démarrée ici)")
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--players", type=int, choices=(2, 4), default=2)
+    parser.add_argument("--concurrency", type=int, help="parties simultanées (défaut : toutes)")
+    parser.add_argument("--max-moves", type=int, default=25)
+    parser.add_argument("--wrong-rate", type=float, default=0.2, help="part de solutions fausses")
+    parser.add_argument("--latency", type=float, default=0.2, help="latence du faux Ollama (s)")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--malformed", type=float, default=0.1, help="part de générations au JSON tronqué")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    mock = None
+    url = args.url
+    if not url:
+        url, mock = serve_app(args.latency, args.jitter, args.malformed)
+    rec = Recorder()
+    rngs = [random.Random(args.seed + i) for i in range(args.games)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency or args.games) as pool:
+        futures = [pool.submit(play_game, url, rec, args.players, args.wrong_rate, args.max_moves, rng)
+                   for rng in rngs]
+        moves = 0
+        for future in futures:
+            try:
+                moves += future.result()
+            except Exception as e:
+                print(f"partie interrompue : {type(e).__name__}: {e}", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    report(rec, elapsed, moves)
+    if mock:
+        print(f"faux Ollama : {mock.requests} appels, {mock.malformed_sent} réponses tronquées")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Faux serveur Ollama pour les bancs de charge : latence réglable, réponses fixes.
+
+    python benchmarks/mock_ollama.py [--port 11435] [--latency 0.2] [--jitter 0.05] [--malformed 0.1] [--wrong 0.25]
+                                     [--slow 0.05] [--slow-latency 3] [--errors 0.1]
+
+Répond à /api/generate (avec ou sans flux NDJSON) et /api/tags. Les défis
+servis viennent de FIXTURES, dont les solutions sont connues du client de
+charge ; une fraction `malformed` des générations renvoie un JSON tronqué pour
+exercer la réparation. Les demandes de vérification reçoivent "OK" ; les
+demandes de résolution (bots de tournoi) reçoivent la solution du défi, fausse
+pour une fraction `wrong` d'entre elles. Une fraction `slow` des appels prend
+`slow_latency` secondes (queue de latence), une fraction `errors` reçoit une
+erreur 500 ; `models` compte les appels par modèle demandé.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# (défi, solution correcte)
+FIXTURES = [
+    ({"description": "Écrire une fonction qui renvoie la somme des nombres d'une liste.",
+      "function_name": "somme",
+      "tests": [{"input": [[1, 2, 3]], "output": 6}, {"input": [[]], "output": 0}, {"input": [[-4, 4]], "output": 0}]},
+     "def somme(nombres):\n    return sum(nombres)\n"),
+    ({"description": "Écrire une fonction qui renvoie le plus grand nombre d'une liste non vide.",
+      "function_name": "maximum",
+      "tests": [{"input": [[1, 5, 3]], "output": 5}, {"input": [[-2]], "output": -2}, {"input": [[0, 0]], "output": 0}]},
+     "def maximum(nombres):\n    return max(nombres)\n"),
+    ({"description": "Écrire une fonction qui compte les nombres pairs d'une liste.",
+      "function_name": "compte_pairs",
+      "tests": [{"input": [[1, 2, 4]], "output": 2}, {"input": [[]], "output": 0}, {"input": [[3, 5]], "output": 0}]},
+     "def compte_pairs(nombres):\n    return sum(1 for n in nombres if n % 2 == 0)\n"),
+    ({"description": "Écrire une fonction qui renvoie la liste triée par ordre croissant.",
+      "function_name": "trier",
+      "tests": [{"input": [[3, 1, 2]], "output": [1, 2, 3]}, {"input": [[]], "output": []}]},
+     "def trier(nombres):\n    return sorted(nombres)\n"),
+    ({"description": "Écrire une fonction qui inverse l'ordre des éléments d'une liste.",
+      "function_name": "inverser",
+      "tests": [{"input": [[1, 2, 3]], "output": [3, 2, 1]}, {"input": [[7]], "output": [7]}]},
+     "def inverser(nombres):\n    return nombres[::-1]\n"),
+]
+SOLUTIONS = {challenge["description"]: code for challenge, code in FIXTURES}
+
+
+class MockOllama:
+    def __init__(self, latency=0.2, jitter=0.05, malformed=0.0, chunk_size=16, seed=None, wrong=0.25, slow=0.0,
+                 slow_latency=3.0, errors=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow = slow
+        self.slow_latency = slow_latency
+        self.errors = errors
+        self.malformed = malformed
+        self.wrong = wrong
+        self.chunk_size = chunk_size
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.malformed_sent = 0
+        self.models = Counter()
+
+    def delay(self):
+        with self.lock:
+            if self.rng.random() < self.slow:
+                return self.slow_latency
+            return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def fails(self, model):
+        with self.lock:
+            self.models[model] += 1
+            return self.rng.random() < self.errors
+
+    def reply(self, prompt):
+        with self.lock:
+            self.requests += 1
+            if prompt.startswith("Vérifie"):
+                return json.dumps({"result": "OK", "errors": []})
+            if prompt.startswith("Écris"):
+                code = next((c for description, c in SOLUTIONS.items() if description in prompt), None)
+                if code is None or self.rng.random() < self.wrong:
+                    code = "def f(*args):\n    return None\n"
+                return f"```python\n{code}```"
+            challenge, _ = self.rng.choice(FIXTURES)
+            text = json.dumps(challenge, ensure_ascii=False)
+            if self.rng.random() < self.malformed:
+                self.malformed_sent += 1
+                return text[: len(text) // 2]
+            return text
+
+
+def _handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._json(200, {"models": [{"name": "llama3.2:3b", "model": "llama3.2:3b"}]})
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            try:
+                self._generate()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client parti avant la réponse (appel relancé ailleurs, délai dépassé)
+
+        def _generate(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._json(400, {"error": "invalid json"})
+            if self.path != "/api/generate":
+                return self._json(404, {"error": "not found"})
+            if mock.fails(body.get("model")):
+                time.sleep(mock.delay() / 10)
+                return self._json(500, {"error": "model runner has unexpectedly stopped"})
+            text = mock.reply(body.get("prompt") or "")
+            delay = mock.delay()
+            base = {"model": body.get("model"), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ")}
+            # Compteurs renvoyés par Ollama sur le dernier message (durées en ns)
+            final = dict(base, done=True, done_reason="stop", load_duration=1_000_000, total_duration=int(delay * 1e9),
+                         prompt_eval_count=len(body.get("prompt") or "") // 4, eval_count=len(text) // 4,
+                         eval_duration=int(delay * 0.9e9))
+            if not body.get("stream", True):
+                time.sleep(delay)
+                return self._json(200, dict(final, response=text))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            parts = [text[i:i + mock.chunk_size] for i in range(0, len(text), mock.chunk_size)] or [""]
+            for part in parts:
+                time.sleep(delay / len(parts))
+                self._chunk(json.dumps(dict(base, response=part, done=False)) + "\n")
+            self._chunk(json.dumps(dict(final, response="")) + "\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, line):
+            data = line.encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_server(port=0, **options):
+    """Démarre le serveur dans un thread ; renvoie (serveur, mock, url)."""
+    mock = MockOllama(**options)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(mock))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-ollama", daemon=True).start()
+    return server, mock, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--malformed", type=float, default=0.0)
+    parser.add_argument("--wrong", type=float, default=0.25, help="part de résolutions fausses")
+    parser.add_argument("--slow", type=float, default=0.0, help="part d'appels très lents")
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    parser.add_argument("--errors", type=float, default=0.0, help="part d'erreurs 500")
+    args = parser.parse_args()
+    server, _, url = start_server(args.port, latency=args.latency, jitter=args.jitter, malformed=args.malformed,
+                                  wrong=args.wrong, slow=args.slow, slow_latency=args.slow_latency, errors=args.errors)
+    print(f"Faux Ollama sur {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import copy
+import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
+from operator import itemgetter
+
+from win_engine import line_windows
+
+WIN = 1_000_000
+# Codes de case vus par l'équipe au trait (clé de la table de transposition)
+MINE, THEIRS, YELLOW, MINE_FAILED, THEIRS_FAILED = 1, 2, 4, 8, 16
+
+SearchResult = namedtuple("SearchResult", "move row col score depth nodes elapsed complete")
+
+
+class _Timeout(Exception):
+    pass
+
+
+def symmetries(size):
+    """Les 8 permutations de cases du carré (rotations et miroirs) : perm[i] = case d'origine."""
+    def index(r, c):
+        return r * size + c
+    n = size - 1
+    maps = (
+        lambda r, c: (r, c), lambda r, c: (c, n - r), lambda r, c: (n - r, n - c), lambda r, c: (n - c, r),
+        lambda r, c: (r, n - c), lambda r, c: (n - r, c), lambda r, c: (c, r), lambda r, c: (n - c, n - r),
+    )
+    perms = {tuple(index(*f(i // size, i % size)) for i in range(size * size)) for f in maps}
+    return sorted(perms)
+
+
+class TranspositionTable:
+    """Positions déjà évaluées, partagées par toutes les parties (et tous les bots).
+
+    Une position et ses 7 symétriques, couleurs rapportées à l'équipe au trait,
+    partagent une entrée. Au-delà de `max_entries`, la table est vidée.
+    Lue et écrite sans verrou par des recherches simultanées : une entrée est
+    un tuple remplacé d'un bloc (compteurs hits/lookups approximatifs).
+    """
+
+    def __init__(self, max_entries=500_000):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.lookups = 0
+
+    def get(self, key):
+        self.lookups += 1
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        if len(self._entries) >= self.max_entries:
+            with self._lock:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+        self._entries[key] = entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {"entries": len(self._entries), "lookups": self.lookups, "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else None}
+
+
+# exact, borne inférieure, borne supérieure
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class AlphaBetaBot:
+    """Recherche alpha-bêta (négamax, approfondissement itératif) pour une grille size x size, k alignés.
+
+    Un coup suppose la réussite du défi : la case passe à l'équipe. Une équipe
+    ne peut jouer que les cases vides et les cases jaunes qu'elle n'a pas ratées ;
+    la partie s'arrête quand il n'y a plus de case vide. Sur les grandes grilles,
+    seules les cases proches (distance 2) de cases déjà jouées sont envisagées.
+    """
+
+    def __init__(self, size, k, table=None, near_radius=2):
+        self.size = size
+        self.k = k
+        self.table = table if table is not None else TranspositionTable()
+        n = size * size
+        self.full = (1 << n) - 1
+        windows, by_cell = line_windows(size, k)
+        self.windows = [sum(1 << i for i in w) for w in windows]
+        self.cell_windows = [[self.windows[w] for w in ws] for ws in by_cell]
+        # Ordre statique : d'abord les cases traversées par le plus de fenêtres (centre)
+        self.order = sorted(range(n), key=lambda i: (-len(by_cell[i]), i))
+        self.weights = [0] + [8 ** (c - 1) for c in range(1, k + 1)]
+        self.perms = symmetries(size)
+        self.getters = [itemgetter(*p) for p in self.perms]
+        self.near = None
+        if n > 25 and near_radius:
+            self.near = [sum(1 << (rr * size + cc)
+                             for rr in range(max(0, r - near_radius), min(size, r + near_radius + 1))
+                             for cc in range(max(0, c - near_radius), min(size, c + near_radius + 1)))
+                         for r in range(size) for c in range(size)]
+        self.nodes = 0
+
+    # --- état courant de la recherche ---------------------------------------
+
+    def _setup(self, owner, failed, yellow):
+        self.owner = list(owner)
+        self.failed = list(failed)
+        self.yellow = yellow
+        n = self.size * self.size
+        self.views = [bytearray(n), bytearray(n)]  # codes vus par l'équipe 0 / 1
+        for i in range(n):
+            bit = 1 << i
+            for s in (0, 1):
+                code = 0
+                if owner[s] & bit: code |= MINE
+                if owner[1 - s] & bit: code |= THEIRS
+                if yellow & bit: code |= YELLOW
+                if failed[s] & bit: code |= MINE_FAILED
+                if failed[1 - s] & bit: code |= THEIRS_FAILED
+                self.views[s][i] = code
+
+    def _key(self, side):
+        view = self.views[side]
+        best, best_i = None, 0
+        for i, get in enumerate(self.getters):
+            t = get(view)
+            if best is None or t < best:
+                best, best_i = t, i
+        return (self.size, self.k, bytes(best)), self.perms[best_i]
+
+    def _play(self, idx, side):
+        self.owner[side] |= 1 << idx
+        self.views[side][idx] |= MINE
+        self.views[1 - side][idx] |= THEIRS
+
+    def _undo(self, idx, side):
+        self.owner[side] &= ~(1 << idx)
+        self.views[side][idx] &= ~MINE
+        self.views[1 - side][idx] &= ~THEIRS
+
+    def _moves(self, side):
+        taken = self.owner[0] | self.owner[1]
+        if (taken | self.yellow) == self.full:
+            return []  # plus de case vide : partie terminée
+        free = self.full & ~taken & ~self.failed[side]
+        if self.near is not None and (taken | self.yellow):
+            around = 0
+            occupied = taken | self.yellow
+            while occupied:
+                low = occupied & -occupied
+                around |= self.near[low.bit_length() - 1]
+                occupied ^= low
+            free = (free & around) or free
+        return [i for i in self.order if free >> i & 1]
+
+    def _wins(self, idx, side):
+        mine = self.owner[side]
+        return any(mine & w == w for w in self.cell_windows[idx])
+
+    def evaluate(self, side):
+        """Score heuristique pour l'équipe au trait : fenêtres encore jouables, pondérées."""
+        mine, theirs = self.owner[side], self.owner[1 - side]
+        mine_blocked, theirs_blocked = self.failed[side], self.failed[1 - side]
+        weights = self.weights
+        score = 0
+        for w in self.windows:
+            m, t = mine & w, theirs & w
+            if not t and not (mine_blocked & w):
+                score += weights[m.bit_count()]
+            if not m and not (theirs_blocked & w):
+                score -= weights[t.bit_count()]
+        return score
+
+    # --- recherche ----------------------------------------------------------
+
+    def _negamax(self, depth, alpha, beta, side, ply):
+        self.nodes += 1
+        if not self.nodes & 31 and time.perf_counter() > self.deadline:
+            raise _Timeout()
+        moves = self._moves(side)
+        if not moves:
+            return 0, None
+        if depth == 0:
+            return self.evaluate(side), None
+        key, perm = self._key(side)
+        entry = self.table.get(key)
+        tt_move = None
+        if entry is not None:
+            e_depth, e_value, e_flag, e_move = entry
+            tt_move = perm[e_move] if e_move is not None else None
+            if e_depth >= depth:
+                if e_flag == EXACT or (e_flag == LOWER and e_value >= beta) or (e_flag == UPPER and e_value <= alpha):
+                    return e_value, tt_move
+            if tt_move in moves:
+                moves.remove(tt_move)
+                moves.insert(0, tt_move)
+        alpha0 = alpha
+        best, best_move = -WIN * 2, None
+        for idx in moves:
+            self._play(idx, side)
+            try:
+                if self._wins(idx, side):
+                    score = WIN - ply  # gagner vite, perdre tard
+                else:
+                    score = -self._negamax(depth - 1, -beta, -alpha, 1 - side, ply + 1)[0]
+            finally:
+                self._undo(idx, side)
+            if score > best:
+                best, best_move = score, idx
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+        flag = UPPER if best <= alpha0 else LOWER if best >= beta else EXACT
+        self.table.put(key, (depth, best, flag, perm.index(best_move)))
+        return best, best_move
+
+    def search(self, owner, failed, yellow, side, time_budget=0.5, max_depth=None):
+        """Meilleur coup pour l'équipe `side` (0 ou 1) en au plus `time_budget` secondes.
+
+        `owner`, `failed` : bitmasks par équipe (bit r * size + c) ; `yellow` : cases jaunes.
+        """
+        start = time.perf_counter()
+        self.deadline = start + time_budget
+        self.nodes = 0
+        self._setup(owner, failed, yellow)
+        moves = self._moves(side)
+        if not moves:
+            return None
+        best_move, best_score, depth_done, complete = moves[0], 0, 0, False
+        # Chaque coup prend définitivement une case : au plus autant de coups que de cases libres
+        limit = (self.full & ~(self.owner[0] | self.owner[1])).bit_count()
+        if max_depth:
+            limit = min(limit, max_depth)
+        for depth in range(1, limit + 1):
+            try:
+                score, move = self._negamax(depth, -WIN * 2, WIN * 2, side, 0)
+            except _Timeout:
+                break
+            if move is not None:
+                best_move, best_score, depth_done = move, score, depth
+            if abs(score) >= WIN - 1000:
+                complete = True
+                break  # issue forcée trouvée
+        else:
+            complete = True
+        return SearchResult(best_move, best_move // self.size, best_move % self.size, best_score,
+                            depth_done, self.nodes, time.perf_counter() - start, complete)
+
+
+SHARED_TABLE = TranspositionTable()
+
+
+@lru_cache(maxsize=32)
+def engine(size, k):
+    """Moteur partagé par configuration ; la table de transposition est commune à tous."""
+    return AlphaBetaBot(size, k, SHARED_TABLE)
+
+
+def choose_move(size, k, owner, failed, yellow, side, time_budget=0.5, max_depth=None):
+    """Fonction de bibliothèque : SearchResult du meilleur coup (ou None si aucun coup possible)."""
+    # Copie superficielle par recherche : fenêtres, symétries et table de transposition restent
+    # partagées, l'état de la recherche (cases, nœuds, échéance) est propre à l'appel. Des parties
+    # de même taille cherchent ainsi en parallèle, sans attendre un verrou hors de leur budget.
+    return copy.copy(engine(size, k)).search(owner, failed, yellow, side, time_budget, max_depth)
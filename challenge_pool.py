@@ -0,0 +1,106 @@
+import threading
+import time
+import traceback
+from collections import deque
+
+
+class ChallengePool:
+    """Réserve de défis déjà générés et parsés, remplie en arrière-plan.
+
+    `generator` est appelé sans argument par les workers et doit renvoyer un
+    défi prêt à l'emploi (dict). `take()` ne bloque jamais : il rend un défi
+    s'il y en a un en stock, sinon None et le worker est relancé.
+    """
+
+    def __init__(self, generator, target=4, max_size=32, workers=1):
+        self.generator = generator
+        self.target = target
+        self.max_size = max_size
+        self.workers = workers
+        self._ready = deque()
+        self._demand = 0  # défis réclamés en plus de la cible (pré-remplissage)
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopped = False
+        self.generated = 0
+        self.failures = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _wanted(self):
+        return min(self.max_size, self.target + self._demand)
+
+    def start(self):
+        with self._cond:
+            if self._threads or self._stopped:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f"challenge-pool-{i}", daemon=True)
+                self._threads.append(t)
+                t.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def take(self):
+        self.start()
+        with self._cond:
+            if self._demand:
+                self._demand -= 1
+            if self._ready:
+                self.hits += 1
+                challenge = self._ready.popleft()
+            else:
+                self.misses += 1
+                challenge = None
+            self._cond.notify_all()
+        return challenge
+
+    def served(self):
+        """Un défi a été servi sans passer par la réserve (p. ex. depuis le stockage) :
+        la demande réclamée pour lui est satisfaite."""
+        with self._cond:
+            if self._demand:
+                self._demand -= 1
+
+    def prefill(self, count):
+        """Réclame `count` défis supplémentaires, p. ex. au lancement d'une partie."""
+        self.start()
+        with self._cond:
+            self._demand += count
+            self._cond.notify_all()
+
+    def size(self):
+        return len(self._ready)
+
+    def wait_ready(self, count=1, timeout=None):
+        """Attend qu'au moins `count` défis soient en stock ; renvoie True si c'est le cas."""
+        self.start()
+        with self._cond:
+            return self._cond.wait_for(lambda: self._stopped or len(self._ready) >= count, timeout) \
+                and len(self._ready) >= count
+
+    def _run(self):
+        backoff = 1
+        while True:
+            with self._cond:
+                while not self._stopped and len(self._ready) >= self._wanted():
+                    self._cond.wait()
+                if self._stopped:
+                    return
+            try:
+                challenge = self.generator()
+            except Exception:
+                traceback.print_exc()
+                self.failures += 1
+                # Ollama indisponible : on évite de le marteler
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            backoff = 1
+            with self._cond:
+                self._ready.append(challenge)
+                self.generated += 1
+                self._cond.notify_all()
@@ -0,0 +1,187 @@
+import json
+import threading
+from typing import Any
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+from sandbox import FUNCTION_RE, call_arguments
+
+
+class ChallengeTest(BaseModel):
+    input: list[Any]  # liste d'arguments
+    output: Any
+
+    @field_validator("input", mode="before")
+    @classmethod
+    def _wrap_single_argument(cls, value):
+        return value if isinstance(value, list) else [value]
+
+
+class Challenge(BaseModel):
+    description: str = Field(min_length=20)
+    function_name: str
+    tests: list[ChallengeTest] = Field(min_length=2)
+
+    @field_validator("function_name")
+    @classmethod
+    def _identifier(cls, value):
+        # "def nom(liste)" -> "nom"
+        m = FUNCTION_RE.search(value or "")
+        if not m:
+            raise ValueError("nom de fonction Python attendu")
+        return m.group(1)
+
+
+CHALLENGE_SCHEMA = Challenge.model_json_schema()
+FIELDS = tuple(Challenge.model_fields)
+
+
+def parse_challenge_text(raw):
+    raw = (raw or '').strip('` \n')
+    if raw.startswith('json'):
+        raw = raw[len('json'):].strip()
+    try:
+        return json.loads(raw)
+    except ValueError:
+        # extraire portion JSON brute
+        start = raw.find('{')
+        end = raw.rfind('}')
+        if start != -1 and end != -1:
+            try:
+                return json.loads(raw[start:end + 1])
+            except ValueError:
+                raise ValueError(f"Échec parse JSON, raw: {raw}")
+        raise ValueError(f"Pas de JSON détecté, raw: {raw}")
+
+
+def _kind(value):
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, (list, tuple)):
+        return "list"
+    return type(value).__name__
+
+
+def inconsistent_tests(tests):
+    """Incohérences entre les tests d'un défi (liste vide si tout va bien)."""
+    problems = []
+    # Arguments tels que le bac à sable les passera (sandbox.call_arguments) : des entrées de
+    # longueurs différentes ne se lisent que comme l'unique argument d'une fonction à un paramètre
+    arities = {len(t.input) for t in tests}
+    arity = arities.pop() if len(arities) == 1 else 1
+    calls = [call_arguments(t.input, arity)[0] for t in tests]
+    for pos in range(arity):
+        kinds = {_kind(args[pos]) for args in calls if args[pos] is not None}
+        if len(kinds) > 1:
+            problems.append(f"argument {pos + 1} de types incohérents : {sorted(kinds)}")
+    kinds = {_kind(t.output) for t in tests if t.output is not None}
+    if len(kinds) > 1:
+        problems.append(f"résultats attendus de types incohérents : {sorted(kinds)}")
+    seen = {}
+    for t in tests:
+        key = json.dumps(t.input, sort_keys=True, default=str)
+        if key in seen and seen[key] != t.output:
+            problems.append(f"même entrée {key} avec deux résultats différents")
+        seen.setdefault(key, t.output)
+    return problems
+
+
+def field_errors(data):
+    """Erreurs de validation regroupées par champ de premier niveau."""
+    if not isinstance(data, dict):
+        return {f: ["objet JSON attendu"] for f in FIELDS}
+    errors = {}
+    try:
+        challenge = Challenge.model_validate(data)
+    except ValidationError as e:
+        for err in e.errors():
+            field = err["loc"][0] if err["loc"] else "tests"
+            errors.setdefault(field if field in FIELDS else "tests", []).append(err["msg"])
+        return errors
+    problems = inconsistent_tests(challenge.tests)
+    if problems:
+        errors["tests"] = problems
+    return errors
+
+
+def _sub_schema(fields):
+    schema = {"type": "object",
+              "properties": {f: CHALLENGE_SCHEMA["properties"][f] for f in fields},
+              "required": list(fields)}
+    if "$defs" in CHALLENGE_SCHEMA:
+        schema["$defs"] = CHALLENGE_SCHEMA["$defs"]
+    return schema
+
+
+def repair_prompt(data, errors):
+    valid = {k: v for k, v in data.items() if k in FIELDS and k not in errors} if isinstance(data, dict) else {}
+    details = "\n".join(f"- {field}: {'; '.join(msgs)}" for field, msgs in errors.items())
+    return ("Voici un défi de programmation Python au format JSON dont certains champs sont invalides.\n"
+            f"Champs corrects (à ne pas modifier) : {json.dumps(valid, ensure_ascii=False)}\n"
+            f"Problèmes :\n{details}\n"
+            f"Réécris uniquement les champs {', '.join(errors)} pour qu'ils soient cohérents avec les champs corrects. "
+            "Chaque test est un objet {input: liste d'arguments, output: résultat attendu}, "
+            "tous les tests ont le même nombre d'arguments. Fournis uniquement l'objet JSON.")
+
+
+class ChallengeGenerator:
+    """Génération de défis contrainte par schéma, validée et réparée champ par champ.
+
+    `call(prompt, schema)` interroge le modèle avec une sortie JSON contrainte et
+    renvoie le texte brut. Un défi invalide n'est pas jeté : seuls ses champs en
+    erreur sont redemandés, dans la limite de `max_attempts` appels au total.
+    """
+
+    def __init__(self, prompt, max_attempts=3):
+        self.prompt = prompt
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self.reached = [0] * max_attempts  # générations ayant atteint l'appel n
+        self.accepted = [0] * max_attempts  # générations acceptées à l'appel n
+        self.rejected = 0
+        self.parse_failures = 0
+
+    def generate(self, call, first_raw=None):
+        """Renvoie un défi validé (dict) ; `first_raw` réutilise un premier texte déjà reçu (flux)."""
+        data, errors = None, {f: ["absent"] for f in FIELDS}
+        for attempt in range(self.max_attempts):
+            with self._lock:
+                self.reached[attempt] += 1
+            if attempt == 0 and first_raw is not None:
+                raw = first_raw
+            elif data is None:
+                raw = call(self.prompt, CHALLENGE_SCHEMA)
+            else:
+                raw = call(repair_prompt(data, errors), _sub_schema(list(errors)))
+            try:
+                parsed = parse_challenge_text(raw)
+            except ValueError:
+                parsed = None
+            if not isinstance(parsed, dict):
+                with self._lock:
+                    self.parse_failures += 1
+                continue  # rien d'exploitable : on garde l'état précédent
+            if data is None:
+                data = parsed
+            else:
+                # Réparation : seuls les champs en erreur sont remplacés
+                data = dict(data, **{k: v for k, v in parsed.items() if k in errors})
+            errors = field_errors(data)
+            if not errors:
+                with self._lock:
+                    self.accepted[attempt] += 1
+                return Challenge.model_validate(data).model_dump()
+        with self._lock:
+            self.rejected += 1
+        raise ValueError(f"Défi invalide après {self.max_attempts} appels : {errors}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "attempts": [{"attempt": i + 1, "reached": r, "accepted": a, "success_rate": a / r if r else None}
+                             for i, (r, a) in enumerate(zip(self.reached, self.accepted))],
+                "rejected": self.rejected,
+                "parse_failures": self.parse_failures,
+            }
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sandbox import function_name
+
+
+def normalize_challenge(challenge):
+    description = " ".join(str(challenge.get("description") or "").split()).casefold()
+    tests = [{"input": t.get("input"), "output": t.get("output")}
+             for t in challenge.get("tests") or [] if isinstance(t, dict)]
+    return {"description": description, "function_name": function_name(challenge), "tests": tests}
+
+
+def challenge_hash(challenge):
+    """Empreinte du contenu normalisé : deux formulations identiques au blanc près partagent la même clé."""
+    payload = json.dumps(normalize_challenge(challenge), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ChallengeStore:
+    """Stockage SQLite des défis, adressé par contenu, avec un cache LRU en mémoire."""
+
+    def __init__(self, path="challenges.db", cache_size=256):
+        self.path = path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS challenges ("
+            " hash TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " served INTEGER NOT NULL DEFAULT 0,"
+            " solved INTEGER NOT NULL DEFAULT 0)"
+        )
+        # `pick` parcourt cet index dans l'ordre au lieu de trier toute la table
+        self._db.execute("CREATE INDEX IF NOT EXISTS challenges_served ON challenges (served)")
+        # Défis à écarter d'un `pick`, propres à cette connexion
+        self._db.execute("CREATE TEMP TABLE IF NOT EXISTS pick_exclude (hash TEXT PRIMARY KEY)")
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _remember(self, cid, challenge):
+        self._cache[cid] = challenge
+        self._cache.move_to_end(cid)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def put(self, challenge):
+        cid = challenge_hash(challenge)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO challenges (hash, data, created_at) VALUES (?, ?, ?)",
+                (cid, json.dumps(challenge, ensure_ascii=False), time.time()),
+            )
+            self._remember(cid, challenge)
+        return cid
+
+    def get(self, cid):
+        with self._lock:
+            challenge = self._cache.get(cid)
+            if challenge is not None:
+                self.cache_hits += 1
+                self._cache.move_to_end(cid)
+                return challenge
+            self.cache_misses += 1
+            row = self._db.execute("SELECT data FROM challenges WHERE hash = ?", (cid,)).fetchone()
+            if row is None:
+                return None
+            challenge = json.loads(row[0])
+            self._remember(cid, challenge)
+            return challenge
+
+    def pick(self, exclude=(), candidates=32):
+        """Défi stocké le moins servi hors `exclude`, sous forme (hash, défi), ou None.
+
+        Lit au plus `candidates` lignes (hors exclus) dans l'ordre de l'index sur
+        `served`, puis tire au hasard parmi les moins servies.
+        """
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("DELETE FROM pick_exclude")
+                self._db.executemany("INSERT OR IGNORE INTO pick_exclude (hash) VALUES (?)", ((cid,) for cid in exclude))
+                rows = self._db.execute(
+                    "SELECT hash, served FROM challenges INDEXED BY challenges_served"
+                    " WHERE hash NOT IN (SELECT hash FROM pick_exclude) ORDER BY served LIMIT ?",
+                    (candidates,),
+                ).fetchall()
+            finally:
+                self._db.execute("COMMIT")
+        if not rows:
+            return None
+        cid = random.choice([cid for cid, served in rows if served == rows[0][1]])
+        challenge = self.get(cid)
+        return (cid, challenge) if challenge is not None else None
+
+    def items(self, batch=1000):
+        """Tous les défis stockés, (hash, défi), lus par lots pour ne pas garder le verrou."""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute("SELECT rowid, hash, data FROM challenges WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                                        (last, batch)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            for _, cid, data in rows:
+                yield cid, json.loads(data)
+
+    def record_served(self, cid):
+        with self._lock:
+            self._db.execute("UPDATE challenges SET served = served + 1 WHERE hash = ?", (cid,))
+
+    def record_solved(self, cid):
+        with self._lock:
+            self._db.execute("UPDATE challenges SET solved = solved + 1 WHERE hash = ?", (cid,))
+
+    def stats(self, cid):
+        with self._lock:
+            row = self._db.execute("SELECT served, solved FROM challenges WHERE hash = ?", (cid,)).fetchone()
+        return {"served": row[0], "solved": row[1]} if row else None
+
+    def count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM challenges").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,186 @@
+import json
+import threading
+
+
+def _decode(raw):
+    # Une chaîne coupée en plein échappement (\u00e, \) est tronquée jusqu'à redevenir valide
+    for cut in range(0, 7):
+        try:
+            return json.loads('"' + (raw[:len(raw) - cut] if cut else raw) + '"')
+        except ValueError:
+            continue
+    return ""
+
+
+class PartialJSON:
+    """Analyse incrémentale d'un objet JSON reçu morceau par morceau.
+
+    Seules les valeurs chaînes de premier niveau sont extraites : `fields` contient
+    celles qui sont complètes et `partial(clé)` la valeur en cours de réception.
+    Ce qui précède la première accolade (```json, texte libre) est ignoré.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.complete = False
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buf = []
+        self._expect_key = False
+        self._key = None
+
+    def feed(self, text):
+        for ch in text:
+            if self.complete:
+                return
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._expect_key = True
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._end_string(_decode("".join(self._buf)))
+                    continue
+                self._buf.append(ch)
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._buf = []
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.complete = True
+            elif ch == "," and self._depth == 1:
+                self._expect_key = True
+                self._key = None
+
+    def _end_string(self, value):
+        if self._depth != 1:
+            return
+        if self._expect_key:
+            self._key = value
+            self._expect_key = False
+        elif self._key is not None:
+            self.fields[self._key] = value
+
+    def partial(self, key):
+        if key in self.fields:
+            return self.fields[key]
+        if self._in_string and self._depth == 1 and not self._expect_key and self._key == key:
+            return _decode("".join(self._buf))
+        return None
+
+
+class StreamingGeneration:
+    """Génération de défi en cours, observable par plusieurs lecteurs SSE."""
+
+    def __init__(self):
+        self.parser = PartialJSON()
+        self.chunks = 0
+        self.chars = 0
+        self.challenge = None
+        self.error = None
+        self.done = False
+        self._version = 0
+        self._cond = threading.Condition()
+
+    @property
+    def displayable(self):
+        # De quoi afficher la page du défi, même si les tests ne sont pas encore arrivés
+        return "description" in self.parser.fields and "function_name" in self.parser.fields
+
+    def feed(self, text):
+        with self._cond:
+            self.parser.feed(text)
+            self.chunks += 1
+            self.chars += len(text)
+            self._version += 1
+            self._cond.notify_all()
+
+    def finish(self, challenge=None, error=None):
+        with self._cond:
+            self.challenge = challenge
+            self.error = error
+            self.done = True
+            self._version += 1
+            self._cond.notify_all()
+
+    def wait(self, timeout=None):
+        with self._cond:
+            self._cond.wait_for(lambda: self.done, timeout)
+            return self.challenge
+
+    def events(self, keepalive=15):
+        """Génère des couples (événement, données) jusqu'à la fin de la génération.
+
+        ("ping", None) est émis après `keepalive` secondes sans nouveauté.
+        """
+        seen = -1
+        description = None
+        ready = False
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._version != seen, keepalive):
+                    yield "ping", None
+                    continue
+                seen = self._version
+                progress = {"chunks": self.chunks, "chars": self.chars}
+                partial = self.parser.partial("description")
+                displayable = self.displayable
+                done, error = self.done, self.error
+            yield "progress", progress
+            if partial is not None and partial != description:
+                description = partial
+                yield "description", {"text": description}
+            if displayable and not ready:
+                ready = True
+                yield "ready", {}
+            if done:
+                if error:
+                    yield "error", {"message": error}
+                else:
+                    if not ready:
+                        yield "ready", {}
+                    yield "done", {}
+                return
+
+
+class StreamRegistry:
+    """Générations en cours, une au plus par case de partie."""
+
+    def __init__(self):
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._streams.get(key)
+
+    def start(self, key, starter):
+        """Renvoie (génération, créée) ; `starter(génération)` lance l'appel au modèle."""
+        with self._lock:
+            gen = self._streams.get(key)
+            if gen is not None:
+                return gen, False
+            gen = self._streams[key] = StreamingGeneration()
+        try:
+            starter(gen)
+        except Exception as e:
+            self.remove(key)
+            gen.finish(error=str(e))
+        return gen, True
+
+    def remove(self, key):
+        with self._lock:
+            self._streams.pop(key, None)
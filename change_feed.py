@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+def merge_deltas(deltas):
+    """Fusionne des deltas successifs : la dernière valeur de chaque case / champ l'emporte."""
+    merged = {}
+    for delta in deltas:
+        for key, value in delta.items():
+            if key == "cells":
+                merged.setdefault("cells", {}).update(value)
+            else:
+                merged[key] = value
+    return merged
+
+
+class ChangeFeed:
+    """Changements récents de chaque partie, pour les clients en attente (long-polling).
+
+    Chaque entrée couvre un passage de version `(de, à)` ; seules les
+    `history` dernières sont gardées par partie. `since` renvoie None quand
+    l'historique ne remonte pas jusqu'à la version demandée (il faut alors un
+    instantané complet).
+    """
+
+    def __init__(self, history=64, max_games=4096):
+        self.history = history
+        self.max_games = max_games
+        self._lock = threading.Lock()
+        self._games = OrderedDict()  # game_id -> (deque[(de, à, delta)], Condition)
+        self.published = 0
+        self.misses = 0
+
+    def _feed(self, game_id):
+        feed = self._games.get(game_id)
+        if feed is None:
+            feed = self._games[game_id] = (deque(maxlen=self.history), threading.Condition(self._lock))
+            while len(self._games) > self.max_games:
+                _, (_, cond) = self._games.popitem(last=False)
+                cond.notify_all()
+        self._games.move_to_end(game_id)
+        return feed
+
+    def publish(self, game_id, from_version, to_version, delta):
+        if to_version == from_version:
+            return
+        with self._lock:
+            entries, cond = self._feed(game_id)
+            if entries and entries[-1][1] != from_version:
+                entries.clear()  # trou dans l'historique (autre worker) : on repart d'ici
+            entries.append((from_version, to_version, delta))
+            self.published += 1
+            cond.notify_all()
+
+    def since(self, game_id, version, current):
+        """Delta fusionné de `version` à `current`, ou None s'il n'est plus reconstituable."""
+        if version == current:
+            return {}
+        with self._lock:
+            feed = self._games.get(game_id)
+            entries = list(feed[0]) if feed else []
+        start = next((i for i, e in enumerate(entries) if e[0] == version), None)
+        if start is None or entries[-1][1] != current:
+            self.misses += 1
+            return None
+        return merge_deltas(e[2] for e in entries[start:])
+
+    def wait(self, game_id, version, timeout, current=None, poll=1.0):
+        """Attend qu'une version postérieure à `version` soit publiée, au plus `timeout` s.
+
+        `current()` (version partagée, si d'autres workers jouent aussi) est
+        relu toutes les `poll` secondes. Renvoie True si la partie a changé ou
+        n'est plus suivie (retirée, `drop`).
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            feed = self._feed(game_id)
+            entries, cond = feed
+            while True:
+                if entries and entries[-1][1] > version or self._games.get(game_id) is not feed:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                cond.wait(min(remaining, poll) if current else remaining)
+                if current:
+                    self._lock.release()
+                    try:
+                        latest = current()
+                    finally:
+                        self._lock.acquire()
+                    if latest is None or latest > version:
+                        return True
+
+    def drop(self, game_id):
+        """Oublie l'historique d'une partie retirée et réveille ceux qui l'attendent."""
+        with self._lock:
+            feed = self._games.pop(game_id, None)
+            if feed:
+                feed[1].notify_all()
+
+    def stats(self):
+        with self._lock:
+            return {"games": len(self._games), "published": self.published, "misses": self.misses}
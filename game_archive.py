@@ -0,0 +1,287 @@
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import traceback
+
+import numpy as np
+
+# Codes de la colonne `winner` en plus de l'index d'équipe
+WINNER_NONE = -1  # partie interrompue sans gagnant
+WINNER_DRAW = -2
+
+# Un coup : instant (s depuis le début de la partie), réflexion (s depuis le coup
+# précédent), case (r * grid_size + c), équipe, défi réussi, joué par un bot,
+# 64 premiers bits du hash du défi (0 si inconnu). `game` = ligne dans games.npy.
+MOVE_DTYPE = np.dtype([("game", "<u4"), ("at", "<f4"), ("think", "<f4"), ("cell", "<u2"), ("team", "i1"),
+                       ("ok", "?"), ("bot", "?"), ("challenge", "<u8")])
+
+# Cases en bitmasks (bit r * grid_size + c) sur MASK_WORDS mots de 64 bits, poids faible d'abord
+MAX_GRID = 19
+MASK_WORDS = -(-MAX_GRID * MAX_GRID // 64)
+
+
+def game_dtype(teams):
+    return np.dtype([("game_id", "S36"), ("finished_at", "<f8"), ("duration", "<f4"), ("grid_size", "u1"),
+                     ("win_count", "u1"), ("players", "u1"), ("bots", "u1"), ("winner", "i1"),
+                     ("yellow", "<u8", (MASK_WORDS,)), ("owner", "<u8", (len(teams), MASK_WORDS)),
+                     ("move_start", "<u8"), ("moves", "<u2")])
+
+
+def mask_words(mask):
+    """Entier Python (bitmask de cases) -> MASK_WORDS mots de 64 bits ; ValueError s'il dépasse."""
+    if not 0 <= mask < 1 << (64 * MASK_WORDS):
+        raise ValueError(f"masque hors des {64 * MASK_WORDS} bits archivables")
+    return [(mask >> (64 * w)) & 0xFFFFFFFFFFFFFFFF for w in range(MASK_WORDS)]
+
+
+def mask_bits(masks, cells):
+    """Mots (..., MASK_WORDS) -> bits (..., cells) en uint8 (bit i = case i)."""
+    masks = np.ascontiguousarray(masks, dtype="<u8")
+    return np.unpackbits(masks.view(np.uint8), axis=-1, count=cells, bitorder="little")
+
+
+def _header(dtype, rows, size):
+    # En-tête .npy version 1.0 complété par des espaces jusqu'à `size` octets : réécrit en place à chaque ajout
+    text = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": (rows,)})
+    text = text.ljust(size - 11) + "\n"
+    return np.lib.format.magic(1, 0) + struct.pack("<H", len(text)) + text.encode("latin1")
+
+
+class NpyAppender:
+    """Fichier .npy à une dimension auquel on ajoute des lignes par lots.
+
+    L'en-tête réserve la place d'un nombre de lignes de 20 chiffres : un ajout
+    écrit les lignes en fin de fichier puis réécrit l'en-tête à la même
+    taille. Le fichier reste un .npy ordinaire (np.load, mmap_mode="r"). Des
+    lignes écrites sans que l'en-tête ait suivi (arrêt brutal) sont coupées à
+    l'ouverture.
+    """
+
+    def __init__(self, path, dtype):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        if not os.path.exists(path):
+            size = len(_header(self.dtype, 10 ** 19, 0)) + 1
+            self._header_size = -(-size // 64) * 64
+            with open(path, "wb") as f:
+                f.write(_header(self.dtype, 0, self._header_size))
+                f.flush()
+                os.fsync(f.fileno())
+        self._file = open(path, "r+b")
+        version = np.lib.format.read_magic(self._file)
+        read = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, _, dtype = read(self._file)
+        if dtype != self.dtype:
+            self._file.close()
+            raise ValueError(f"{path} : colonnes {dtype} au lieu de {self.dtype}")
+        self._header_size = self._file.tell()
+        self.rows = shape[0]
+        self.truncate(self.rows)
+
+    def truncate(self, rows):
+        """Ne garde que les `rows` premières lignes (et coupe ce qui dépasse)."""
+        self.rows = rows
+        self._file.truncate(self._header_size + rows * self.dtype.itemsize)
+        self._write_header()
+
+    def _write_header(self):
+        self._file.seek(0)
+        self._file.write(_header(self.dtype, self.rows, self._header_size))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def append(self, records):
+        records = np.ascontiguousarray(records, dtype=self.dtype)
+        if not len(records):
+            return
+        self._file.seek(self._header_size + self.rows * self.dtype.itemsize)
+        self._file.write(records.tobytes())
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        # Les lignes sont sur disque avant que l'en-tête ne les compte
+        self.rows += len(records)
+        self._write_header()
+
+    def last(self):
+        """Dernière ligne, ou None si le fichier est vide."""
+        if not self.rows:
+            return None
+        self._file.seek(self._header_size + (self.rows - 1) * self.dtype.itemsize)
+        return np.frombuffer(self._file.read(self.dtype.itemsize), dtype=self.dtype)[0]
+
+    def close(self):
+        self._file.close()
+
+
+class GameArchive:
+    """Archive en colonnes des parties terminées, pour l'analyse (voir analytics).
+
+    Deux tables .npy dans `directory` : games.npy (une ligne par partie) et
+    moves.npy (une ligne par coup, dans l'ordre des parties ; `move_start` et
+    `moves` d'une partie désignent ses coups). `record` met la partie en file ;
+    un thread ajoute les parties en attente par lots, au plus toutes les
+    `flush_interval` secondes : un lot = une écriture et un fsync par table.
+    Les coups sont écrits avant les parties ; des coups sans partie (arrêt
+    brutal entre les deux) sont coupés à l'ouverture.
+
+    Un seul processus écrit dans un répertoire ; analytics lit les tables en
+    mémoire projetée, par tranches, pendant que l'archive grandit.
+    """
+
+    def __init__(self, directory, teams, flush_interval=1.0):
+        self.directory = directory
+        self.teams = tuple(teams)
+        self.flush_interval = flush_interval
+        self.game_dtype = game_dtype(self.teams)
+        self._queue = []
+        self._cond = threading.Condition()
+        self._games = None
+        self._moves = None
+        self._io = threading.Lock()
+        self._thread = None
+        self._stopped = False
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        meta = os.path.join(self.directory, "meta.json")
+        if not os.path.exists(meta):
+            with open(meta, "w", encoding="utf-8") as f:
+                json.dump({"teams": list(self.teams)}, f)
+        self._moves = NpyAppender(os.path.join(self.directory, "moves.npy"), MOVE_DTYPE)
+        self._games = NpyAppender(os.path.join(self.directory, "games.npy"), self.game_dtype)
+        last = self._games.last()
+        end = 0 if last is None else int(last["move_start"]) + int(last["moves"])
+        if self._moves.rows != end:
+            self._moves.truncate(end)
+
+    def record(self, game_id, game, moves):
+        """Met une partie terminée en file.
+
+        `game` : valeurs des colonnes de games.npy (sauf `move_start`/`moves`),
+        `yellow` et `owner` en entiers Python ; `moves` : (instant, case, équipe,
+        réussi, bot, défi) par coup, dans l'ordre.
+        """
+        if not 0 < game.get("grid_size", 0) <= MAX_GRID:
+            # Refusée ici plutôt que de faire échouer tout le lot où elle tomberait
+            print(f"[archive] partie {game_id} ignorée : grille hors de 1..{MAX_GRID}", file=sys.stderr)
+            with self._cond:
+                self.dropped += 1
+            return
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="game-archive", daemon=True)
+                self._thread.start()
+            self._queue.append((game_id, game, moves))
+            self.recorded += 1
+            self._cond.notify_all()
+
+    def _columns(self, batch):
+        games = np.zeros(len(batch), dtype=self.game_dtype)
+        counts = np.array([len(moves) for _, _, moves in batch], dtype=np.int64)
+        moves = np.zeros(int(counts.sum()), dtype=MOVE_DTYPE)
+        games["move_start"] = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        games["moves"] = counts
+        for i, (game_id, game, _) in enumerate(batch):
+            games["game_id"][i] = game_id.encode("ascii", "replace")[:36]
+            for column, value in game.items():
+                if column == "yellow":
+                    value = mask_words(value)
+                elif column == "owner":
+                    value = [mask_words(mask) for mask in value]
+                games[column][i] = value
+        if len(moves):
+            rows = [m for _, _, game_moves in batch for m in game_moves]
+            at, cell, team, ok, bot, challenge = zip(*rows)
+            moves["game"] = np.repeat(np.arange(len(batch)), counts)
+            moves["at"] = at
+            moves["cell"] = cell
+            moves["team"] = team
+            moves["ok"] = ok
+            moves["bot"] = bot
+            moves["challenge"] = np.array(challenge, dtype=np.uint64)
+            # Réflexion : écart avec le coup précédent de la même partie (ou avec le début)
+            starts = games["move_start"][counts > 0]
+            think = np.diff(moves["at"], prepend=np.float32(0))
+            think[starts] = moves["at"][starts]
+            moves["think"] = think
+        return games, moves
+
+    def append(self, games, moves):
+        """Ajout en bloc de colonnes déjà formées (lot du thread, import, tests de charge).
+
+        Comme pour un lot isolé : `move_start` part de 0 au début de `moves` et
+        `moves["game"]` de 0 à la première ligne de `games` ; l'archive les décale.
+        """
+        games = np.array(games, dtype=self.game_dtype)
+        moves = np.array(moves, dtype=MOVE_DTYPE)
+        with self._io:
+            if self._games is None:
+                self._open()
+            games["move_start"] += self._moves.rows
+            moves["game"] += self._games.rows
+            self._moves.append(moves)
+            self._games.append(games)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._stopped)
+                batch, self._queue = self._queue, []
+                stopping = self._stopped
+            if batch:
+                try:
+                    self.append(*self._columns(batch))
+                    ok = True
+                except Exception:
+                    print(f"[archive] lot de {len(batch)} partie(s) perdu :", file=sys.stderr)
+                    traceback.print_exc()
+                    ok = False
+                with self._cond:
+                    if ok:
+                        self.written += len(batch)
+                        self.batches += 1
+                    else:
+                        self.dropped += len(batch)
+                    self._cond.notify_all()
+            if stopping:
+                return
+            # Laisse les parties suivantes s'accumuler : un ajout par lot
+            time.sleep(self.flush_interval)
+
+    def flush(self, timeout=None):
+        """Attend que les parties mises en file jusqu'ici soient traitées.
+
+        False si le délai expire ou si un lot a été perdu entre-temps (voir `dropped`).
+        """
+        with self._cond:
+            if self._thread is None:
+                return True
+            target, dropped = self.recorded, self.dropped
+            if not self._cond.wait_for(lambda: self.written + self.dropped >= target, timeout):
+                return False
+            return self.dropped == dropped
+
+    def close(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread:
+            thread.join()
+        with self._io:
+            for table in (self._moves, self._games):
+                if table:
+                    table.close()
+            self._games = self._moves = None
+
+    def stats(self):
+        with self._cond:
+            return {"recorded": self.recorded, "written": self.written, "dropped": self.dropped, "batches": self.batches,
+                    "queued": len(self._queue), "rows": self._games.rows if self._games else 0}
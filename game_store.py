@@ -0,0 +1,258 @@
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from state_backend import ConflictError
+
+
+class GameStore:
+    """Parties en mémoire avec expiration, plafond et éviction LRU.
+
+    S'utilise comme le dict `games` d'origine (`in`, `get`, `[]`). Chaque accès
+    rafraîchit la partie ; un balayage périodique retire les parties inactives
+    depuis `idle_ttl` secondes et les parties terminées depuis `finished_ttl`.
+    Au-delà de `max_games` parties ou de `max_bytes` octets estimés, les parties
+    les moins récemment utilisées sont évincées.
+
+    Avec un `backend` (voir state_backend), le store n'est plus qu'un cache local :
+    chaque lecture vérifie la version partagée et les modifications passent par
+    `update`, qui rejoue la mutation sur une copie fraîche en cas de conflit.
+
+    Sans backend, un `journal` (voir journal) peut enregistrer chaque création,
+    modification et retrait de partie ; `restore` remet en cache les parties
+    relues au démarrage.
+
+    `on_remove(game_id)` est appelé à chaque retrait de partie (expiration,
+    éviction, suppression) pour libérer ce qui lui est attaché ailleurs.
+    """
+
+    def __init__(self, idle_ttl=7200, finished_ttl=900, max_games=10000, max_bytes=None,
+                 sweep_interval=30, size_of=None, is_finished=None,
+                 backend=None, to_state=None, from_state=None, journal=None, on_remove=None):
+        self.idle_ttl = idle_ttl
+        self.finished_ttl = finished_ttl
+        self.max_games = max_games
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.size_of = size_of or (lambda game: 0)
+        self.is_finished = is_finished or (lambda game: getattr(game, "winner", None) is not None)
+        self.backend = backend
+        self.to_state = to_state
+        self.from_state = from_state
+        self.journal = None if backend else journal
+        self.on_remove = on_remove
+        self._games = OrderedDict()  # game_id -> partie, de la moins à la plus récemment utilisée
+        self._last_access = {}
+        self._finished_at = {}
+        self._sizes = {}
+        self._versions = {}
+        self._locks = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._sweeper = None
+        self._stopped = threading.Event()
+        self.expired = 0
+        self.evicted = 0
+
+    def __contains__(self, game_id):
+        with self._lock:
+            return game_id in self._games
+
+    def __len__(self):
+        with self._lock:
+            return len(self._games)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._games))
+
+    def __getitem__(self, game_id):
+        game = self.get(game_id)
+        if game is None:
+            raise KeyError(game_id)
+        return game
+
+    def __setitem__(self, game_id, game):
+        self.start()
+        version = self.backend.save(game_id, self.to_state(game), None) if self.backend else 0
+        with self._lock:
+            self._cache(game_id, game, version)
+            if self.journal:
+                self.journal.created(game_id, game)
+
+    def restore(self, game_id, game):
+        """Remet en cache une partie relue du journal, sans la journaliser à nouveau."""
+        with self._lock:
+            self._cache(game_id, game, 0)
+
+    def __delitem__(self, game_id):
+        with self._lock:
+            if game_id not in self._games:
+                raise KeyError(game_id)
+            self._remove(game_id)
+        if self.backend:
+            self.backend.delete(game_id)
+
+    def _cache(self, game_id, game, version):
+        if game_id in self._games:
+            self._drop(game_id)
+        self._games[game_id] = game
+        self._last_access[game_id] = time.monotonic()
+        self._versions[game_id] = version
+        self._sizes[game_id] = size = self.size_of(game)
+        self._bytes += size
+        self._enforce_caps()
+
+    def get(self, game_id, default=None):
+        version = self.backend.version(game_id) if self.backend else None
+        with self._lock:
+            game = self._games.get(game_id)
+            if self.backend and version is None:
+                if game is not None:
+                    self._remove(game_id)  # supprimée par un autre worker
+                return default
+            if game is not None and (not self.backend or self._versions.get(game_id) == version):
+                self._games.move_to_end(game_id)
+                self._last_access[game_id] = time.monotonic()
+                return game
+        if not self.backend:
+            return default
+        # Copie locale absente ou périmée : un autre worker a modifié la partie
+        loaded = self.backend.load(game_id)
+        if loaded is None:
+            return default
+        state, version = loaded
+        game = self.from_state(state)
+        with self._lock:
+            self._cache(game_id, game, version)
+        return game
+
+    def update(self, game_id, mutate, retries=3):
+        """Applique `mutate(partie)` et renvoie son résultat, sans écrasement concurrent.
+
+        Sans backend, la mutation se fait sous un verrou propre à la partie. Avec
+        un backend, elle porte sur une copie relue puis enregistrée si la version
+        n'a pas bougé ; sinon elle est rejouée (au plus `retries` fois) avant
+        ConflictError.
+        """
+        if not self.backend:
+            with self._lock:
+                lock = self._locks.setdefault(game_id, threading.RLock())
+            try:
+                with lock:
+                    game = self.get(game_id)
+                    if game is None:
+                        raise KeyError(game_id)
+                    if not self.journal:
+                        return mutate(game)
+                    before = self.to_state(game)
+                    try:
+                        return mutate(game)
+                    finally:
+                        self.journal.changed(game_id, before, game)
+            finally:
+                # Partie retirée (ou inconnue) pendant la mutation : son verrou n'a plus lieu d'être
+                with self._lock:
+                    if game_id not in self._games and self._locks.get(game_id) is lock:
+                        self._release_lock(game_id)
+        for _ in range(retries):
+            loaded = self.backend.load(game_id)
+            if loaded is None:
+                raise KeyError(game_id)
+            state, version = loaded
+            game = self.from_state(state)
+            result = mutate(game)
+            try:
+                version = self.backend.save(game_id, self.to_state(game), version)
+            except ConflictError:
+                continue
+            with self._lock:
+                self._cache(game_id, game, version)
+            return result
+        raise ConflictError(game_id)
+
+    def _drop(self, game_id):
+        game = self._games.pop(game_id)
+        self._last_access.pop(game_id, None)
+        self._finished_at.pop(game_id, None)
+        self._versions.pop(game_id, None)
+        self._release_lock(game_id)
+        self._bytes -= self._sizes.pop(game_id, 0)
+        return game
+
+    def _release_lock(self, game_id):
+        # Un verrou tenu par un `update` en cours reste en place : le retirer laisserait
+        # un second `update` en créer un autre et muter la partie en même temps
+        lock = self._locks.get(game_id)
+        if lock is not None and lock.acquire(blocking=False):
+            try:
+                del self._locks[game_id]
+            finally:
+                lock.release()
+
+    def _remove(self, game_id):
+        # Retrait définitif (le remplacement dans `_cache` passe par `_drop` seul)
+        if self.journal:
+            self.journal.deleted(game_id)
+        game = self._drop(game_id)
+        if self.on_remove:
+            try:
+                self.on_remove(game_id)
+            except Exception:
+                traceback.print_exc()
+        return game
+
+    def _enforce_caps(self):
+        while self._games and (len(self._games) > self.max_games
+                               or (self.max_bytes and self._bytes > self.max_bytes)):
+            self._remove(next(iter(self._games)))
+            self.evicted += 1
+
+    def sweep(self, now=None):
+        """Retire les parties expirées ; renvoie le nombre de parties retirées."""
+        now = time.monotonic() if now is None else now
+        removed = 0
+        with self._lock:
+            for game_id, game in list(self._games.items()):
+                if self.is_finished(game):
+                    finished = self._finished_at.setdefault(game_id, now)
+                    if now - finished >= self.finished_ttl:
+                        self._remove(game_id)
+                        removed += 1
+                        continue
+                if now - self._last_access[game_id] >= self.idle_ttl:
+                    self._remove(game_id)
+                    removed += 1
+                    continue
+                # Les parties grossissent en cours de jeu : on réévalue leur taille
+                size = self.size_of(game)
+                self._bytes += size - self._sizes[game_id]
+                self._sizes[game_id] = size
+            self.expired += removed
+            self._enforce_caps()
+        if self.backend:
+            # Côté partagé, seules les parties abandonnées de tous les workers sont supprimées
+            self.expired += self.backend.purge(self.idle_ttl)
+        return removed
+
+    def start(self):
+        with self._lock:
+            if self._sweeper or not self.sweep_interval:
+                return
+            self._sweeper = threading.Thread(target=self._run, name="game-store-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception:
+                traceback.print_exc()
+
+    def stats(self):
+        with self._lock:
+            return {"live": len(self._games), "bytes": self._bytes, "expired": self.expired, "evicted": self.evicted}
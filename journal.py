@@ -0,0 +1,246 @@
+import json
+import os
+import re
+import threading
+import time
+import traceback
+
+SEGMENT_RE = re.compile(r"^(journal|snapshot)-(\d{6})\.(log|jsonl)$")
+
+
+class GameJournal:
+    """Journal en ajout seul des modifications de parties, pour survivre à un redémarrage.
+
+    Chaque modification est une ligne JSON : création (état complet), événements
+    (arrivée d'un joueur, défi attribué, verdict, tour, gagnant) avec la version
+    atteinte, ou suppression. Un thread écrit les lignes par lots et fait un seul
+    fsync par lot, au plus toutes les `fsync_interval` secondes : un arrêt brutal
+    perd au pire ce dernier intervalle.
+
+    Après `snapshot_every` événements, l'état complet de la partie est réécrit
+    dans le journal ; au-delà de `compact_bytes`, le journal est compacté en un
+    fichier d'instantanés (dernier état de chaque partie) et repart de zéro.
+    `recover()` relit le dernier instantané puis la fin du journal.
+
+    Le journal ne connaît pas les parties : `to_state`/`from_state` les
+    (dé)sérialisent, `diff(avant, partie)` liste les événements depuis l'état
+    `avant`, `apply(partie, événement)` en rejoue un.
+    """
+
+    def __init__(self, directory, to_state, from_state, diff, apply,
+                 fsync_interval=0.05, snapshot_every=200, compact_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.to_state = to_state
+        self.from_state = from_state
+        self.diff = diff
+        self.apply = apply
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self.compact_bytes = compact_bytes
+        self._queue = []
+        self._cond = threading.Condition()
+        self._pending = {}  # game_id -> événements depuis le dernier état complet
+        self._file = None
+        self._segment = None
+        self._thread = None
+        self._stopped = False
+        self.written = 0
+        self.synced = 0
+        self.batches = 0
+        self.compactions = 0
+
+    # --- fichiers -----------------------------------------------------------
+
+    def _files(self):
+        found = {"journal": [], "snapshot": []}
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                m = SEGMENT_RE.match(name)
+                if m:
+                    found[m.group(1)].append(int(m.group(2)))
+        return sorted(found["snapshot"]), sorted(found["journal"])
+
+    def _path(self, kind, seq):
+        return os.path.join(self.directory, f"{kind}-{seq:06d}.{'log' if kind == 'journal' else 'jsonl'}")
+
+    def _trim_partial_line(self, path):
+        # Un arrêt brutal peut laisser une dernière ligne sans "\n" : on la coupe avant
+        # d'ajouter, sinon l'enregistrement suivant lui serait collé et illisible
+        if not os.path.exists(path):
+            return
+        with open(path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:
+                step = min(65536, pos)
+                f.seek(pos - step)
+                cut = f.read(step).rfind(b"\n")
+                if cut >= 0:
+                    pos = pos - step + cut + 1
+                    break
+                pos -= step
+            if pos < end:
+                f.truncate(pos)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _open_segment(self, seq):
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+        self._segment = seq
+        self._trim_partial_line(self._path("journal", seq))
+        self._file = open(self._path("journal", seq), "a", encoding="utf-8")
+
+    # --- écriture -----------------------------------------------------------
+
+    def _enqueue(self, record):
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        with self._cond:
+            if self._thread is None:
+                self._start()
+            self._queue.append(line)
+            self.written += 1
+            self._cond.notify_all()
+
+    def _start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        snapshots, segments = self._files()
+        self._open_segment(max(segments + snapshots + [1]))
+        self._thread = threading.Thread(target=self._run, name="game-journal", daemon=True)
+        self._thread.start()
+
+    def created(self, game_id, game):
+        self._pending[game_id] = 0
+        self._enqueue({"g": game_id, "s": self.to_state(game)})
+
+    def changed(self, game_id, before, game):
+        events = self.diff(before, game)
+        if not events:
+            return
+        self._enqueue({"g": game_id, "v": game.version, "e": events})
+        count = self._pending.get(game_id, 0) + len(events)
+        if count >= self.snapshot_every:
+            # Instantané dans le journal : la relecture repart de cet état
+            self._enqueue({"g": game_id, "s": self.to_state(game)})
+            count = 0
+        self._pending[game_id] = count
+
+    def deleted(self, game_id):
+        self._pending.pop(game_id, None)
+        self._enqueue({"g": game_id, "d": 1})
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._stopped)
+                batch, self._queue = self._queue, []
+                stopping = self._stopped
+            if batch:
+                try:
+                    self._file.write("".join(batch))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                except OSError:
+                    traceback.print_exc()
+                with self._cond:
+                    self.synced += len(batch)
+                    self.batches += 1
+                    self._cond.notify_all()
+                try:
+                    if self.compact_bytes and self._file.tell() >= self.compact_bytes:
+                        self.compact()
+                except Exception:
+                    traceback.print_exc()
+            if stopping:
+                return
+            # Laisse les écritures suivantes s'accumuler : un fsync par lot
+            time.sleep(self.fsync_interval)
+
+    def flush(self, timeout=None):
+        """Attend que tout ce qui a été journalisé jusqu'ici soit sur disque."""
+        with self._cond:
+            target = self.written
+            return self._cond.wait_for(lambda: self.synced >= target, timeout)
+
+    def close(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread:
+            thread.join()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    # --- relecture et compactage ------------------------------------------------
+
+    def _replay(self, path, games):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # ligne tronquée par un arrêt brutal : les suivantes restent valides
+                game_id = record["g"]
+                if "d" in record:
+                    games.pop(game_id, None)
+                elif "s" in record:
+                    games[game_id] = self.from_state(record["s"])
+                elif game_id in games:
+                    game = games[game_id]
+                    for event in record["e"]:
+                        self.apply(game, event)
+                    game.version = record["v"]
+
+    def _load(self, upto=None):
+        snapshots, segments = self._files()
+        if upto is not None:
+            snapshots = [s for s in snapshots if s <= upto]
+            segments = [s for s in segments if s <= upto]
+        base = snapshots[-1] if snapshots else 0
+        games = {}
+        if snapshots:
+            self._replay(self._path("snapshot", base), games)
+        for seq in segments:
+            if seq >= base:
+                self._replay(self._path("journal", seq), games)
+        return games, base
+
+    def recover(self):
+        """Parties reconstruites (game_id -> partie) : dernier instantané + fin du journal."""
+        games, _ = self._load()
+        self._pending = {game_id: 0 for game_id in games}
+        return games
+
+    def compact(self):
+        """Réécrit l'état de toutes les parties dans un instantané et repart d'un journal vide.
+
+        Appelé dans le thread d'écriture, entre deux lots.
+        """
+        done = self._segment
+        self._open_segment(done + 1)  # les écritures suivantes vont dans le nouveau segment
+        games, base = self._load(upto=done)
+        path = self._path("snapshot", done + 1)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            for game_id, game in games.items():
+                f.write(json.dumps({"g": game_id, "s": self.to_state(game)}, separators=(",", ":"), ensure_ascii=False))
+                f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        snapshots, segments = self._files()
+        for seq in snapshots:
+            if seq <= done:
+                os.remove(self._path("snapshot", seq))
+        for seq in segments:
+            if seq <= done:
+                os.remove(self._path("journal", seq))
+        self.compactions += 1
+
+    def stats(self):
+        with self._cond:
+            return {"written": self.written, "synced": self.synced, "batches": self.batches,
+                    "compactions": self.compactions, "segment": self._segment}
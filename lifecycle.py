@@ -0,0 +1,91 @@
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+
+class Lifecycle:
+    """Démarrage en phases chronométrées, exécutées dans l'ordre en arrière-plan.
+
+    Une phase qui échoue est retentée (attente doublée à chaque échec, jusqu'à
+    `max_delay`) ; le service est prêt une fois toutes les phases réussies.
+    """
+
+    def __init__(self, retry_delay=2, max_delay=60):
+        self.retry_delay = retry_delay
+        self.max_delay = max_delay
+        self.started_at = time.monotonic()
+        self.phases = OrderedDict()  # nom -> {"status", "seconds", "attempts", "error"}
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._keep_alive = None
+        self._stopped = threading.Event()
+        self.keep_alive_runs = 0
+        self.keep_alive_failures = 0
+
+    def record(self, name, seconds, status="ok", error=None):
+        with self._lock:
+            phase = self.phases.setdefault(name, {"status": None, "seconds": 0.0, "attempts": 0, "error": None})
+            phase.update(status=status, seconds=round(phase["seconds"] + seconds, 4), error=error)
+            phase["attempts"] += 1
+        print(f"[démarrage] {name} : {status} en {seconds:.2f} s" + (f" ({error})" if error else ""), flush=True)
+
+    def start(self, steps):
+        """Lance les phases `steps` [(nom, fonction)] ; sans phase, le service est prêt tout de suite."""
+        with self._lock:
+            if self._thread or self.ready.is_set():
+                return
+            if not steps:
+                self.ready.set()
+                return
+            for name, _ in steps:
+                self.phases.setdefault(name, {"status": "pending", "seconds": 0.0, "attempts": 0, "error": None})
+            self._thread = threading.Thread(target=self._run, args=(steps,), name="lifecycle", daemon=True)
+        self._thread.start()
+
+    def _run(self, steps):
+        for name, step in steps:
+            delay = self.retry_delay
+            while not self._stopped.is_set():
+                t0 = time.perf_counter()
+                try:
+                    step()
+                except Exception as e:
+                    self.record(name, time.perf_counter() - t0, "failed", f"{type(e).__name__}: {e}")
+                    self._stopped.wait(delay)
+                    delay = min(delay * 2, self.max_delay)
+                    continue
+                self.record(name, time.perf_counter() - t0)
+                break
+        if not self._stopped.is_set():
+            self.ready.set()
+            print(f"[démarrage] prêt en {time.monotonic() - self.started_at:.2f} s", flush=True)
+
+    def keep_alive(self, fn, interval):
+        """Appelle `fn()` toutes les `interval` secondes (p. ex. garder le modèle chargé)."""
+        with self._lock:
+            if self._keep_alive or not interval:
+                return
+            self._keep_alive = threading.Thread(target=self._loop, args=(fn, interval), name="keep-alive", daemon=True)
+        self._keep_alive.start()
+
+    def _loop(self, fn, interval):
+        while not self._stopped.wait(interval):
+            try:
+                fn()
+                self.keep_alive_runs += 1
+            except Exception:
+                traceback.print_exc()
+                self.keep_alive_failures += 1
+
+    def stop(self):
+        self._stopped.set()
+
+    def status(self):
+        with self._lock:
+            return {
+                "ready": self.ready.is_set(),
+                "uptime_seconds": round(time.monotonic() - self.started_at, 3),
+                "phases": {name: dict(phase) for name, phase in self.phases.items()},
+            }
@@ -0,0 +1,315 @@
+import asyncio
+import concurrent.futures
+import heapq
+import itertools
+import threading
+import time
+
+
+class LLMTimeout(Exception):
+    pass
+
+
+class LLMUnavailable(Exception):
+    """Appel refusé d'office : le disjoncteur est ouvert après des échecs répétés."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Modèle indisponible, réessayez dans {retry_after} s")
+        self.retry_after = retry_after
+
+
+class LLMGateway:
+    """Accès à Ollama depuis les routes synchrones, via une boucle asyncio dédiée.
+
+    Un seul `ollama.AsyncClient` (connexions httpx gardées ouvertes) est partagé ;
+    au plus `max_concurrency` appels sont en cours, les suivants attendent dans une
+    file de priorité : la plus petite valeur passe d'abord, FIFO à priorité égale.
+    La priorité d'un appel vient de `priorities[purpose]` (`default_priority`
+    sinon), ou du paramètre `priority`. Chaque appel a son propre délai et peut
+    porter un `tag` qui permet d'annuler d'un coup ce qu'un joueur attendait
+    quand il quitte la page.
+
+    `observer(purpose, outcome, waited, duration, response)` est appelé à la fin de
+    chaque appel (outcome : ok, error, timeout ou cancelled ; `response` est la
+    réponse d'Ollama, ou son dernier morceau en flux, avec eval_count etc.).
+    `defaults` complète les paramètres de chaque appel (p. ex. keep_alive).
+    Avec un `breaker` (voir admission.CircuitBreaker), les délais dépassés et
+    les erreurs l'alimentent ; ouvert, il fait échouer les appels aussitôt
+    (LLMUnavailable, outcome unavailable) au lieu de les envoyer à Ollama.
+
+    Avec un `router` (voir model_router.ModelRouter), il y a un client par
+    serveur : chaque appel part vers le serveur choisi par le routeur, avec le
+    modèle prévu pour son usage si l'appel n'en impose pas, et un appel (hors
+    flux) trop lent est relancé sur un second serveur. Sans routeur, tout va à
+    `host`. `client_factory(hôte)` remplace le client Ollama (bancs de test).
+    """
+
+    def __init__(self, host=None, max_concurrency=4, max_connections=8, timeout=120.0, client_factory=None,
+                 observer=None, defaults=None, priorities=None, default_priority=0, breaker=None, router=None):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.client_factory = client_factory
+        self.observer = observer
+        self.defaults = dict(defaults or {})
+        self.priorities = dict(priorities or {})
+        self.default_priority = default_priority
+        self.breaker = breaker
+        self.router = router
+        self._loop = None
+        self._clients = {}  # nom du serveur -> client ; None pour `host` sans routeur
+        self._lock = threading.Lock()
+        self._waiters = []  # tas de (priorité, ordre d'arrivée, future)
+        self._order = itertools.count()
+        self._tags = {}
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    def _start(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True).start()
+                hosts = {b.name: b.host for b in self.router.backends} if self.router else {None: self.host}
+                for name, host in hosts.items():
+                    self._clients[name] = asyncio.run_coroutine_threadsafe(self._make_client(host), loop).result()
+                self._loop = loop
+            return self._loop
+
+    async def _make_client(self, host):
+        if self.client_factory:
+            return self.client_factory(host)
+        # Import différé : ollama/httpx ne sont chargés qu'au premier appel
+        import httpx
+        import ollama
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        return ollama.AsyncClient(host=host, limits=limits)
+
+    # Les méthodes suivantes ne tournent que dans le thread de la boucle.
+
+    async def _acquire(self, priority):
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = self._loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), waiter))
+        try:
+            await waiter  # _release nous transmet directement sa place
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    async def _call(self, method, kwargs, timeout, purpose, priority, backend):
+        async def attempt(client, params):
+            return await getattr(client, method)(**params)
+        return await self._run(attempt, kwargs, timeout, purpose, priority=priority, backend=backend, hedge=True)
+
+    async def _stream(self, kwargs, timeout, on_chunk, purpose, priority):
+        async def attempt(client, params):
+            parts = []
+            last = None
+            async for part in await client.generate(stream=True, **params):
+                text = part.get("response") or ""
+                parts.append(text)
+                last = part
+                on_chunk(text)
+            return "".join(parts), last
+        # Pas de relance : les morceaux déjà transmis viennent d'un seul serveur
+        text, _ = await self._run(attempt, kwargs, timeout, purpose, details=lambda result: result[1],
+                                  priority=priority)
+        return text
+
+    async def _run(self, attempt, kwargs, timeout, purpose=None, details=None, priority=0, backend=None, hedge=False):
+        queued_at = time.perf_counter()
+        try:
+            await self._acquire(priority)
+        except asyncio.CancelledError:
+            self._observe(purpose, "cancelled", time.perf_counter() - queued_at, 0.0, None)
+            raise
+        started = time.perf_counter()
+        if self.breaker and not self.breaker.allow():
+            # Ouvert pendant l'attente : inutile d'ajouter un appel à un service en difficulté
+            self._release()
+            self._observe(purpose, "unavailable", started - queued_at, 0.0, None)
+            raise LLMUnavailable(self.breaker.retry_after())
+        outcome, result = "error", None
+        try:
+            if self.router:
+                result = await self._routed(attempt, kwargs, purpose, backend, hedge, time.monotonic() + timeout)
+            else:
+                result = await asyncio.wait_for(attempt(self._clients[None], kwargs), timeout)
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            outcome = "timeout"
+            raise LLMTimeout(f"Pas de réponse du modèle en {timeout:g} s")
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._release()
+            if self.breaker:
+                if outcome == "cancelled":
+                    self.breaker.abandon()
+                else:
+                    self.breaker.record(outcome == "ok")
+            response = details(result) if details and result is not None else result
+            self._observe(purpose, outcome, started - queued_at, time.perf_counter() - started, response)
+        self.completed += 1
+        return result
+
+    async def _routed(self, attempt, kwargs, purpose, backend, hedge, deadline):
+        tried = [backend or self.router.choose(purpose)]
+        tasks = {asyncio.ensure_future(self._attempt(attempt, kwargs, purpose, tried[0], deadline))}
+        # Une seule relance par appel, sur un autre serveur : appel trop lent ou en échec
+        hedge = hedge and backend is None
+
+        def relaunch():
+            second = self.router.hedge(purpose, tried)
+            if second:
+                tried.append(second)
+                tasks.add(asyncio.ensure_future(self._attempt(attempt, kwargs, purpose, second, deadline, True)))
+
+        try:
+            delay = hedge and self.router.hedge_delay(tried[0], purpose)
+            if delay:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    relaunch()
+            # Première réponse réussie ; l'erreur du dernier appel si tous échouent
+            while True:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                failed = None
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    failed = task
+                if not tasks and hedge and len(tried) < 2:
+                    relaunch()
+                if not tasks:
+                    return failed.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _attempt(self, attempt, kwargs, purpose, backend, deadline, hedge=False):
+        # Délai propre à chaque serveur : celui qui ne répond pas à temps compte comme en erreur
+        router = self.router
+        params = dict(kwargs)
+        params.setdefault("model", backend.model(purpose))
+        router.started(backend, hedge)
+        started, ok = time.perf_counter(), None
+        try:
+            result = await asyncio.wait_for(attempt(self._clients[backend.name], params), deadline - time.monotonic())
+            ok = True
+            return result
+        except Exception:
+            ok = False
+            raise
+        finally:
+            router.finished(backend, purpose, time.perf_counter() - started, ok, hedge_won=hedge)
+
+    def _observe(self, purpose, outcome, waited, duration, response):
+        if self.observer:
+            try:
+                self.observer(purpose, outcome, waited, duration, response)
+            except Exception:
+                pass  # l'instrumentation ne doit jamais faire échouer un appel
+
+    def _priority(self, purpose, priority):
+        return self.priorities.get(purpose, self.default_priority) if priority is None else priority
+
+    def _short_circuit(self, purpose):
+        if not self.breaker or not self.breaker.is_open():
+            return None
+        self._observe(purpose, "unavailable", 0.0, 0.0, None)
+        future = concurrent.futures.Future()
+        future.set_exception(LLMUnavailable(self.breaker.retry_after()))
+        return future
+
+    def submit(self, method="generate", tag=None, timeout=None, purpose=None, priority=None, backend=None, **kwargs):
+        """Lance un appel sans bloquer ; renvoie un concurrent.futures.Future.
+
+        `backend` (avec un routeur) impose le serveur, sans relance ailleurs.
+        """
+        short = self._short_circuit(purpose)
+        if short:
+            return short
+        loop = self._start()
+        future = asyncio.run_coroutine_threadsafe(self._call(method, {**self.defaults, **kwargs}, timeout or self.timeout, purpose,
+                                                             self._priority(purpose, priority), backend), loop)
+        return self._track(tag, future)
+
+    def stream(self, on_chunk, tag=None, timeout=None, purpose=None, priority=None, **kwargs):
+        """Génération en flux : `on_chunk(texte)` est appelé (dans le thread de la
+        boucle, donc sans traitement lourd) à chaque morceau reçu. Renvoie un
+        concurrent.futures.Future du texte complet."""
+        short = self._short_circuit(purpose)
+        if short:
+            return short
+        loop = self._start()
+        future = asyncio.run_coroutine_threadsafe(self._stream({**self.defaults, **kwargs}, timeout or self.timeout, on_chunk, purpose,
+                                                               self._priority(purpose, priority)), loop)
+        return self._track(tag, future)
+
+    def _track(self, tag, future):
+        if tag is not None:
+            with self._lock:
+                self._tags.setdefault(tag, set()).add(future)
+            future.add_done_callback(lambda f: self._untag(tag, f))
+        return future
+
+    def _untag(self, tag, future):
+        with self._lock:
+            futures = self._tags.get(tag)
+            if futures:
+                futures.discard(future)
+                if not futures:
+                    del self._tags[tag]
+
+    def generate(self, tag=None, timeout=None, purpose=None, priority=None, **kwargs):
+        return self.submit("generate", tag=tag, timeout=timeout, purpose=purpose, priority=priority, **kwargs).result()
+
+    def generate_everywhere(self, purpose=None, serving=("*",), timeout=None, **kwargs):
+        """Même appel sur chaque serveur, une fois par modèle servi pour les usages `serving`
+        (chargement, maintien en mémoire) ; attend tous les appels, puis lève la première erreur."""
+        if self.router:
+            calls = [(b, m) for b in self.router.backends for m in dict.fromkeys(b.model(p) for p in serving)]
+        else:
+            calls = [(None, kwargs.pop("model", None))]
+        futures = [self.submit("generate", timeout=timeout, purpose=purpose, backend=backend, **dict(kwargs, model=model))
+                   for backend, model in calls]
+        concurrent.futures.wait(futures)
+        return [f.result() for f in futures]
+
+    def cancel(self, tag):
+        """Annule les appels en attente ou en cours marqués `tag` ; renvoie leur nombre."""
+        with self._lock:
+            futures = list(self._tags.get(tag, ()))
+        cancelled = sum(1 for f in futures if f.cancel())
+        self.cancelled += cancelled
+        return cancelled
+
+    def queued(self):
+        return len(self._waiters)
+
+    def stats(self):
+        return {"in_flight": self.in_flight, "queued": self.queued(), "completed": self.completed,
+                "failed": self.failed, "timeouts": self.timeouts, "cancelled": self.cancelled}
+
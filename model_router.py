@@ -0,0 +1,169 @@
+import threading
+import time
+
+
+class Backend:
+    """Un serveur Ollama et les modèles qu'il sert, avec ses mesures récentes."""
+
+    __slots__ = ("name", "host", "models", "latency", "error_rate", "in_flight", "calls", "failures", "hedges",
+                 "hedge_wins", "last_call")
+
+    def __init__(self, host, models):
+        self.name = host or "default"
+        self.host = host
+        self.models = dict(models)  # usage -> modèle ; "*" pour les autres usages
+        # usage -> [durée moyenne d'un appel, écart moyen à cette durée] (moyennes mobiles, s) :
+        # une génération en flux dure bien plus qu'une vérification par un petit modèle
+        self.latency = {}
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.hedges = 0  # doublons envoyés à ce serveur
+        self.hedge_wins = 0  # … qui ont répondu avant l'appel d'origine
+        self.last_call = 0.0
+
+    def model(self, purpose):
+        return self.models.get(purpose) or self.models.get("*")
+
+    def expected(self, purpose):
+        # Durée attendue pour cet usage, sinon la plus longue connue ; None si jamais mesuré
+        if purpose in self.latency:
+            return self.latency[purpose][0]
+        return max((mean for mean, _ in self.latency.values()), default=None)
+
+    def as_dict(self):
+        return {"name": self.name, "models": dict(self.models),
+                "latency": {purpose: round(mean, 4) for purpose, (mean, _) in self.latency.items()},
+                "deviation": {purpose: round(dev, 4) for purpose, (_, dev) in self.latency.items()},
+                "error_rate": round(self.error_rate, 4),
+                "in_flight": self.in_flight, "calls": self.calls, "failures": self.failures,
+                "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+
+
+class ModelRouter:
+    """Choix du serveur Ollama pour chaque appel de la passerelle.
+
+    Chaque serveur garde, par usage, une moyenne mobile (facteur `alpha`) de la
+    durée de ses appels et de l'écart à cette moyenne, et son taux d'erreur. Un appel va
+    au serveur sain dont la durée attendue, multipliée par le nombre d'appels
+    qu'il a déjà en cours et divisée par sa chance de réussir, est la plus
+    faible ; un serveur jamais mesuré passe
+    en premier. Au-delà de `max_error_rate`, un serveur est écarté, sauf s'il
+    n'a rien reçu depuis `probe_interval` secondes (un appel vérifie alors
+    s'il est revenu) ou si aucun autre n'est sain.
+
+    Relance des appels lents : sans réponse après `hedge_delay(serveur)`
+    (durée moyenne + 4 écarts, au moins `hedge_min` s), la passerelle envoie
+    le même appel à un second serveur et garde la première réponse ; de même
+    si le premier serveur échoue. Les
+    relances sont limitées à `hedge_budget` des appels pour ne pas doubler la
+    charge quand tout ralentit ; `hedge_min=None` les désactive.
+    """
+
+    def __init__(self, backends, alpha=0.2, max_error_rate=0.5, probe_interval=10.0, hedge_min=1.0,
+                 hedge_budget=0.1):
+        if not backends:
+            raise ValueError("Il faut au moins un serveur Ollama.")
+        self.backends = list(backends)
+        self.alpha = alpha
+        self.max_error_rate = max_error_rate
+        self.probe_interval = probe_interval
+        self.hedge_min = hedge_min
+        self.hedge_budget = hedge_budget
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+
+    @classmethod
+    def parse(cls, spec, models, **options):
+        """Serveurs décrits par `spec` : « hôte [modèle] [usage=modèle …] » séparés par des « ; ».
+
+        `models` donne les modèles par défaut (usage -> modèle, "*" pour tous) ;
+        p. ex. "http://gpu1:11434; http://gpu2:11434 llama3.2:1b verify=qwen2.5:0.5b".
+        Vide : un seul serveur, celui par défaut d'ollama.
+        """
+        if not spec.strip():
+            return cls([Backend(None, models)], **options)
+        backends = []
+        for entry in spec.split(";"):
+            words = entry.split()
+            if not words:
+                continue
+            chosen = dict(models)
+            for word in words[1:]:
+                purpose, _, model = word.rpartition("=")
+                chosen[purpose or "*"] = model
+            backends.append(Backend(words[0], chosen))
+        return cls(backends, **options)
+
+    def _healthy(self, backend, now):
+        return backend.error_rate <= self.max_error_rate or now - backend.last_call >= self.probe_interval
+
+    def choose(self, purpose=None, exclude=(), fallback=True):
+        """Serveur pour le prochain appel ; None si tous sont exclus (ou en difficulté, sans `fallback`)."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [b for b in self.backends if b not in exclude]
+            healthy = [b for b in candidates if self._healthy(b, now)]
+            if not healthy:
+                if not fallback:
+                    return None
+                # Tous en difficulté : le moins mauvais plutôt que rien
+                return min(candidates, key=lambda b: b.error_rate, default=None)
+            # Un échec coûte un second appel : durée attendue / probabilité de réussite
+            return min(healthy, key=lambda b: ((b.expected(purpose) or 0.0) * (1 + b.in_flight) / (1.05 - b.error_rate),
+                                               b.in_flight))
+
+    def started(self, backend, hedge=False):
+        with self._lock:
+            backend.in_flight += 1
+            backend.calls += 1
+            backend.last_call = time.monotonic()
+            if hedge:
+                backend.hedges += 1
+                self.hedges += 1
+            else:
+                self.calls += 1
+
+    def finished(self, backend, purpose, seconds, ok, hedge_won=False):
+        """Fin d'un appel : `ok` vrai, faux (erreur) ou None (annulé avant la réponse)."""
+        a = self.alpha
+        with self._lock:
+            backend.in_flight -= 1
+            stats = backend.latency.get(purpose)
+            if ok is None:
+                # Réponse abandonnée : on sait seulement qu'elle aurait pris au moins `seconds`
+                if stats and seconds > stats[0]:
+                    stats[0] += a * (seconds - stats[0])
+                return
+            backend.error_rate += a * ((not ok) - backend.error_rate)
+            if not ok:
+                backend.failures += 1
+                return
+            if stats is None:
+                backend.latency[purpose] = [seconds, 0.0]
+            else:
+                stats[1] += a * (abs(seconds - stats[0]) - stats[1])
+                stats[0] += a * (seconds - stats[0])
+            if hedge_won:
+                backend.hedge_wins += 1
+
+    def hedge_delay(self, backend, purpose):
+        """Attente avant de relancer ailleurs un appel envoyé à `backend` (None : pas de relance)."""
+        stats = backend.latency.get(purpose)
+        if self.hedge_min is None or len(self.backends) < 2 or stats is None:
+            return None
+        return max(self.hedge_min, stats[0] + 4 * stats[1])
+
+    def hedge(self, purpose, tried):
+        """Autre serveur sain pour relancer un appel lent ou en échec, dans la limite du budget."""
+        with self._lock:
+            if self.hedges >= self.hedge_budget * max(1, self.calls):
+                return None
+        return self.choose(purpose, exclude=tried, fallback=False)
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "hedges": self.hedges,
+                    "backends": [b.as_dict() for b in self.backends]}
@@ -0,0 +1,51 @@
+import threading
+from collections import OrderedDict
+
+
+class RenderCache:
+    """Pages déjà rendues, par partie et version d'état, partagées entre les joueurs.
+
+    Seule la dernière version de chaque partie est gardée (une page par
+    `variant`, ex. « c'est votre tour » ou non) ; au-delà de `max_games`
+    parties, les moins récemment consultées sont oubliées.
+    """
+
+    def __init__(self, max_games=2048):
+        self.max_games = max_games
+        self._pages = OrderedDict()  # game_id -> (version, {variant: html})
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, game_id, version, variant=None):
+        with self._lock:
+            entry = self._pages.get(game_id)
+            html = entry[1].get(variant) if entry and entry[0] == version else None
+            if html is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(game_id)
+            self.hits += 1
+            return html
+
+    def put(self, game_id, version, variant, html):
+        if not self.max_games:
+            return
+        with self._lock:
+            entry = self._pages.get(game_id)
+            if entry is None or entry[0] < version:
+                entry = self._pages[game_id] = (version, {})
+            elif entry[0] > version:
+                return  # rendu d'un état déjà dépassé
+            entry[1][variant] = html
+            self._pages.move_to_end(game_id)
+            while len(self._pages) > self.max_games:
+                self._pages.popitem(last=False)
+
+    def drop(self, game_id):
+        with self._lock:
+            self._pages.pop(game_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"games": len(self._pages), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,451 @@
+import ast
+import builtins
+import ctypes
+import errno
+import inspect
+import json
+import math
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import signal
+import sys
+import sysconfig
+import threading
+
+FUNCTION_RE = re.compile(r"(?:def\s+)?([A-Za-z_]\w*)")
+
+
+def function_name(challenge):
+    # Le modèle renvoie souvent "def nom(...)" plutôt que le nom seul
+    m = FUNCTION_RE.search(str((challenge or {}).get("function_name") or ""))
+    return m.group(1) if m else None
+
+
+def usable_tests(challenge):
+    """Tests exécutables du défi ({input, output}), ou [] si inexploitables."""
+    if not function_name(challenge):
+        return []
+    tests = (challenge or {}).get("tests")
+    if not isinstance(tests, list):
+        return []
+    return [t for t in tests if isinstance(t, dict) and "input" in t and "output" in t]
+
+
+class _TestTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _TestTimeout()
+
+
+def _vm_size():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmSize:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+# Filtre seccomp du worker : ouvertures en écriture, création, suppression, renommage,
+# changement de droits, création de processus (hors threads), sockets et accès à la
+# mémoire d'autres processus échouent avec EPERM
+_SECCOMP_SYSCALLS = {
+    "x86_64": {
+        "arch": 0xC000003E,
+        "deny": (85, 76, 77, 285, 82, 264, 316, 83, 258, 84, 86, 265, 88, 266, 87, 263, 133, 259,
+                 90, 91, 268, 452, 92, 93, 94, 260, 132, 235, 261, 280, 57, 58,
+                 41, 42, 43, 44, 46, 49, 50, 53, 288, 307, 101, 310, 311),
+        "nosys": (437, 435),  # openat2, clone3 : glibc se replie sur openat et clone
+        "open": {2: 1, 257: 2},  # numéro -> argument des drapeaux
+        "clone": 56,
+        "x32": 0x40000000,
+    },
+    "aarch64": {
+        "arch": 0xC00000B7,
+        "deny": (45, 46, 47, 38, 276, 34, 37, 36, 35, 33, 52, 53, 452, 54, 55, 88,
+                 198, 199, 200, 201, 202, 203, 206, 211, 242, 269, 117, 270, 271),
+        "nosys": (437, 435),
+        "open": {56: 2},
+        "clone": 220,
+        "x32": None,
+    },
+}
+_O_WRITE = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_APPEND
+_CLONE_THREAD = 0x10000
+
+
+def _seccomp_program(table):
+    ld, jeq, jge, jset, ret = 0x20, 0x15, 0x35, 0x45, 0x06
+    allow, deny, nosys = 0x7FFF0000, 0x00050000 | errno.EPERM, 0x00050000 | errno.ENOSYS
+    code = [(ld, 0, 0, 4), (jeq, 0, "deny", table["arch"]), (ld, 0, 0, 0)]
+    if table["x32"]:
+        code.append((jge, "deny", 0, table["x32"]))
+    code += [(jeq, "deny", 0, nr) for nr in table["deny"]]
+    code += [(jeq, "nosys", 0, nr) for nr in table["nosys"]]
+    code += [(jeq, f"open{arg}", 0, nr) for nr, arg in table["open"].items()]
+    code += [(jeq, "clone", 0, table["clone"]), (ret, 0, 0, allow)]
+    labels = {}
+    for arg in sorted(set(table["open"].values())):
+        labels[f"open{arg}"] = len(code)
+        # Mot bas de l'argument (seccomp_data.args[arg], petit-boutiste)
+        code += [(ld, 0, 0, 16 + 8 * arg), (jset, "deny", "allow", _O_WRITE)]
+    labels["clone"] = len(code)
+    code += [(ld, 0, 0, 16), (jset, "allow", "deny", _CLONE_THREAD)]
+    for name, value in (("allow", allow), ("deny", deny), ("nosys", nosys)):
+        labels[name] = len(code)
+        code.append((ret, 0, 0, value))
+    return [(op, labels[jt] - i - 1 if isinstance(jt, str) else jt,
+             labels[jf] - i - 1 if isinstance(jf, str) else jf, k)
+            for i, (op, jt, jf, k) in enumerate(code)]
+
+
+def _install_filter():
+    """Installe le filtre seccomp ; False si la plateforme ne le permet pas."""
+    table = _SECCOMP_SYSCALLS.get(platform.machine())
+    if not table or not sys.platform.startswith("linux"):
+        return False
+
+    class Filter(ctypes.Structure):
+        _fields_ = [("code", ctypes.c_ushort), ("jt", ctypes.c_ubyte), ("jf", ctypes.c_ubyte), ("k", ctypes.c_uint)]
+
+    class Program(ctypes.Structure):
+        _fields_ = [("len", ctypes.c_ushort), ("filter", ctypes.POINTER(Filter))]
+
+    program = _seccomp_program(table)
+    filters = (Filter * len(program))(*program)
+    libc = ctypes.CDLL(None, use_errno=True)
+    # PR_SET_NO_NEW_PRIVS puis PR_SET_SECCOMP / SECCOMP_MODE_FILTER
+    if libc.prctl(38, 1, 0, 0, 0) != 0:
+        return False
+    return libc.prctl(22, 2, ctypes.byref(Program(len(program), filters)), 0, 0) == 0
+
+
+# Landlock (ABI 1) : lecture seule des répertoires de Python et des bibliothèques système
+_LANDLOCK_CREATE_RULESET, _LANDLOCK_ADD_RULE, _LANDLOCK_RESTRICT_SELF = 444, 445, 446
+_LANDLOCK_HANDLED = (1 << 13) - 1  # exécution, lecture, écriture, création et suppression
+_LANDLOCK_READ = 4 | 8  # READ_FILE | READ_DIR
+_SYSTEM_LIBRARIES = ("/lib", "/lib64", "/usr/lib", "/usr/lib64", "/etc/ld.so.cache")
+
+
+def _readable_paths():
+    paths = {sys.prefix, sys.base_prefix, sys.exec_prefix, *sysconfig.get_paths().values(), *_SYSTEM_LIBRARIES}
+    paths.update(p for p in sys.path if p.startswith((sys.prefix, sys.base_prefix)) or "site-packages" in p)
+    return sorted(p for p in paths if p and os.path.exists(p))
+
+
+def _restrict_reads():
+    """Limite les lectures de fichiers aux modules Python (ni /proc, ni fichiers du service) ; False si indisponible."""
+    if not sys.platform.startswith("linux"):
+        return False
+
+    class PathBeneath(ctypes.Structure):
+        _pack_ = 1
+        _fields_ = [("allowed_access", ctypes.c_uint64), ("parent_fd", ctypes.c_int32)]
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.syscall.restype = ctypes.c_long
+    handled = ctypes.c_uint64(_LANDLOCK_HANDLED)
+    ruleset = libc.syscall(_LANDLOCK_CREATE_RULESET, ctypes.byref(handled), ctypes.c_size_t(8), 0)
+    if ruleset < 0:
+        return False
+    try:
+        for path in _readable_paths():
+            fd = os.open(path, os.O_PATH | os.O_CLOEXEC)
+            try:
+                access = _LANDLOCK_READ if os.path.isdir(path) else 4
+                libc.syscall(_LANDLOCK_ADD_RULE, ruleset, 1, ctypes.byref(PathBeneath(access, fd)), 0)
+            finally:
+                os.close(fd)
+        # PR_SET_NO_NEW_PRIVS, requis par landlock_restrict_self
+        if libc.prctl(38, 1, 0, 0, 0) != 0:
+            return False
+        return libc.syscall(_LANDLOCK_RESTRICT_SELF, ruleset, 0) == 0
+    finally:
+        os.close(ruleset)
+
+
+def _clear_environment():
+    # Variables du service (SECRET_KEY, URL de backends…) : ni dans os.environ, ni dans
+    # /proc/self/environ, qui relit les chaînes d'origine héritées du forkserver
+    strings = []
+    if sys.platform.startswith("linux"):
+        environ = ctypes.POINTER(ctypes.c_void_p).in_dll(ctypes.CDLL(None), "environ")
+        i = 0
+        while environ[i]:
+            strings.append(environ[i])
+            i += 1
+    os.environ.clear()
+    for address in strings:
+        ctypes.memset(address, 0, len(ctypes.string_at(address)))
+
+
+def _init_worker(memory_bytes):
+    # La limite mémoire s'ajoute à l'empreinte du worker au démarrage
+    if memory_bytes:
+        limit = _vm_size() + memory_bytes
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    signal.signal(signal.SIGALRM, _on_alarm)
+    os.chdir("/")
+    _clear_environment()
+    if not _restrict_reads():
+        # Noyau sans Landlock : /proc/<pid>/environ du service reste lisible par le code joueur
+        print("[sandbox] Landlock indisponible : lectures de fichiers non restreintes", file=sys.stderr, flush=True)
+    if not _install_filter():
+        # Sans seccomp (autre plateforme), seule la taille des fichiers reste bridée
+        print("[sandbox] filtre seccomp indisponible : fichiers et réseau non bloqués", file=sys.stderr, flush=True)
+
+
+def _limit_cpu(cpu_seconds):
+    # RLIMIT_CPU est cumulatif sur la vie du process : on repart du temps déjà consommé
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(math.ceil(usage.ru_utime + usage.ru_stime)) + cpu_seconds
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _normalize(value):
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (set, frozenset)):
+        return sorted(_normalize(v) for v in value)
+    return value
+
+
+def _same(got, expected):
+    # `got` vient de JSON (types de base seulement) : aucune méthode du code joueur n'est appelée ici
+    got, expected = _normalize(got), _normalize(expected)
+    if isinstance(got, list) and isinstance(expected, list):
+        return len(got) == len(expected) and all(_same(a, b) for a, b in zip(got, expected))
+    if isinstance(got, dict) and isinstance(expected, dict):
+        return got.keys() == expected.keys() and all(_same(got[k], expected[k]) for k in got)
+    if isinstance(got, float) or isinstance(expected, float):
+        try:
+            return math.isclose(got, expected, rel_tol=1e-9, abs_tol=1e-9)
+        except TypeError:
+            return False
+    return got == expected
+
+
+def call_arguments(raw, positional, varargs=False):
+    """(args, kwargs) d'un appel pour l'entrée de test `raw`.
+
+    `positional` : nombre de paramètres positionnels de la fonction (None si
+    inconnu). "input": [1, 2, 3] pour une fonction à un seul paramètre = la
+    liste elle-même ; une liste d'un élément reste la liste des arguments.
+    """
+    if isinstance(raw, dict):
+        return [], raw
+    if not isinstance(raw, list):
+        return [raw], {}
+    if positional == 1 and not varargs and len(raw) != 1:
+        return [raw], {}
+    return raw, {}
+
+
+def _arguments(func, raw):
+    try:
+        params = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        return call_arguments(raw, None)
+    positional = sum(1 for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+    return call_arguments(raw, positional, any(p.kind == p.VAR_POSITIONAL for p in params))
+
+
+def _clip(text, limit=120):
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _short(value, limit=120):
+    return _clip(repr(value), limit)
+
+
+def _kind(value):
+    if isinstance(value, bool):
+        return "booléen"
+    if isinstance(value, (int, float)):
+        return "nombre"
+    return {str: "texte", list: "liste", dict: "dictionnaire"}.get(type(value), "None")
+
+
+def _shown(got, expected, limit=40):
+    # Valeur renvoyée par le joueur montrée seulement si elle a le type attendu, et tronquée
+    if _kind(got) != _kind(expected):
+        return f"une valeur de type {_kind(got)}"
+    return _short(got, limit)
+
+
+def _top_level_function(namespace, code):
+    # Nom demandé absent : la seule fonction définie par le joueur, s'il n'y en a qu'une
+    try:
+        defined = [node.name for node in ast.parse(code).body if isinstance(node, ast.FunctionDef)]
+    except SyntaxError:
+        return None
+    defined = list(dict.fromkeys(defined))
+    return namespace.get(defined[0]) if len(defined) == 1 else None
+
+
+def _run_tests(code, fname, inputs, test_timeout, cpu_seconds):
+    """Exécute le code joueur sur les entrées des tests, dans le worker.
+
+    Les sorties attendues ne sont pas envoyées au worker : chaque résultat est
+    renvoyé en JSON et comparé dans le processus parent (voir SandboxRunner.run).
+    """
+    _limit_cpu(cpu_seconds)
+    namespace = {"__name__": "__solution__", "__builtins__": dict(builtins.__dict__)}
+    # L'intervalle relance l'alarme si le code avale la première exception
+    signal.setitimer(signal.ITIMER_REAL, test_timeout, test_timeout / 10)
+    try:
+        exec(compile(code, "<solution>", "exec"), namespace)
+    except _TestTimeout:
+        return {"error": "Temps dépassé au chargement du code.", "outputs": []}
+    except BaseException as e:
+        return {"error": f"Erreur dans le code : {type(e).__name__}: {e}", "outputs": []}
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    func = namespace.get(fname)
+    if not callable(func):
+        func = _top_level_function(namespace, code)
+    if not callable(func):
+        return {"error": f"Fonction {fname} introuvable.", "outputs": []}
+
+    outputs = []
+    for raw in inputs:
+        args, kwargs = _arguments(func, raw)
+        signal.setitimer(signal.ITIMER_REAL, test_timeout, test_timeout / 10)
+        try:
+            # Sérialisé sous l'alarme : seuls des types JSON sortent (pas d'objet au __eq__ truqué)
+            out = {"got": json.dumps(_normalize(func(*args, **kwargs)))}
+        except _TestTimeout:
+            out = {"error": "Temps dépassé"}
+        except BaseException as e:
+            out = {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        outputs.append(out)
+        if "error" in out:
+            break
+    return {"error": None, "outputs": outputs}
+
+
+def _worker(conn, code, fname, inputs, test_timeout, cpu_seconds, memory_bytes):
+    _init_worker(memory_bytes)
+    report = _run_tests(code, fname, inputs, test_timeout, cpu_seconds)
+    conn.send_bytes(json.dumps(report).encode("utf-8"))
+    conn.close()
+
+
+class SandboxRunner:
+    """Exécute les tests d'un défi dans des processus isolés et bridés, un neuf par soumission.
+
+    Chaque soumission a son propre processus (lancé par le forkserver, modules
+    déjà importés) : une soumission ne peut rien laisser aux suivantes. Le
+    worker, limité en mémoire, en CPU et sans écriture de fichiers (seccomp),
+    ne reçoit que les entrées des tests et renvoie les sorties en JSON ; le
+    verdict est rendu ici. Au plus `workers` processus tournent à la fois.
+    """
+
+    MAX_REPORT_BYTES = 8 * 1024 * 1024
+
+    def __init__(self, workers=2, cpu_seconds=2, memory_mb=256, test_timeout=1.0):
+        self.workers = workers
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self.test_timeout = test_timeout
+        self._slots = threading.BoundedSemaphore(workers)
+        self._lock = threading.Lock()
+        self._processes = set()
+        self._context = None
+
+    def _ctx(self):
+        with self._lock:
+            if self._context is None:
+                if os.name == "posix":
+                    self._context = multiprocessing.get_context("forkserver")
+                    self._context.set_forkserver_preload(["sandbox"])
+                else:
+                    self._context = multiprocessing.get_context("spawn")
+            return self._context
+
+    def _execute(self, code, fname, inputs, deadline):
+        ctx = self._ctx()
+        reader, writer = ctx.Pipe(duplex=False)
+        process = ctx.Process(target=_worker, daemon=True,
+                              args=(writer, code, fname, inputs, self.test_timeout, self.cpu_seconds,
+                                    self.memory_bytes))
+        with self._lock:
+            self._processes.add(process)
+        try:
+            process.start()
+            writer.close()
+            if not reader.poll(deadline):
+                # Délai mural : peut tenir à la charge de la machine, pas seulement au code
+                return {"error": "Temps dépassé.", "outputs": [], "transient": True}
+            try:
+                # Octets bruts et JSON : rien de ce que renvoie le worker n'est dépicklé
+                report = json.loads(reader.recv_bytes(self.MAX_REPORT_BYTES))
+            except (EOFError, OSError, ValueError):
+                return {"error": "Le code a dépassé les limites CPU/mémoire.", "outputs": []}
+            if not isinstance(report, dict) or not isinstance(report.get("outputs", []), list):
+                return {"error": "Résultat du bac à sable illisible.", "outputs": []}
+            return report
+        finally:
+            reader.close()
+            if process.is_alive():
+                process.kill()
+            process.join(1)
+            with self._lock:
+                self._processes.discard(process)
+
+    def run(self, code, challenge):
+        fname = function_name(challenge)
+        tests = usable_tests(challenge)
+        deadline = self.test_timeout * (len(tests) + 1) + self.cpu_seconds + 1
+        with self._slots:
+            report = self._execute(code, fname, [t["input"] for t in tests], deadline)
+        if report.get("error"):
+            return {"ok": False, "error": _clip(str(report["error"])), "results": [],
+                    **({"transient": True} if report.get("transient") else {})}
+        results = []
+        for i, (test, out) in enumerate(zip(tests, report["outputs"])):
+            res = {"index": i, "input": _short(test["input"]), "expected": _short(test["output"])}
+            if not isinstance(out, dict) or "got" not in out:
+                res.update(ok=False, error=_clip(str(out.get("error") if isinstance(out, dict) else out)))
+            else:
+                try:
+                    got = json.loads(out["got"])
+                except (TypeError, ValueError):
+                    res.update(ok=False, error="résultat illisible")
+                else:
+                    res.update(ok=_same(got, test["output"]), got=_shown(got, test["output"]))
+            results.append(res)
+            if not res["ok"]:
+                break  # arrêt au premier échec
+        return {"ok": len(results) == len(tests) and all(r["ok"] for r in results), "error": None, "results": results}
+
+    def shutdown(self):
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            process.kill()
+
+
+def describe_failure(fname, report):
+    if report.get("error"):
+        return report["error"]
+    for r in report.get("results", []):
+        if not r.get("ok"):
+            detail = r.get("error") or f"a renvoyé {r.get('got')}"
+            return f"Test {r['index'] + 1} échoué : {fname}({r['input']}) {detail}, attendu {r['expected']}."
+    return "Wrong Answer"
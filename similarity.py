@@ -0,0 +1,235 @@
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+from sandbox import function_name
+
+# Mots de consigne communs à presque tous les défis : ils rapprocheraient des problèmes sans rapport
+STOPWORDS = frozenset("""
+a au aux avec ce ces cet cette d dans de des donne donnee donnees donnes du elle en est et etant
+ecrire ecris ecrivez fonction il l la le les leur leurs ou par pour prend prenant qu que qui
+renvoie renvoyer retourne retourner sa sans ses son sont sur un une
+""".split())
+
+WORD_RE = re.compile(r"\w+")
+PRIME = (1 << 31) - 1
+ROWS = 4
+
+
+def words(text):
+    # Minuscules sans accents ni mots de consigne : « Écrire » et « ecrire » comptent pareil
+    text = unicodedata.normalize("NFKD", str(text or "").casefold()).encode("ascii", "ignore").decode("ascii")
+    return [w for w in WORD_RE.findall(text) if w not in STOPWORDS]
+
+
+def value_type(value):
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "num"
+    if isinstance(value, str):
+        return "str"
+    if isinstance(value, list):
+        return "list[" + "|".join(sorted({value_type(v) for v in value})) + "]"
+    if isinstance(value, dict):
+        return "dict"
+    return "none"
+
+
+def features(challenge):
+    """Éléments comparés, en deux parts : (énoncé, exemples des tests).
+
+    L'énoncé donne ses mots et paires de mots, le nom de la fonction et les
+    types d'entrée et de sortie ; les tests donnent leurs exemples tels quels.
+    """
+    tokens = words(challenge.get("description"))
+    text = {"w:" + w for w in tokens}
+    text.update(f"b:{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    name = function_name(challenge)
+    if name:
+        text.add("f:" + name)
+    examples = set()
+    for test in challenge.get("tests") or []:
+        if not isinstance(test, dict):
+            continue
+        inputs = test.get("input")
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        text.add("s:" + ",".join(value_type(v) for v in inputs) + "->" + value_type(test.get("output")))
+        examples.add(json.dumps([inputs, test.get("output")], sort_keys=True, ensure_ascii=False))
+    return text, examples
+
+
+class SimilarityIndex:
+    """Index des défis proches (MinHash + LSH), pour repérer les quasi-doublons.
+
+    Chaque défi est résumé par `num_perm` minima de hachages (16 bits gardés
+    par minimum) : la première moitié sur les éléments de son énoncé, la
+    seconde sur les exemples de ses tests (voir `features`). La part de minima
+    égaux d'une moitié estime la similarité de Jaccard de cette partie ; deux
+    défis sont quasi-doublons si l'une des deux atteint `threshold` : même
+    problème reformulé (mêmes tests), ou même énoncé avec d'autres exemples.
+
+    Les signatures sont découpées en bandes de 4 minima (une clé de 64 bits) ;
+    deux défis qui partagent une bande entière sont candidats, et seuls les
+    candidats sont comparés. Les clés de bande sont gardées dans un tableau
+    trié (recherche dichotomique) ; les derniers ajouts attendent dans un
+    dictionnaire, fusionné dans le tableau tous les `merge_every` défis. La
+    recherche reste sous la milliseconde avec des centaines de milliers de
+    défis, pour environ 64 octets de clés et 2 × `num_perm` octets de
+    signature par défi.
+    """
+
+    def __init__(self, threshold=0.6, num_perm=128, merge_every=1024, seed=1):
+        if num_perm % (2 * ROWS):
+            raise ValueError(f"num_perm doit être un multiple de {2 * ROWS}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = num_perm // ROWS
+        self.merge_every = merge_every
+        rng = np.random.default_rng(seed)
+        # Hachages universels (a·x + b) mod p, x sur 32 bits et p < 2³¹ : le produit tient dans 64 bits
+        self._a = rng.integers(1, PRIME, num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, PRIME, num_perm, dtype=np.uint64)[:, None]
+        # Une même bande dans deux positions ne doit pas donner la même clé
+        self._salt = rng.integers(0, 1 << 63, self.bands, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint16)
+        self._keys = []
+        self._rows = {}
+        self._band_keys = np.empty(0, dtype=np.uint64)  # triées
+        self._band_rows = np.empty(0, dtype=np.int32)
+        self._pending = {}  # clé de bande -> lignes, pas encore fusionnées
+        self._pending_rows = 0
+        self.queries = 0
+        self.merges = 0
+
+    def _minhash(self, items, a, b):
+        x = np.array([int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=4).digest(), "little")
+                      for item in items], dtype=np.uint64)[None, :]
+        return ((a * x + b) % PRIME).min(axis=1).astype(np.uint16)
+
+    def signature(self, challenge):
+        text, examples = features(challenge)
+        half = self.num_perm // 2
+        return np.concatenate([self._minhash(text, self._a[:half], self._b[:half]),
+                               # Sans test, l'énoncé tient lieu d'exemples
+                               self._minhash(examples or text, self._a[half:], self._b[half:])])
+
+    def _bands(self, signatures):
+        # 4 minima de 16 bits contigus = une clé de 64 bits par bande
+        return np.ascontiguousarray(signatures).view(np.uint64) ^ self._salt
+
+    def _score(self, signatures, signature):
+        same = signatures == signature
+        half = self.num_perm // 2
+        return np.maximum(same[:, :half].mean(axis=1), same[:, half:].mean(axis=1))
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key, challenge=None, signature=None):
+        """Indexe `key` (une seule fois) à partir du défi ou de sa signature déjà calculée."""
+        if key in self._rows:
+            return
+        if signature is None:
+            signature = self.signature(challenge)
+        with self._lock:
+            if key in self._rows:
+                return
+            row = self._append([key], signature[None, :])[0]
+            for band in self._bands(signature).tolist():
+                self._pending.setdefault(band, []).append(row)
+            self._pending_rows += 1
+            if self._pending_rows >= self.merge_every:
+                self._merge()
+
+    def add_many(self, keys, signatures):
+        """Indexation groupée (chargement au démarrage) : `signatures` a une ligne par clé."""
+        signatures = np.asarray(signatures, dtype=np.uint16)
+        with self._lock:
+            fresh, seen = [], set()
+            for i, key in enumerate(keys):
+                if key not in self._rows and key not in seen:
+                    seen.add(key)
+                    fresh.append(i)
+            if not fresh:
+                return
+            rows = self._append([keys[i] for i in fresh], signatures[fresh])
+            self._merge(np.repeat(np.array(rows, dtype=np.int32), self.bands),
+                        self._bands(signatures[fresh]).ravel())
+
+    def _append(self, keys, signatures):
+        start = len(self._keys)
+        needed = start + len(keys)
+        if needed > len(self._signatures):
+            grown = np.empty((max(needed, 2 * len(self._signatures)), self.num_perm), dtype=np.uint16)
+            grown[:start] = self._signatures[:start]
+            self._signatures = grown
+        self._signatures[start:needed] = signatures
+        for i, key in enumerate(keys):
+            self._rows[key] = start + i
+        self._keys.extend(keys)
+        return list(range(start, needed))
+
+    def _merge(self, rows=None, bands=None):
+        # Fusion des ajouts en attente dans le tableau trié (tri stable : les deux parties sont presque triées)
+        parts_rows, parts_bands = [self._band_rows], [self._band_keys]
+        if self._pending:
+            parts_bands.append(np.fromiter((b for b, r in self._pending.items() for _ in r), dtype=np.uint64))
+            parts_rows.append(np.fromiter((x for r in self._pending.values() for x in r), dtype=np.int32))
+        if rows is not None:
+            parts_rows.append(rows)
+            parts_bands.append(bands)
+        band_keys = np.concatenate(parts_bands)
+        order = np.argsort(band_keys, kind="stable")
+        self._band_keys = band_keys[order]
+        self._band_rows = np.concatenate(parts_rows)[order]
+        self._pending = {}
+        self._pending_rows = 0
+        self.merges += 1
+
+    def query(self, challenge=None, signature=None, threshold=None):
+        """Défis indexés proches, du plus au moins similaire : liste de (clé, similarité)."""
+        if signature is None:
+            signature = self.signature(challenge)
+        threshold = self.threshold if threshold is None else threshold
+        bands = self._bands(signature)
+        with self._lock:
+            self.queries += 1
+            lo = np.searchsorted(self._band_keys, bands, "left")
+            hi = np.searchsorted(self._band_keys, bands, "right")
+            parts = [self._band_rows[l:h] for l, h in zip(lo.tolist(), hi.tolist()) if h > l]
+            if self._pending:
+                parts.extend(np.array(self._pending[b], dtype=np.int32) for b in bands.tolist() if b in self._pending)
+            if not parts:
+                return []
+            rows = np.unique(np.concatenate(parts))
+            scores = self._score(self._signatures[rows], signature)
+            keep = scores >= threshold
+            found = sorted(zip(scores[keep].tolist(), rows[keep].tolist()), reverse=True)
+            return [(self._keys[row], score) for score, row in found]
+
+    def nearest(self, challenge=None, signature=None):
+        """Défi indexé le plus proche au-delà du seuil, (clé, similarité), ou None."""
+        found = self.query(challenge, signature)
+        return found[0] if found else None
+
+    def neighbors(self, key):
+        """Clés des quasi-doublons d'un défi indexé (lui compris) ; vide s'il est inconnu."""
+        row = self._rows.get(key)
+        if row is None:
+            return set()
+        return {k for k, _ in self.query(signature=self._signatures[row])}
+
+    def stats(self):
+        with self._lock:
+            return {"indexed": len(self._keys), "queries": self.queries, "merges": self.merges,
+                    "band_keys": len(self._band_keys), "pending": self._pending_rows,
+                    "bytes": self._band_keys.nbytes + self._band_rows.nbytes + len(self._keys) * 2 * self.num_perm}
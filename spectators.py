@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Topic:
+    __slots__ = ("cond", "seq", "version", "frame", "subscribers", "closed")
+
+    def __init__(self, lock):
+        self.cond = threading.Condition(lock)
+        self.seq = 0
+        self.version = None
+        self.frame = None
+        self.subscribers = 0
+        self.closed = False
+
+
+class SpectatorHub:
+    """Diffusion de l'état des parties aux spectateurs (lecture seule).
+
+    Chaque changement est sérialisé une seule fois en une trame, partagée par
+    tous les abonnés de la partie. Un abonné ne reçoit que la dernière trame :
+    un client lent, qui n'a pas fini d'envoyer la précédente, saute les
+    trames intermédiaires au lieu de les accumuler. Les trames doivent donc
+    être des états complets, pas des deltas.
+    """
+
+    def __init__(self, max_games=1024):
+        self.max_games = max_games
+        self._lock = threading.Lock()
+        self._topics = OrderedDict()  # game_id -> _Topic, seulement les parties regardées
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def _stale(self, game_id, version):
+        topic = self._topics.get(game_id)
+        if topic is None or not topic.subscribers:
+            return None
+        return topic if topic.version is None or version > topic.version else None
+
+    def publish(self, game_id, version, render):
+        """Diffuse l'état `version` de la partie ; `render()` n'est appelé que s'il a des spectateurs.
+
+        Une version déjà diffusée (ou plus ancienne) est ignorée : plusieurs
+        appelants peuvent signaler le même changement sans le resérialiser.
+        """
+        if self._stale(game_id, version) is None:
+            return False
+        frame = render()
+        with self._lock:
+            topic = self._stale(game_id, version)
+            if topic is None:
+                return False
+            topic.seq += 1
+            topic.version = version
+            topic.frame = frame
+            self.published += 1
+            topic.cond.notify_all()
+            return True
+
+    def frames(self, game_id, current, keepalive=15):
+        """Trames de la partie pour un abonné : la plus récente à chaque réveil.
+
+        `current()` renvoie `(version, render)` pour l'état actuel de la partie,
+        ou None si elle n'existe plus ; il est appelé à l'abonnement puis après
+        `keepalive` secondes sans changement (pour rattraper un changement fait
+        par un autre worker), et None est alors renvoyé (commentaire SSE de
+        maintien). S'arrête à la fin de la partie (`close`) ou quand le client
+        se déconnecte (fermeture du générateur).
+        """
+        with self._lock:
+            topic = self._topics.get(game_id)
+            if topic is None:
+                topic = self._topics[game_id] = _Topic(self._lock)
+                self._evict()
+            self._topics.move_to_end(game_id)
+            topic.subscribers += 1
+        try:
+            seen, refresh = -1, True
+            while True:
+                if refresh:
+                    state = current()
+                    if state is None:
+                        return
+                    self.publish(game_id, *state)
+                with self._lock:
+                    deadline = time.monotonic() + keepalive
+                    while topic.seq == seen and not topic.closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or not topic.cond.wait(remaining):
+                            break
+                    if topic.seq == seen or topic.frame is None:
+                        if topic.closed:
+                            return
+                        frame, refresh = None, True
+                    else:
+                        if seen >= 0:
+                            self.dropped += topic.seq - seen - 1
+                        self.delivered += 1
+                        frame, seen, refresh = topic.frame, topic.seq, False
+                # L'envoi se fait hors verrou : c'est là qu'un client lent prend du retard
+                yield frame
+        finally:
+            with self._lock:
+                topic.subscribers -= 1
+                if not topic.subscribers and self._topics.get(game_id) is topic:
+                    del self._topics[game_id]
+
+    def _evict(self):
+        # Au-delà de max_games parties regardées, les plus anciennes sont fermées
+        while len(self._topics) > self.max_games:
+            _, topic = self._topics.popitem(last=False)
+            topic.closed = True
+            topic.cond.notify_all()
+
+    def close(self, game_id):
+        """Termine les flux des spectateurs de la partie (partie retirée)."""
+        with self._lock:
+            topic = self._topics.pop(game_id, None)
+            if topic:
+                topic.closed = True
+                topic.cond.notify_all()
+
+    def stats(self):
+        with self._lock:
+            return {"games": len(self._topics), "subscribers": sum(t.subscribers for t in self._topics.values()),
+                    "published": self.published, "delivered": self.delivered, "dropped": self.dropped}
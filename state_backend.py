@@ -0,0 +1,270 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class ConflictError(Exception):
+    """La partie a été modifiée par un autre worker depuis sa lecture."""
+
+
+class StateBackend:
+    """État partagé des parties entre processus, versionné de façon optimiste.
+
+    `save` n'écrit que si la version stockée vaut encore `expected_version`
+    (None pour une création) et renvoie la nouvelle version ; sinon ConflictError.
+    Le champ `version` de l'état (celui de la partie, distinct de ce compteur
+    d'écritures) est gardé à part : `game_version` le relit sans charger l'état.
+    """
+
+    def load(self, game_id):
+        """(état, version) ou None si la partie n'existe pas."""
+        raise NotImplementedError
+
+    def version(self, game_id):
+        raise NotImplementedError
+
+    def game_version(self, game_id):
+        """`state["version"]` du dernier état enregistré, ou None si la partie n'existe pas."""
+        raise NotImplementedError
+
+    def save(self, game_id, state, expected_version):
+        raise NotImplementedError
+
+    def delete(self, game_id):
+        raise NotImplementedError
+
+    def purge(self, idle_seconds):
+        """Supprime les parties non modifiées depuis `idle_seconds` ; renvoie leur nombre."""
+        return 0
+
+
+class SQLiteBackend(StateBackend):
+    """Backend sur un fichier SQLite partagé par les workers d'une même machine."""
+
+    def __init__(self, path="games.db"):
+        self.path = path
+        self._local = threading.local()
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS games ("
+            " id TEXT PRIMARY KEY,"
+            " version INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " game_version INTEGER NOT NULL DEFAULT 0)"
+        )
+        if "game_version" not in [row[1] for row in db.execute("PRAGMA table_info(games)")]:
+            db.execute("ALTER TABLE games ADD COLUMN game_version INTEGER NOT NULL DEFAULT 0")
+
+    def _db(self):
+        # Une connexion par thread : SQLite sérialise lui-même les écritures entre processus
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def load(self, game_id):
+        row = self._db().execute("SELECT data, version FROM games WHERE id = ?", (game_id,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def version(self, game_id):
+        row = self._db().execute("SELECT version FROM games WHERE id = ?", (game_id,)).fetchone()
+        return row[0] if row else None
+
+    def game_version(self, game_id):
+        row = self._db().execute("SELECT game_version FROM games WHERE id = ?", (game_id,)).fetchone()
+        return row[0] if row else None
+
+    def save(self, game_id, state, expected_version):
+        data = json.dumps(state, separators=(",", ":"))
+        game_version = state.get("version", 0)
+        db = self._db()
+        if expected_version is None:
+            try:
+                db.execute("INSERT INTO games (id, version, data, updated_at, game_version) VALUES (?, 1, ?, ?, ?)",
+                           (game_id, data, time.time(), game_version))
+            except sqlite3.IntegrityError:
+                raise ConflictError(game_id)
+            return 1
+        cur = db.execute("UPDATE games SET version = version + 1, data = ?, updated_at = ?, game_version = ?"
+                         " WHERE id = ? AND version = ?",
+                         (data, time.time(), game_version, game_id, expected_version))
+        if cur.rowcount != 1:
+            raise ConflictError(game_id)
+        return expected_version + 1
+
+    def delete(self, game_id):
+        self._db().execute("DELETE FROM games WHERE id = ?", (game_id,))
+
+    def purge(self, idle_seconds):
+        cur = self._db().execute("DELETE FROM games WHERE updated_at < ?", (time.time() - idle_seconds,))
+        return cur.rowcount
+
+
+class WatchError(Exception):
+    pass
+
+
+class KeyValueBackend(StateBackend):
+    """Backend sur un client de type Redis (redis-py ou LocalRedis).
+
+    Utilise uniquement get/delete et pipeline() avec watch/multi/set/execute ;
+    la clé expire après `ttl` secondes sans écriture. Dans la même transaction,
+    la version optimiste est écrite seule sous `<clé>:rev` et la version de la
+    partie sous `<clé>:v` : les lire ne relit ni ne décode l'état complet.
+    """
+
+    def __init__(self, client, prefix="morpion:game:", ttl=None):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _read(self, raw):
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry["data"], entry["version"]
+
+    def load(self, game_id):
+        return self._read(self.client.get(self.prefix + game_id))
+
+    def version(self, game_id):
+        raw = self.client.get(self.prefix + game_id + ":rev")
+        return int(raw) if raw is not None else None
+
+    def game_version(self, game_id):
+        raw = self.client.get(self.prefix + game_id + ":v")
+        return int(raw) if raw is not None else None
+
+    def save(self, game_id, state, expected_version):
+        key = self.prefix + game_id
+        pipe = self.client.pipeline()
+        try:
+            # Toute écriture de la partie change `:rev` : le surveiller suffit
+            pipe.watch(key + ":rev")
+            current = pipe.get(key + ":rev")
+            if (int(current) if current is not None else None) != expected_version:
+                raise ConflictError(game_id)
+            version = (expected_version or 0) + 1
+            pipe.multi()
+            pipe.set(key, json.dumps({"version": version, "data": state}, separators=(",", ":")), ex=self.ttl)
+            pipe.set(key + ":rev", str(version), ex=self.ttl)
+            pipe.set(key + ":v", str(state.get("version", 0)), ex=self.ttl)
+            pipe.execute()
+            return version
+        except Exception as e:
+            if type(e).__name__ == "WatchError":
+                raise ConflictError(game_id)
+            raise
+        finally:
+            pipe.reset()
+
+    def delete(self, game_id):
+        key = self.prefix + game_id
+        self.client.delete(key, key + ":rev", key + ":v")
+
+    def purge(self, idle_seconds):
+        # Rien à balayer : chaque écriture repousse l'expiration des clés (`ttl`)
+        return 0
+
+
+class LocalRedis:
+    """Équivalent local, en mémoire, du sous-ensemble Redis utilisé par KeyValueBackend."""
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._revisions = {}
+        self._lock = threading.Lock()
+
+    def _alive(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+            self._revisions[key] = self._revisions.get(key, 0) + 1
+        return key in self._data
+
+    def get(self, key):
+        with self._lock:
+            return self._data[key] if self._alive(key) else None
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = value
+            if ex:
+                self._expires[key] = time.monotonic() + ex
+            else:
+                self._expires.pop(key, None)
+            self._revisions[key] = self._revisions.get(key, 0) + 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    self._revisions[key] = self._revisions.get(key, 0) + 1
+                self._expires.pop(key, None)
+
+    def pipeline(self):
+        return _LocalPipeline(self)
+
+
+class _LocalPipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._watched = {}
+        self._queue = None
+
+    def watch(self, key):
+        with self._redis._lock:
+            self._redis._alive(key)
+            self._watched[key] = self._redis._revisions.get(key, 0)
+
+    def get(self, key):
+        return self._redis.get(key)
+
+    def multi(self):
+        self._queue = []
+
+    def set(self, key, value, ex=None):
+        self._queue.append((key, value, ex))
+
+    def execute(self):
+        r = self._redis
+        with r._lock:
+            if any(r._revisions.get(k, 0) != rev for k, rev in self._watched.items()):
+                raise WatchError()
+            for key, value, ex in self._queue:
+                r._data[key] = value
+                if ex:
+                    r._expires[key] = time.monotonic() + ex
+                else:
+                    r._expires.pop(key, None)
+                r._revisions[key] = r._revisions.get(key, 0) + 1
+        return [True] * len(self._queue)
+
+    def reset(self):
+        self._watched = {}
+        self._queue = None
+
+
+def make_backend(url, ttl=None):
+    """None (mémoire locale), sqlite:///chemin.db, local-redis ou redis://hôte:port/db.
+
+    `ttl` : secondes sans écriture après lesquelles une partie est abandonnée
+    (expiration des clés Redis ; SQLite les supprime via `purge`).
+    """
+    if not url or url == "memory":
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url == "local-redis":
+        return KeyValueBackend(LocalRedis(), ttl=ttl)
+    if url.startswith("redis://"):
+        import redis  # dépendance optionnelle, seulement pour ce backend
+        return KeyValueBackend(redis.Redis.from_url(url), ttl=ttl)
+    raise ValueError(f"Backend d'état inconnu : {url}")
@@ -1,36 +1,50 @@
-const socket = io();
+// Mises à jour poussées par le serveur : une room Socket.IO par partie.
+// La page se met à jour uniquement quand l'état de la partie change.
+(function () {
+    const page = document.body.dataset;
+    if (!page.gameId) return;
 
-document.querySelectorAll(".cell").forEach(cell => {
-    cell.addEventListener("click", function () {
-        const row = this.dataset.row;
-        const col = this.dataset.col;
+    if (typeof io === "undefined") {
+        // Client Socket.IO indisponible : ancien rafraîchissement périodique
+        if (!page.winner) setTimeout(function () { location.reload(); }, 5000);
+        return;
+    }
 
-        if (this.textContent !== "") {
-            alert("Cette case est déjà prise !");
-            return;
-        }
+    const socket = io();
+
+    socket.on("connect", function () {
+        socket.emit("join_game", { game_id: page.gameId });
+    });
 
-        // Affichage du défi avant d'envoyer au serveur
-        const code = prompt("Défi : Écrire une fonction 'addition' qui prend deux nombres et retourne leur somme. Exemple : addition(2,3) doit renvoyer 5. \n\nÉcrivez votre fonction ici :");
+    function onWaitingState(state) {
+        const count = document.getElementById("players-count");
+        if (count) count.textContent = state.players;
+        if (state.players >= state.num_players) window.location.href = page.gridUrl;
+    }
 
-        if (code) {
-            socket.emit("mark_case", { row, col, team: "red", code: code });
+    function onGridState(state) {
+        if (String(state.current_turn) !== page.turn || (state.winner || "") !== page.winner) {
+            location.reload();
         }
+    }
+
+    // État courant envoyé à la connexion (rattrape ce qui a changé pendant le chargement)
+    socket.on("game_state", function (state) {
+        if (page.page === "waiting") onWaitingState(state);
+        else onGridState(state);
     });
-});
-
-socket.on("update_grid", data => {
-    document.querySelectorAll(".cell").forEach(cell => {
-        const row = cell.dataset.row;
-        const col = cell.dataset.col;
-        cell.textContent = data.grid[row][col];
-
-        if (data.grid[row][col] === "red") {
-            cell.classList.add("red");
-        } else if (data.grid[row][col] === "blue") {
-            cell.classList.add("blue");
-        } else if (data.grid[row][col] === "yellow") {
-            cell.classList.add("yellow");
-        }
+
+    socket.on("player_joined", function (state) {
+        if (page.page === "waiting") onWaitingState(state);
+    });
+
+    socket.on("update_grid", function () {
+        if (page.page === "grid") location.reload();
+    });
+
+    ["turn_changed", "winner"].forEach(function (event) {
+        socket.on(event, function (state) {
+            if (page.page === "grid") onGridState(state);
+        });
     });
-});
+})();
@@ -0,0 +1,45 @@
+import threading
+
+from challenge_pool import ChallengePool
+
+
+def _pool(**kwargs):
+    gate = threading.Event()
+
+    def generate():
+        gate.wait()
+        return {"title": "défi"}
+
+    pool = ChallengePool(generate, **kwargs)
+    return pool, gate
+
+
+def test_demand_follows_prefill_and_takes():
+    pool, gate = _pool(target=1, max_size=8)
+    pool.prefill(3)
+    assert pool._wanted() == 4
+    pool.take()
+    pool.take()
+    assert pool._wanted() == 2
+    pool.stop()
+    gate.set()
+
+
+def test_challenges_served_elsewhere_release_demand():
+    pool, gate = _pool(target=1, max_size=8)
+    pool.prefill(3)
+    for _ in range(3):
+        pool.served()
+    assert pool._wanted() == 1
+    pool.served()
+    assert pool._wanted() == 1
+    pool.stop()
+    gate.set()
+
+
+def test_pool_fills_up_to_target():
+    pool, gate = _pool(target=2, max_size=8)
+    gate.set()
+    assert pool.wait_ready(2, timeout=5)
+    assert pool.take() == {"title": "défi"}
+    pool.stop()
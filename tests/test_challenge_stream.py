@@ -0,0 +1,66 @@
+import json
+
+from challenge_stream import PartialJSON, StreamingGeneration
+
+RAW = '```json\n' + json.dumps({
+    "description": "Somme d'une liste « é » \\ \"guillemets\"",
+    "function_name": "somme",
+    "tests": [{"input": [[1, 2]], "output": 3}],
+    "note": "fin",
+}, ensure_ascii=True) + '\n```'
+
+
+def _feed_in_chunks(parser, text, size):
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+
+
+def test_top_level_strings_whatever_the_chunk_size():
+    expected = json.loads(RAW[len("```json\n"):-len("\n```")])
+    for size in (1, 2, 3, 7, len(RAW)):
+        parser = PartialJSON()
+        _feed_in_chunks(parser, RAW, size)
+        assert parser.complete
+        assert parser.fields == {k: v for k, v in expected.items() if isinstance(v, str)}
+
+
+def test_partial_value_while_the_string_is_streaming():
+    parser = PartialJSON()
+    parser.feed('{"function_name": "f", "description": "Calcule la som')
+    assert parser.partial("description") == "Calcule la som"
+    assert parser.partial("function_name") == "f"
+    assert parser.partial("tests") is None
+    assert not parser.complete
+
+
+def test_partial_value_cut_inside_an_escape():
+    parser = PartialJSON()
+    parser.feed('{"description": "caf\\u00e')
+    assert parser.partial("description") == "caf"
+    parser.feed('9 \\')
+    assert parser.partial("description") == "café "
+    parser.feed('n"}')
+    assert parser.fields["description"] == "café \n"
+
+
+def test_nested_strings_are_not_top_level_fields():
+    parser = PartialJSON()
+    parser.feed('{"tests": [{"input": "x", "output": "y"}], "description": "d"}')
+    assert parser.fields == {"description": "d"}
+
+
+def test_text_after_the_object_is_ignored():
+    parser = PartialJSON()
+    parser.feed('{"description": "d"} {"description": "autre"}')
+    assert parser.complete
+    assert parser.fields == {"description": "d"}
+
+
+def test_generation_is_displayable_once_statement_and_name_are_known():
+    generation = StreamingGeneration()
+    generation.feed('{"description": "d",')
+    assert not generation.displayable
+    generation.feed(' "function_name": "f"')
+    assert generation.displayable
+    generation.finish({"description": "d"})
+    assert generation.wait(1) == {"description": "d"}
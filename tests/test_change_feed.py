@@ -0,0 +1,31 @@
+import threading
+import time
+
+from change_feed import ChangeFeed
+
+
+def test_since_merges_consecutive_changes():
+    feed = ChangeFeed(history=4)
+    feed.publish("g", 0, 1, {"turn": "red"})
+    feed.publish("g", 1, 2, {"turn": "yellow"})
+    assert feed.since("g", 0, 2) == {"turn": "yellow"}
+    assert feed.since("g", 2, 2) == {}
+    assert feed.since("g", 5, 2) is None
+
+
+def test_wait_returns_when_a_change_is_published():
+    feed = ChangeFeed()
+    threading.Timer(0.05, feed.publish, ("g", 0, 1, {})).start()
+    assert feed.wait("g", 0, timeout=5)
+    assert not feed.wait("g", 1, timeout=0.05)
+
+
+def test_drop_wakes_waiters_and_forgets_history():
+    feed = ChangeFeed()
+    feed.publish("g", 0, 1, {})
+    threading.Timer(0.05, feed.drop, ("g",)).start()
+    started = time.monotonic()
+    assert feed.wait("g", 1, timeout=5)
+    assert time.monotonic() - started < 2
+    assert feed.since("g", 0, 1) is None
+    assert feed.stats()["games"] == 0
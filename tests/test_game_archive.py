@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from game_archive import MOVE_DTYPE, GameArchive, NpyAppender, mask_bits, mask_words
+
+TEAMS = ("red", "yellow")
+
+
+def _moves(n, game=0):
+    moves = np.zeros(n, dtype=MOVE_DTYPE)
+    moves["game"] = game
+    moves["cell"] = np.arange(n)
+    return moves
+
+
+def test_appended_rows_are_a_regular_npy_file(tmp_path):
+    path = str(tmp_path / "moves.npy")
+    table = NpyAppender(path, MOVE_DTYPE)
+    table.append(_moves(3))
+    table.append(_moves(2))
+    table.close()
+    loaded = np.load(path, mmap_mode="r")
+    assert loaded.shape == (5,)
+    assert list(loaded["cell"]) == [0, 1, 2, 0, 1]
+
+
+def test_rows_written_after_the_last_header_are_cut_on_open(tmp_path):
+    path = str(tmp_path / "moves.npy")
+    table = NpyAppender(path, MOVE_DTYPE)
+    table.append(_moves(3))
+    table.close()
+    # Arrêt brutal : lignes et demi-ligne écrites, en-tête pas encore réécrit
+    with open(path, "ab") as f:
+        f.write(_moves(2).tobytes() + b"\x01" * 5)
+
+    table = NpyAppender(path, MOVE_DTYPE)
+    assert table.rows == 3
+    table.append(_moves(1))
+    assert table.last()["cell"] == 0
+    table.close()
+    assert len(np.load(path)) == 4
+
+
+def test_truncate_keeps_the_first_rows(tmp_path):
+    path = str(tmp_path / "moves.npy")
+    table = NpyAppender(path, MOVE_DTYPE)
+    table.append(_moves(4))
+    table.truncate(1)
+    assert table.rows == 1
+    table.close()
+    assert list(np.load(path)["cell"]) == [0]
+
+
+def test_reopening_with_other_columns_is_refused(tmp_path):
+    path = str(tmp_path / "moves.npy")
+    NpyAppender(path, MOVE_DTYPE).close()
+    with pytest.raises(ValueError):
+        NpyAppender(path, np.dtype([("x", "<u4")]))
+
+
+def test_moves_without_their_game_are_cut_on_open(tmp_path):
+    archive = GameArchive(str(tmp_path), TEAMS)
+    archive.record("g1", {"grid_size": 3, "win_count": 3, "winner": 0, "owner": [0b111, 0]},
+                   [(0.5, 0, 0, True, False, 1), (1.5, 1, 0, True, False, 2)])
+    assert archive.flush(5)
+    archive.close()
+    # Coups d'un lot dont la partie n'a pas été écrite
+    table = NpyAppender(str(tmp_path / "moves.npy"), MOVE_DTYPE)
+    table.append(_moves(3, game=1))
+    table.close()
+
+    archive = GameArchive(str(tmp_path), TEAMS)
+    archive.append(np.zeros(0, dtype=archive.game_dtype), np.zeros(0, dtype=MOVE_DTYPE))
+    assert archive.stats()["rows"] == 1
+    archive.close()
+    moves = np.load(tmp_path / "moves.npy")
+    assert list(moves["cell"]) == [0, 1]
+    assert moves["think"][1] == pytest.approx(1.0)
+
+
+def test_masks_round_trip_for_a_19x19_grid():
+    mask = (1 << 360) | 1
+    bits = mask_bits(np.array(mask_words(mask), dtype="<u8"), 361)
+    assert bits[0] == 1 and bits[360] == 1 and bits.sum() == 2
+    with pytest.raises(ValueError):
+        mask_words(1 << 64 * len(mask_words(0)))
@@ -0,0 +1,97 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from game_store import GameStore
+from state_backend import ConflictError, KeyValueBackend, LocalRedis
+
+
+def _store(backend=None):
+    return GameStore(sweep_interval=0, backend=backend,
+                     to_state=lambda g: {"moves": list(g.moves), "version": len(g.moves)},
+                     from_state=lambda s: SimpleNamespace(moves=list(s["moves"]), winner=None))
+
+
+def test_update_replays_the_mutation_after_a_conflict():
+    backend = KeyValueBackend(LocalRedis())
+    store, other = _store(backend), _store(backend)
+    store["g"] = SimpleNamespace(moves=[], winner=None)
+    calls = []
+
+    def mutate(game):
+        calls.append(list(game.moves))
+        if len(calls) == 1:
+            # Un autre worker écrit entre la lecture et l'enregistrement
+            other.update("g", lambda g: g.moves.append("autre"))
+        game.moves.append("moi")
+        return len(game.moves)
+
+    assert store.update("g", mutate) == 2
+    assert calls == [[], ["autre"]]
+    assert store["g"].moves == ["autre", "moi"]
+    assert other["g"].moves == ["autre", "moi"]
+
+
+def test_update_gives_up_after_repeated_conflicts():
+    backend = KeyValueBackend(LocalRedis())
+    store, other = _store(backend), _store(backend)
+    store["g"] = SimpleNamespace(moves=[], winner=None)
+
+    def mutate(game):
+        other.update("g", lambda g: g.moves.append("autre"))
+        game.moves.append("moi")
+
+    with pytest.raises(ConflictError):
+        store.update("g", mutate, retries=2)
+    assert other["g"].moves == ["autre", "autre"]
+
+
+def test_update_of_an_unknown_game_raises_key_error():
+    store = _store()
+    with pytest.raises(KeyError):
+        store.update("absente", lambda g: None)
+    assert store._locks == {}
+
+
+def test_removal_keeps_the_lock_of_a_running_update():
+    store = _store()
+    store["g"] = SimpleNamespace(moves=[], winner=None)
+    inside, resume = threading.Event(), threading.Event()
+
+    def slow(game):
+        inside.set()
+        resume.wait(5)
+        game.moves.append(1)
+
+    worker = threading.Thread(target=store.update, args=("g", slow))
+    worker.start()
+    assert inside.wait(5)
+    lock = store._locks["g"]
+    # Remplacement de la partie pendant la mutation : le verrou ne doit pas changer
+    store["g"] = SimpleNamespace(moves=[], winner=None)
+    assert store._locks.get("g") is lock
+    resume.set()
+    worker.join(5)
+    store.update("g", lambda g: g.moves.append(2))
+    assert store["g"].moves == [2]
+
+
+def test_lock_is_released_when_the_game_is_removed_during_update():
+    store = _store()
+    store["g"] = SimpleNamespace(moves=[], winner=None)
+    store.update("g", lambda g: store.__delitem__("g"))
+    assert "g" not in store
+    assert store._locks == {}
+
+
+def test_on_remove_is_called_for_expired_and_evicted_games():
+    removed = []
+    store = GameStore(sweep_interval=0, max_games=2, idle_ttl=10, on_remove=removed.append)
+    for game_id in ("a", "b", "c"):
+        store[game_id] = SimpleNamespace(winner=None)
+    assert removed == ["a"]
+    store["b"] = SimpleNamespace(winner=None)  # remplacement : pas un retrait
+    assert removed == ["a"]
+    store.sweep(now=max(store._last_access.values()) + 10)
+    assert sorted(removed) == ["a", "b", "c"]
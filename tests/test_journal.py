@@ -0,0 +1,88 @@
+import os
+from types import SimpleNamespace
+
+from journal import GameJournal
+
+
+def _journal(directory):
+    # Partie minimale : une liste de coups et une version
+    return GameJournal(
+        str(directory),
+        to_state=lambda g: {"moves": list(g.moves), "version": g.version},
+        from_state=lambda s: SimpleNamespace(moves=list(s["moves"]), version=s["version"]),
+        diff=lambda before, g: g.moves[len(before["moves"]):],
+        apply=lambda g, move: g.moves.append(move),
+        fsync_interval=0,
+    )
+
+
+def _play(journal, game_id, game, move):
+    before = journal.to_state(game)
+    game.moves.append(move)
+    game.version += 1
+    journal.changed(game_id, before, game)
+
+
+def test_recover_after_clean_close(tmp_path):
+    journal = _journal(tmp_path)
+    game = SimpleNamespace(moves=[], version=0)
+    journal.created("a", game)
+    _play(journal, "a", game, 3)
+    _play(journal, "a", game, 5)
+    journal.close()
+
+    games = _journal(tmp_path).recover()
+    assert games["a"].moves == [3, 5]
+    assert games["a"].version == 2
+
+
+def test_restart_after_half_written_line_keeps_later_records(tmp_path):
+    journal = _journal(tmp_path)
+    game = SimpleNamespace(moves=[], version=0)
+    journal.created("a", game)
+    _play(journal, "a", game, 1)
+    journal.close()
+    # Arrêt brutal au milieu d'une écriture
+    (segment,) = [p for p in os.listdir(tmp_path) if p.endswith(".log")]
+    with open(tmp_path / segment, "a", encoding="utf-8") as f:
+        f.write('{"g":"a","v":2,"e":[')
+
+    restarted = _journal(tmp_path)
+    game = restarted.recover()["a"]
+    _play(restarted, "a", game, 2)
+    other = SimpleNamespace(moves=[7], version=1)
+    restarted.created("b", other)
+    restarted.close()
+
+    games = _journal(tmp_path).recover()
+    assert games["a"].moves == [1, 2]
+    assert games["b"].moves == [7]
+
+
+def test_replay_skips_a_corrupt_line(tmp_path):
+    journal = _journal(tmp_path)
+    game = SimpleNamespace(moves=[], version=0)
+    journal.created("a", game)
+    journal.close()
+    (segment,) = [p for p in os.listdir(tmp_path) if p.endswith(".log")]
+    with open(tmp_path / segment, "a", encoding="utf-8") as f:
+        f.write('{"g":"a","v":1,"e"\n')
+        f.write('{"g":"a","v":2,"e":[4]}\n')
+
+    games = _journal(tmp_path).recover()
+    assert games["a"].moves == [4]
+    assert games["a"].version == 2
+
+
+def test_compaction_keeps_state(tmp_path):
+    journal = _journal(tmp_path)
+    journal.compact_bytes = 1
+    game = SimpleNamespace(moves=[], version=0)
+    journal.created("a", game)
+    for move in range(5):
+        _play(journal, "a", game, move)
+        journal.flush()
+    journal.close()
+
+    assert journal.compactions > 0
+    assert _journal(tmp_path).recover()["a"].moves == [0, 1, 2, 3, 4]
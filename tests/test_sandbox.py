@@ -0,0 +1,99 @@
+import ctypes
+import os
+import sys
+
+import pytest
+
+from sandbox import SandboxRunner, call_arguments, describe_failure
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="isolation seccomp/Landlock : Linux seulement")
+
+CHALLENGE = {"function_name": "f", "tests": [{"input": [1], "output": 1}]}
+TEXT_CHALLENGE = {"function_name": "f", "tests": [{"input": [1], "output": "x"}]}
+
+
+def _landlock():
+    libc = ctypes.CDLL(None)
+    libc.syscall.restype = ctypes.c_long
+    # landlock_create_ruleset(NULL, 0, LANDLOCK_CREATE_RULESET_VERSION)
+    return libc.syscall(444, None, ctypes.c_size_t(0), 1) > 0
+
+
+@pytest.fixture(scope="module")
+def runner():
+    # Le forkserver démarre au premier passage : il hérite de ce secret
+    previous = os.environ.get("SECRET_KEY")
+    os.environ["SECRET_KEY"] = "secret-de-test"
+    runner = SandboxRunner(workers=2, test_timeout=2.0)
+    yield runner
+    runner.shutdown()
+    if previous is None:
+        os.environ.pop("SECRET_KEY", None)
+    else:
+        os.environ["SECRET_KEY"] = previous
+
+
+def _message(runner, code, challenge=CHALLENGE):
+    report = runner.run(code, challenge)
+    return report["ok"], describe_failure("f", report)
+
+
+def test_correct_and_wrong_answers(runner):
+    assert _message(runner, "def f(x): return x") == (True, "Wrong Answer")
+    ok, message = _message(runner, "def f(x): return 2")
+    assert not ok and "a renvoyé 2, attendu 1" in message
+
+
+def test_environment_is_cleared(runner):
+    ok, message = _message(runner, "import os\ndef f(x): return os.environ.get('SECRET_KEY')", TEXT_CHALLENGE)
+    assert not ok and "secret" not in message
+    ok, message = _message(runner, "import os\ndef f(x): return len(os.environ)")
+    assert "a renvoyé 0" in message
+
+
+def test_network_is_denied(runner):
+    ok, message = _message(runner, "import socket\ndef f(x):\n    socket.socket()\n    return 1")
+    assert not ok and "PermissionError" in message
+
+
+def test_files_cannot_be_written(runner):
+    ok, message = _message(runner, "def f(x):\n    open('/tmp/sandbox-test', 'w').write('x')\n    return 1")
+    assert not ok
+    assert not os.path.exists("/tmp/sandbox-test")
+
+
+@pytest.mark.skipif(not _landlock(), reason="noyau sans Landlock")
+def test_service_files_and_proc_are_unreadable(runner):
+    for path in (os.path.abspath(__file__), "/proc/self/environ", f"/proc/{os.getpid()}/environ"):
+        ok, message = _message(runner, f"def f(x): return open({path!r}).read()", TEXT_CHALLENGE)
+        assert not ok and "PermissionError" in message and "secret" not in message
+    assert _message(runner, "import fractions\ndef f(x): return int(fractions.Fraction(x))")[0]
+
+
+def test_player_output_is_not_echoed(runner):
+    ok, message = _message(runner, "def f(x): return 'secret-de-test'")
+    assert "a renvoyé une valeur de type texte" in message
+    ok, message = _message(runner, "def f(x): return 'y' * 500", TEXT_CHALLENGE)
+    assert len(message) < 200
+    ok, message = _message(runner, "def f(x): raise ValueError('z' * 500)")
+    assert "ValueError" in message and len(message) < 250
+
+
+def test_state_does_not_leak_between_submissions(runner):
+    runner.run("import builtins\nbuiltins.fuite = 1\ndef f(x): return x", CHALLENGE)
+    ok, message = _message(runner, "import builtins\ndef f(x): return getattr(builtins, 'fuite', x)")
+    assert ok
+
+
+def test_runaway_code_is_stopped(runner):
+    ok, message = _message(runner, "def f(x):\n    while True: pass")
+    assert not ok and "Temps dépassé" in message
+
+
+def test_call_arguments():
+    assert call_arguments([1, 2], 2) == ([1, 2], {})
+    assert call_arguments([[1, 2]], 1) == ([[1, 2]], {})
+    assert call_arguments([1, 2], 1) == ([[1, 2]], {})
+    assert call_arguments([1, 2], 1, varargs=True) == ([1, 2], {})
+    assert call_arguments({"n": 3}, 1) == ([], {"n": 3})
+    assert call_arguments(5, None) == ([5], {})
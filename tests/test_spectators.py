@@ -0,0 +1,28 @@
+import threading
+
+from spectators import SpectatorHub
+
+
+def test_subscriber_gets_the_current_frame_then_changes():
+    hub = SpectatorHub()
+    frames = hub.frames("g", lambda: (1, lambda: "v1"), keepalive=5)
+    assert next(frames) == "v1"
+    assert hub.publish("g", 2, lambda: "v2")
+    assert not hub.publish("g", 2, lambda: "encore v2")
+    assert next(frames) == "v2"
+    frames.close()
+    assert hub.stats()["games"] == 0
+
+
+def test_publish_without_spectators_does_not_render():
+    hub = SpectatorHub()
+    assert not hub.publish("g", 1, lambda: 1 / 0)
+
+
+def test_close_ends_the_streams_of_a_removed_game():
+    hub = SpectatorHub()
+    frames = hub.frames("g", lambda: (1, lambda: "v1"), keepalive=30)
+    assert next(frames) == "v1"
+    threading.Timer(0.05, hub.close, ("g",)).start()
+    assert list(frames) == []
+    assert hub.stats()["games"] == 0
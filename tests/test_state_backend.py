@@ -0,0 +1,61 @@
+import pytest
+
+from state_backend import ConflictError, KeyValueBackend, LocalRedis, SQLiteBackend
+
+
+class CountingRedis(LocalRedis):
+    def __init__(self):
+        super().__init__()
+        self.reads = []
+
+    def get(self, key):
+        self.reads.append(key)
+        return super().get(key)
+
+
+@pytest.fixture(params=["sqlite", "kv"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "games.db"))
+    return KeyValueBackend(LocalRedis())
+
+
+def test_save_checks_the_expected_version(backend):
+    assert backend.save("g", {"version": 0, "cells": []}, None) == 1
+    with pytest.raises(ConflictError):
+        backend.save("g", {"version": 0}, None)
+    assert backend.save("g", {"version": 1, "cells": [4]}, 1) == 2
+    with pytest.raises(ConflictError):
+        backend.save("g", {"version": 1, "cells": [5]}, 1)
+    assert backend.load("g") == ({"version": 1, "cells": [4]}, 2)
+    assert backend.version("g") == 2
+    assert backend.game_version("g") == 1
+
+
+def test_delete_forgets_every_version(backend):
+    backend.save("g", {"version": 3}, None)
+    backend.delete("g")
+    assert backend.load("g") is None
+    assert backend.version("g") is None
+    assert backend.game_version("g") is None
+    assert backend.save("g", {"version": 0}, None) == 1
+
+
+def test_key_value_version_reads_only_the_revision_key():
+    client = CountingRedis()
+    backend = KeyValueBackend(client, prefix="p:")
+    backend.save("g", {"version": 0, "board": "x" * 10000}, None)
+    client.reads.clear()
+    assert backend.version("g") == 1
+    assert client.reads == ["p:g:rev"]
+
+
+def test_key_value_keys_expire_together():
+    client = LocalRedis()
+    backend = KeyValueBackend(client, prefix="p:", ttl=60)
+    backend.save("g", {"version": 2}, None)
+    for key in ("p:g", "p:g:rev", "p:g:v"):
+        client._expires[key] = 0
+    assert backend.version("g") is None
+    assert backend.load("g") is None
+    assert backend.save("g", {"version": 0}, None) == 1
@@ -0,0 +1,186 @@
+import math
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Match:
+    __slots__ = ("round", "index", "seats", "game_id", "winner", "reason", "turns", "started", "finished")
+
+    def __init__(self, round_, index):
+        self.round = round_
+        self.index = index
+        self.seats = [None, None]  # (tête de série, nom) ; rouge puis bleu
+        self.game_id = None
+        self.winner = None
+        self.reason = None
+        self.turns = 0
+        self.started = None
+        self.finished = None
+
+    def as_dict(self):
+        return {
+            "round": self.round, "match": self.index, "game_id": self.game_id,
+            "red": self.seats[0] and self.seats[0][1], "blue": self.seats[1] and self.seats[1][1],
+            "winner": self.winner and self.winner[1], "reason": self.reason, "turns": self.turns,
+            "seconds": round(self.finished - self.started, 3) if self.started and self.finished else None,
+        }
+
+
+class Tournament:
+    """Tournoi à élimination directe : parties jouées en parallèle, qualifiés d'office.
+
+    `entrants` est la liste des participants, meilleure tête de série d'abord ;
+    le tableau oppose 1 au dernier, 2 à l'avant-dernier…, les premières têtes de
+    série sont exemptées du premier tour s'il le faut. Toutes les parties d'un
+    tour sont créées d'un coup par `new_game(rouge, bleu)` (qui renvoie un
+    game_id), puis `prepare(nombre)` est appelé (p. ex. pré-générer les défis).
+
+    Chaque partie est jouée par `play_turn(game_id)`, un tour à la fois, qui
+    renvoie le gagnant ('red', 'blue', 'draw' ou None tant que la partie
+    continue). Dès qu'un match est décidé, son vainqueur est placé au tour
+    suivant, qui démarre sans attendre les autres matchs. Le tour r doit être
+    fini `round_deadline` × (r + 1) secondes après le début : passé ce délai,
+    comme en cas de nul, l'équipe en tête selon `leader(game_id)` l'emporte,
+    sinon la meilleure tête de série. Au plus `max_parallel` parties tournent
+    en même temps.
+    """
+
+    def __init__(self, entrants, new_game, play_turn, leader=None, prepare=None,
+                 round_deadline=600, max_parallel=32, max_turns=200):
+        if len(entrants) < 2:
+            raise ValueError("Il faut au moins deux participants.")
+        self.entrants = list(entrants)
+        self.new_game = new_game
+        self.play_turn = play_turn
+        self.leader = leader or (lambda game_id: None)
+        self.prepare = prepare
+        self.round_deadline = round_deadline
+        self.max_parallel = max_parallel
+        self.max_turns = max_turns
+        self.rounds = self._bracket()
+        self.champion = None
+        self.started = None
+        self.finished = None
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._executor = None
+
+    def _bracket(self):
+        size = 1 << math.ceil(math.log2(len(self.entrants)))
+        # Ordre des têtes de série dans le tableau : 1 et 2 ne peuvent se croiser qu'en finale
+        order = [1]
+        while len(order) < size:
+            order = [s for seed in order for s in (seed, 2 * len(order) + 1 - seed)]
+        rounds = [[Match(r, i) for i in range(size >> (r + 1))] for r in range(int(math.log2(size)))]
+        for i, seed in enumerate(order):
+            if seed <= len(self.entrants):
+                rounds[0][i // 2].seats[i % 2] = (seed, self.entrants[seed - 1])
+        return rounds
+
+    # --- déroulement ----------------------------------------------------------
+
+    def start(self):
+        """Lance le tournoi en arrière-plan ; `wait()` attend le champion."""
+        with self._lock:
+            if self.started is not None:
+                return
+            self.started = time.monotonic()
+            self._executor = ThreadPoolExecutor(self.max_parallel, thread_name_prefix="tournament")
+            ready = []
+            for match in self.rounds[0]:
+                if None in match.seats:
+                    # Exemption : la tête de série passe directement au tour suivant
+                    ready += self._decide(match, match.seats[0] or match.seats[1], "bye")
+                else:
+                    ready.append(match)
+        self._launch(ready)
+
+    def _launch(self, matches):
+        if not matches:
+            return
+        # Création groupée des parties du lot, puis pré-génération des défis
+        for match in matches:
+            match.game_id = self.new_game(match.seats[0][1], match.seats[1][1])
+        if self.prepare:
+            self.prepare(len(matches))
+        for match in matches:
+            self._executor.submit(self._play, match)
+
+    def deadline(self, round_):
+        return self.started + self.round_deadline * (round_ + 1)
+
+    def _play(self, match):
+        match.started = time.monotonic()
+        winner, reason = None, None
+        try:
+            while True:
+                if time.monotonic() >= self.deadline(match.round):
+                    reason = "deadline"
+                    break
+                if match.turns >= self.max_turns:
+                    reason = "max_turns"
+                    break
+                result = self.play_turn(match.game_id)
+                match.turns += 1
+                if result == "draw":
+                    reason = "draw"
+                    break
+                if result in ("red", "blue"):
+                    winner, reason = match.seats[0 if result == "red" else 1], "win"
+                    break
+        except Exception:
+            traceback.print_exc()
+            with self._lock:
+                self.errors += 1
+            reason = "error"
+        if winner is None:
+            lead = self.leader(match.game_id)
+            if lead in ("red", "blue"):
+                winner = match.seats[0 if lead == "red" else 1]
+            else:
+                winner = min(match.seats)  # meilleure tête de série
+        with self._lock:
+            ready = self._decide(match, winner, reason)
+        self._launch(ready)
+
+    def _decide(self, match, winner, reason):
+        """Enregistre le résultat ; renvoie les matchs du tour suivant devenus jouables."""
+        match.winner, match.reason = winner, reason
+        match.finished = time.monotonic()
+        if match.round + 1 == len(self.rounds):
+            self.champion = winner[1]
+            self.finished = match.finished
+            self._done.set()
+            if self._executor:
+                self._executor.shutdown(wait=False)
+            return []
+        parent = self.rounds[match.round + 1][match.index // 2]
+        parent.seats[match.index % 2] = winner
+        if None in parent.seats:
+            return []
+        return [parent]
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    # --- résultats ------------------------------------------------------------
+
+    def results(self):
+        with self._lock:
+            return [[m.as_dict() for m in matches] for matches in self.rounds]
+
+    def stats(self):
+        with self._lock:
+            played = [m for matches in self.rounds for m in matches if m.finished and m.reason != "bye"]
+            end = self.finished or time.monotonic()
+            elapsed = end - self.started if self.started else 0.0
+            return {
+                "entrants": len(self.entrants), "rounds": len(self.rounds), "champion": self.champion,
+                "games_played": len(played), "turns": sum(m.turns for m in played),
+                "elapsed": round(elapsed, 3), "errors": self.errors,
+                "games_per_minute": round(len(played) * 60 / elapsed, 2) if elapsed else None,
+                "deadline_decisions": sum(1 for m in played if m.reason == "deadline"),
+            }
@@ -0,0 +1,67 @@
+import ast
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def _strip_docstrings(tree):
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                    and isinstance(body[0].value.value, str):
+                node.body = body[1:] or [ast.Pass()]
+    return tree
+
+
+def code_hash(code):
+    """Empreinte du code soumis, insensible aux commentaires, blancs et docstrings.
+
+    Le code est comparé sur son arbre syntaxique ; s'il ne compile pas, sur son
+    texte aux blancs de fin de ligne près.
+    """
+    try:
+        normalized = ast.dump(_strip_docstrings(ast.parse(code or "")))
+    except (SyntaxError, ValueError):
+        normalized = "\n".join(line.rstrip() for line in (code or "").strip().splitlines())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class VerificationCache:
+    """Verdicts déjà rendus, par (empreinte du défi, empreinte du code), en LRU borné."""
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def get(self, challenge_id, code):
+        key = (challenge_id, code_hash(code))
+        with self._lock:
+            verdict = self._entries.get(key)
+            if verdict is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return verdict
+
+    def put(self, challenge_id, code, verdict):
+        if not self.max_entries:
+            return
+        key = (challenge_id, code_hash(code))
+        with self._lock:
+            self._entries[key] = verdict
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "evicted": self.evicted, "hit_rate": self.hits / lookups if lookups else None}
@@ -0,0 +1,104 @@
+import sys
+from functools import lru_cache
+
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+@lru_cache(maxsize=None)
+def line_windows(size, k):
+    """Toutes les fenêtres de k cases alignées d'une grille size x size.
+
+    Renvoie (fenêtres, fenêtres_par_case) ; les indices de case sont r * size + c.
+    Les diagonales qui ne couvrent pas toute la grille sont incluses dès qu'elles
+    font au moins k cases. Partagé par toutes les parties de même configuration.
+    """
+    windows = []
+    by_cell = [[] for _ in range(size * size)]
+    for dr, dc in DIRECTIONS:
+        for r in range(size):
+            for c in range(size):
+                er, ec = r + dr * (k - 1), c + dc * (k - 1)
+                if not (0 <= er < size and 0 <= ec < size):
+                    continue
+                wid = len(windows)
+                cells = tuple((r + dr * i) * size + (c + dc * i) for i in range(k))
+                windows.append(cells)
+                for idx in cells:
+                    by_cell[idx].append(wid)
+    return tuple(windows), tuple(tuple(w) for w in by_cell)
+
+
+class WinTracker:
+    """Détection de victoire incrémentale : k cases alignées sur une grille N x N.
+
+    Chaque équipe a un compteur par fenêtre ; modifier une case ne touche que les
+    (au plus 4k) fenêtres qui la contiennent, quelle que soit la taille de la grille.
+    Les cases jaunes remplissent la grille mais ne comptent pour aucune équipe.
+    """
+
+    __slots__ = ("size", "k", "_windows", "_by_cell", "_cells", "_values", "_counts", "_complete", "_winners", "filled")
+
+    NEUTRAL = ('', 'yellow')
+
+    def __init__(self, size, k):
+        if not 1 <= k <= size:
+            raise ValueError(f"Alignement de {k} impossible sur une grille {size}x{size}")
+        self.size = size
+        self.k = k
+        self._windows, self._by_cell = line_windows(size, k)
+        self._values = list(self.NEUTRAL)  # code -> valeur de case, les équipes sont ajoutées à la volée
+        self._cells = bytearray(size * size)
+        self._counts = {}
+        self._complete = {}
+        self._winners = []  # équipes ayant au moins une ligne complète, par ordre d'arrivée
+        self.filled = 0
+
+    def _code(self, value):
+        try:
+            return self._values.index(value)
+        except ValueError:
+            self._values.append(value)
+            return len(self._values) - 1
+
+    def _add(self, team, idx, delta):
+        counts = self._counts.get(team)
+        if counts is None:
+            # k <= 255 : un octet par fenêtre suffit
+            counts = self._counts[team] = bytearray(len(self._windows))
+            self._complete[team] = 0
+        k = self.k
+        for wid in self._by_cell[idx]:
+            before = counts[wid]
+            counts[wid] = before + delta
+            if before + delta == k:
+                self._complete[team] += 1
+            elif before == k:
+                self._complete[team] -= 1
+        if self._complete[team] and team not in self._winners:
+            self._winners.append(team)
+        elif not self._complete[team] and team in self._winners:
+            self._winners.remove(team)
+
+    def set(self, row, col, value):
+        idx = row * self.size + col
+        old = self._values[self._cells[idx]]
+        if old == value:
+            return
+        self._cells[idx] = self._code(value)
+        if old not in self.NEUTRAL:
+            self._add(old, idx, -1)
+        if value not in self.NEUTRAL:
+            self._add(value, idx, 1)
+        self.filled += (value != '') - (old != '')
+
+    def approx_size(self):
+        # Les fenêtres sont partagées entre parties : seul l'état propre est compté
+        return (sys.getsizeof(self) + sys.getsizeof(self._cells) + sys.getsizeof(self._values)
+                + sum(sys.getsizeof(c) for c in self._counts.values()) + sys.getsizeof(self._counts)
+                + sys.getsizeof(self._complete) + sys.getsizeof(self._winners))
+
+    def winner(self):
+        return self._winners[0] if self._winners else None
+
+    def is_full(self):
+        return self.filled == self.size * self.size